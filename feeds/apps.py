@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class FeedsConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
-	name = 'feeds'
\ No newline at end of file
+	name = 'feeds'
+
+	def ready(self) -> None:
+		from . import signals
+		signals.register_all()
\ No newline at end of file
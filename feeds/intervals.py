@@ -0,0 +1,147 @@
+"""
+Sets of time ranges, such as those of the tweets a user has seen
+"""
+
+import datetime
+import json
+
+from django.db.models import Exists, Q
+
+
+# most ranges kept in a set, the oldest ones are folded into its floor
+MAX_INTERVALS = 32
+
+
+class IntervalSet():
+	"""
+	Sorted, disjoint and inclusive [start, end] ranges of datetimes,
+	above a floor everything up to which is in the set. Ranges that
+	overlap or touch are merged as they are added
+	"""
+
+	def __init__(self, intervals= (), floor: datetime.datetime = None) -> None:
+		self._intervals: list[tuple[datetime.datetime, datetime.datetime]] = []
+		self.floor = floor
+		for start, end in intervals:
+			self.add(start, end)
+
+
+	def __iter__(self):
+		return iter(self._intervals)
+
+
+	def __len__(self) -> int:
+		return len(self._intervals)
+
+
+	def __contains__(self, moment: datetime.datetime) -> bool:
+		return (
+			(self.floor is not None and moment <= self.floor)
+			or any(start <= moment <= end for start, end in self._intervals)
+		)
+
+
+	def add(self, start: datetime.datetime, end: datetime.datetime):
+		"""
+		Add the range start to end, merging it with every range it
+		overlaps or touches
+		"""
+		if end < start:
+			start, end = end, start
+		if self.floor is not None and start <= self.floor:
+			self.floor = max(self.floor, end)
+			while self._intervals and self._intervals[0][0] <= self.floor:
+				self.floor = max(self.floor, self._intervals.pop(0)[1])
+			return
+		kept = []
+		for s, e in self._intervals:
+			if e < start or s > end:
+				kept.append((s, e))
+			else:
+				start, end = min(s, start), max(e, end)
+		kept.append((start, end))
+		kept.sort()
+		self._intervals = kept
+
+
+	def compact(self, queryset, field= "created"):
+		"""
+		Merge consecutive ranges with no object of queryset between them,
+		looking every gap up in a single query, then fold the oldest
+		ranges into the floor until at most MAX_INTERVALS are left
+		"""
+		# the floor is a range with no start
+		ranges = [(None, self.floor)] if self.floor else []
+		ranges += self._intervals
+		gaps = list(zip(ranges, ranges[1:]))
+		if gaps:
+			# an EXISTS per gap, each a probe of an index on field
+			found = queryset.model._base_manager.annotate(**{
+				f"gap{i}": Exists(queryset.filter(**{
+					f"{field}__gt": left[1],
+					f"{field}__lt": right[0],
+				}))
+				for i, (left, right) in enumerate(gaps)
+			}).values(*(f"gap{i}" for i in range(len(gaps))))[:1]
+			# without any object at all, no gap holds one
+			found = next(iter(found), {})
+
+			merged = ranges[:1]
+			for i, (_, right) in enumerate(gaps):
+				if found.get(f"gap{i}"):
+					merged.append(right)
+				else:
+					merged[-1] = merged[-1][0], right[1]
+			if merged[0][0] is None:
+				self.floor = merged.pop(0)[1]
+			self._intervals = merged
+		self.fold()
+
+
+	def fold(self, limit= MAX_INTERVALS):
+		"""
+		Raise the floor to the end of the oldest ranges until at most
+		limit are left. Nothing is dropped from the set, the gaps
+		between those ranges join it
+		"""
+		if len(self._intervals) > limit:
+			folded = len(self._intervals) - limit
+			self.floor = self._intervals[folded - 1][1]
+			self._intervals = self._intervals[folded:]
+
+
+	def to_q(self, field= "created") -> Q:
+		"""
+		A single predicate matching every object whose field falls within
+		one of the ranges or below the floor, or None if the set is empty
+		"""
+		q = None if self.floor is None else Q(**{f"{field}__lte": self.floor})
+		for start, end in self._intervals:
+			r = Q(**{f"{field}__range": (start, end)})
+			q = r if q is None else q | r
+		return q
+
+
+	def dumps(self) -> str:
+		"""
+		A list of [start, end] pairs in isoformat, the
+		floor first as a pair with no start
+		"""
+		pairs = [[None, self.floor.isoformat()]] if self.floor else []
+		pairs += [[start.isoformat(), end.isoformat()] for start, end in self._intervals]
+		return json.dumps(pairs)
+
+
+	@classmethod
+	def loads(cls, s: str) -> "IntervalSet":
+		pairs = json.loads(s)
+		floor = None
+		if pairs and pairs[0][0] is None:
+			floor = datetime.datetime.fromisoformat(pairs.pop(0)[1])
+		return cls(
+			(
+				(datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end))
+				for start, end in pairs
+			),
+			floor,
+		)
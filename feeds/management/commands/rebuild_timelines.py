@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from feeds import timeline
+
+
+class Command(BaseCommand):
+	help = (
+		"Fill the home timelines of users with the latest tweets of those "
+		"they follow, and trim them to their size. Run once after the "
+		"timelines are introduced, or to repair them"
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"usernames",
+			nargs= "*",
+			help= "Only rebuild the timelines of these users",
+		)
+
+	def handle(self, *args, **options):
+		users = get_user_model().objects.all()
+		if options["usernames"]:
+			users = users.filter(username__in= options["usernames"])
+			if len(users) != len(options["usernames"]):
+				raise CommandError("Some of these users do not exist")
+
+		n = 0
+		for user in users.iterator():
+			timeline.backfill(user)
+			n += 1
+		self.stdout.write(f"Rebuilt {n} timelines")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from feeds import timeline
+
+
+class Command(BaseCommand):
+	help = (
+		"Drop the entries of every home timeline past its latest "
+		f"{timeline.TIMELINE_SIZE}. New tweets trim the timelines they "
+		"are copied to now and then, run this after lowering the size"
+	)
+
+	def handle(self, *args, **options):
+		timeline.trim()
+		self.stdout.write("Trimmed every timeline")
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .intervals import IntervalSet
+
 
 class Feed(models.Model):
 	user = models.OneToOneField(
@@ -9,9 +11,65 @@ class Feed(models.Model):
 		editable= False,
 	)
 
-	# seen is a json.dumps()ed list of 
-	# datetime pairs in isoformat
+	# seen is an IntervalSet.dumps()ed list of merged datetime
+	# pairs in isoformat, the first with no start if it has a floor
 	seen = models.TextField(
 		"Time ranges of seen tweets",
 		default= "[]",
-	)
\ No newline at end of file
+	)
+
+	def get_seen(self) -> IntervalSet:
+		return IntervalSet.loads(self.seen)
+
+
+	def mark_seen(self, start, end):
+		"""
+		Add the range of tweets from start to end to those seen, merged
+		with those that have no tweet between them. Any tweet may reach
+		the timeline later, when its author is followed
+		"""
+		from tweets.models import Tweet
+
+		seen = self.get_seen()
+		seen.add(start, end)
+		seen.compact(Tweet.objects.filter(in_reply_to__isnull= True))
+		self.seen = seen.dumps()
+		self.save(update_fields= ["seen"])
+
+
+class TimelineEntry(models.Model):
+	"""
+	A tweet in the home timeline of a user, written when the tweet is
+	created for every follower of its author. created is that of the
+	tweet, so a timeline reads in order from the index alone
+	"""
+	user = models.ForeignKey(
+		"users.User",
+		models.CASCADE,
+		related_name= "timeline_entries",
+		editable= False,
+	)
+
+	tweet = models.ForeignKey(
+		"tweets.Tweet",
+		models.CASCADE,
+		related_name= "timeline_entries",
+		editable= False,
+	)
+
+	created = models.DateTimeField("Date the tweet was created")
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(
+				fields= ["user", "tweet"],
+				name= "feeds_timelineentry_unique_user_tweet",
+			),
+		]
+		indexes = [
+			models.Index(
+				fields= ["user", "-created", "-tweet"],
+				name= "feeds_timeline_user_created",
+			),
+		]
+		ordering = ["-created", "-tweet"]
\ No newline at end of file
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import signals
+
+from . import models, timeline
+
+
+def register_all():
+	signals.post_save.connect(
+		_tweet_saved,
+		"tweets.Tweet",
+		dispatch_uid= "f:_tweet_saved"
+	)
+	signals.m2m_changed.connect(
+		_follows_changed,
+		get_user_model().follows.through,
+		dispatch_uid= "f:_follows_changed"
+	)
+
+
+def _tweet_saved(sender, **kwargs):
+	if not kwargs["created"]:
+		return
+
+	instance = kwargs["instance"]
+	transaction.on_commit(lambda: timeline.fan_out(instance))
+
+
+def _follows_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	"""
+	Keep timelines in step with who follows whom. instance follows the
+	users in pk_set, or is followed by them when reverse is set
+	"""
+	if action == "post_add":
+		if reverse:
+			for follower in get_user_model().objects.filter(pk__in= pk_set):
+				timeline.backfill(follower, [instance.pk])
+		else:
+			timeline.backfill(instance, pk_set)
+	elif action == "post_remove":
+		if reverse:
+			models.TimelineEntry.objects.filter(
+				user__in= pk_set,
+				tweet__author= instance,
+			).delete()
+		else:
+			timeline.remove(instance, pk_set)
+	elif action == "post_clear" and not reverse:
+		instance.timeline_entries.all().delete()
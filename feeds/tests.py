@@ -1,3 +1,154 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from tweets.models import Tweet
+from . import timeline
+from .intervals import IntervalSet
+
+
+def _at(hours: float) -> datetime.datetime:
+	return datetime.datetime(2024, 1, 1, tzinfo= datetime.timezone.utc) + datetime.timedelta(hours= hours)
+
+
+class IntervalSetTests(SimpleTestCase):
+
+	def test_add_merges_overlapping_and_touching_ranges(self):
+		s = IntervalSet()
+		s.add(_at(0), _at(2))
+		s.add(_at(5), _at(6))
+		s.add(_at(2), _at(3))
+		s.add(_at(4), _at(1))
+		self.assertEqual(list(s), [(_at(0), _at(4)), (_at(5), _at(6))])
+
+
+	def test_contains(self):
+		s = IntervalSet([(_at(0), _at(1))], floor= _at(-5))
+		self.assertIn(_at(0.5), s)
+		self.assertIn(_at(-10), s)
+		self.assertNotIn(_at(-2), s)
+		self.assertNotIn(_at(2), s)
+
+
+	def test_add_below_floor_raises_it(self):
+		s = IntervalSet([(_at(2), _at(3)), (_at(6), _at(7))], floor= _at(0))
+		s.add(_at(-1), _at(2))
+		self.assertEqual(s.floor, _at(3))
+		self.assertEqual(list(s), [(_at(6), _at(7))])
+
+
+	def test_fold_keeps_every_range(self):
+		s = IntervalSet((_at(i * 2), _at(i * 2 + 1)) for i in range(10))
+		s.fold(4)
+		self.assertEqual(len(s), 4)
+		self.assertEqual(s.floor, _at(11))
+		for i in range(10):
+			self.assertIn(_at(i * 2 + 0.5), s)
+
+
+	def test_dumps_round_trip(self):
+		s = IntervalSet([(_at(0), _at(1)), (_at(3), _at(4))], floor= _at(-2))
+		loaded = IntervalSet.loads(s.dumps())
+		self.assertEqual(list(loaded), list(s))
+		self.assertEqual(loaded.floor, s.floor)
+
+
+	def test_loads_sets_saved_without_floor(self):
+		s = IntervalSet.loads(f'[["{_at(0).isoformat()}", "{_at(1).isoformat()}"]]')
+		self.assertIsNone(s.floor)
+		self.assertEqual(list(s), [(_at(0), _at(1))])
+
+
+	def test_to_q_of_empty_set(self):
+		self.assertIsNone(IntervalSet().to_q())
+
+
+class IntervalSetCompactTests(TestCase):
+
+	def setUp(self):
+		self.author = get_user_model().objects.create_user(
+			username= "author", email= "author@example.com", password= "password",
+		)
+
+
+	def _tweet(self, hours: float) -> Tweet:
+		tweet = Tweet.objects.create(author= self.author, text= "tweet", modified= timezone.now())
+		Tweet.objects.filter(pk= tweet.pk).update(created= _at(hours))
+		return tweet
+
+
+	def test_merges_empty_gaps_only(self):
+		self._tweet(3.5)
+		s = IntervalSet([(_at(0), _at(1)), (_at(2), _at(3)), (_at(4), _at(5))])
+		with self.assertNumQueries(1):
+			s.compact(Tweet.objects.all())
+		self.assertEqual(list(s), [(_at(0), _at(3)), (_at(4), _at(5))])
+
+
+	def test_compacts_before_folding(self):
+		self._tweet(9.5)
+		self._tweet(41.5)
+		# more ranges than are kept, but only two gaps hold a tweet
+		s = IntervalSet((_at(i * 2), _at(i * 2 + 1)) for i in range(40))
+		s.compact(Tweet.objects.all())
+		self.assertEqual(list(s), [(_at(0), _at(9)), (_at(10), _at(41)), (_at(42), _at(79))])
+		self.assertIsNone(s.floor)
+
+
+	def test_floor_merges_with_the_range_above_it(self):
+		s = IntervalSet([(_at(2), _at(3))], floor= _at(0))
+		s.compact(Tweet.objects.all())
+		self.assertEqual(s.floor, _at(3))
+		self.assertEqual(len(s), 0)
+
+
+class FeedQueryTests(TestCase):
+
+	def test_queries_do_not_grow_with_tweets(self):
+		User = get_user_model()
+		author, viewer = (
+			User.objects.create_user(username= name, email= f"{name}@example.com", password= "password")
+			for name in ("author", "viewer")
+		)
+		viewer.follows.add(author)
+		self.client.force_login(viewer)
+		# the feed is created on the first visit
+		self.client.get(reverse("feeds:feed"))
+
+		for n in (1, 10):
+			# tweets reach the timeline once committed
+			with self.captureOnCommitCallbacks(execute= True):
+				while author.tweets.count() < n:
+					tweet = Tweet.objects.create(author= author, text= "tweet", modified= timezone.now())
+					Tweet.objects.create(author= viewer, text= "retweet", modified= timezone.now(), in_retweet_to= tweet)
+					tweet.likes.add(viewer)
+			with self.assertNumQueries(10):
+				response = self.client.get(reverse("feeds:feed"))
+			self.assertEqual(response.status_code, 200)
+			self.assertEqual(len(response.context["tweets"]), n)
+
+
+class TimelineTrimTests(TestCase):
+
+	@mock.patch.object(timeline, "TIMELINE_SIZE", 3)
+	@mock.patch.object(timeline, "TRIM_EVERY", 1)
+	def test_fan_out_trims_follower_timelines(self):
+		User = get_user_model()
+		author, follower = (
+			User.objects.create_user(username= name, email= f"{name}@example.com", password= "password")
+			for name in ("author", "follower")
+		)
+		follower.follows.add(author)
+		with self.captureOnCommitCallbacks(execute= True):
+			tweets = [
+				Tweet.objects.create(author= author, text= "tweet", modified= timezone.now())
+				for _ in range(5)
+			]
+		self.assertEqual(
+			list(follower.timeline_entries.order_by("-created", "-tweet_id").values_list("tweet_id", flat= True)),
+			[tweet.pk for tweet in reversed(tweets[2:])],
+		)
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Home timelines written on tweet creation. A tweet is copied to the
+timeline of every follower of its author when it is saved, so reading
+a feed is one range of an index, however many users are followed.
+Authors with more than CELEBRITY_FOLLOWERS followers are not copied,
+their tweets are merged in when the feed is read
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from tweets.models import Tweet
+from twitterx import pagination
+from . import models
+
+
+# most entries kept in a timeline, older tweets drop out of the feed
+TIMELINE_SIZE = getattr(settings, "FEEDS_TIMELINE_SIZE", 800)
+
+# followers from which an author's tweets are read with the feed
+# instead of copied to every timeline
+CELEBRITY_FOLLOWERS = getattr(settings, "FEEDS_CELEBRITY_FOLLOWERS", 10_000)
+
+# one tweet in this many trims the timelines it is copied to, so
+# timelines stay within about this many entries past TIMELINE_SIZE
+TRIM_EVERY = getattr(settings, "FEEDS_TRIM_EVERY", 50)
+
+_CELEBRITIES_KEY = "feeds:celebrities"
+
+_CELEBRITIES_TIMEOUT = 300
+
+_BATCH_SIZE = 1000
+
+
+def celebrities() -> set:
+	"""
+	The pks of authors whose tweets are not copied, cached for a while
+	"""
+	pks = cache.get(_CELEBRITIES_KEY)
+	if pks is None:
+		pks = set(
+			get_user_model().objects.annotate(n= Count("followers"))
+			.filter(n__gt= CELEBRITY_FOLLOWERS)
+			.values_list("pk", flat= True)
+		)
+		cache.set(_CELEBRITIES_KEY, pks, _CELEBRITIES_TIMEOUT)
+	return pks
+
+
+def fan_out(tweet: Tweet):
+	"""
+	Copy a new tweet to the timeline of every follower of its author.
+	Every TRIM_EVERY-th tweet also trims those timelines, rather than
+	every tweet paying for a DELETE
+	"""
+	if tweet.in_reply_to_id or tweet.author_id in celebrities():
+		return
+	followers = tweet.author.followers.values_list("pk", flat= True)
+	models.TimelineEntry.objects.bulk_create(
+		[
+			models.TimelineEntry(user_id= pk, tweet= tweet, created= tweet.created)
+			for pk in followers.iterator()
+		],
+		batch_size= _BATCH_SIZE,
+		ignore_conflicts= True,
+	)
+	if tweet.pk % TRIM_EVERY == 0:
+		trim(followers)
+
+
+def backfill(user, authors= None):
+	"""
+	Copy the latest tweets of authors, or of everyone user follows,
+	to the timeline of user
+	"""
+	if authors is None:
+		authors = user.follows.values_list("pk", flat= True)
+	tweets = Tweet.objects.filter(
+		author__in= authors,
+		in_reply_to__isnull= True,
+	).exclude(author__in= celebrities()).values_list("pk", "created")[:TIMELINE_SIZE]
+	models.TimelineEntry.objects.bulk_create(
+		[
+			models.TimelineEntry(user= user, tweet_id= pk, created= created)
+			for pk, created in tweets
+		],
+		batch_size= _BATCH_SIZE,
+		ignore_conflicts= True,
+	)
+	trim([user.pk])
+
+
+def remove(user, authors):
+	"""
+	Drop the tweets of authors from the timeline of user
+	"""
+	models.TimelineEntry.objects.filter(user= user, tweet__author__in= authors).delete()
+
+
+def trim(users= None):
+	"""
+	Drop the entries older than the TIMELINE_SIZE latest of the timeline
+	of every user in users, a list of pks or a queryset of them, or of
+	everyone. Entries as old as the last one kept are kept too. This is
+	a single DELETE, each timeline is looked up by a range of its index
+	"""
+	oldest_kept = models.TimelineEntry.objects.filter(
+		user= OuterRef("user"),
+	).order_by("-created", "-tweet_id").values("created")[TIMELINE_SIZE - 1:TIMELINE_SIZE]
+	entries = models.TimelineEntry.objects.all()
+	if users is not None:
+		entries = entries.filter(user__in= users)
+	entries.filter(created__lt= Subquery(oldest_kept)).delete()
+
+
+class TimelinePaginator():
+	"""
+	Keyset pages of the home timeline of user: a range of the index
+	of its entries, merged with a range of the tweets of the celebrities
+	user follows. Tweets are then loaded from tweets, a queryset of
+	them, and those matching exclude are left out
+	"""
+
+	def __init__(self, user, tweets, per_page= pagination.PAGE_SIZE, exclude: Q = None) -> None:
+		self.user = user
+		self.tweets = tweets
+		self.per_page = per_page
+		self.exclude = exclude
+
+
+	def _range(self, queryset, cursor: str, pk: str) -> list[tuple]:
+		"""
+		The (created, tweet pk) pairs of a page of queryset and one more
+		"""
+		if self.exclude:
+			queryset = queryset.exclude(self.exclude)
+		queryset = pagination.after(queryset, cursor, pk= pk)
+		return list(queryset.order_by("-created", f"-{pk}").values_list(
+			"created", pk
+		)[:self.per_page + 1])
+
+
+	def page(self, cursor: str = None) -> pagination.KeysetPage:
+		"""
+		The page following cursor, or the first one if cursor is None
+		"""
+		keys = self._range(
+			models.TimelineEntry.objects.filter(user= self.user),
+			cursor,
+			"tweet_id",
+		)
+		followed = []
+		if celebrities():
+			followed = list(
+				self.user.follows.filter(pk__in= celebrities()).values_list("pk", flat= True)
+			)
+		if followed:
+			# a tweet copied before its author became a celebrity is in both
+			keys = sorted({*keys, *self._range(
+				Tweet.objects.filter(
+					author__in= followed,
+					in_reply_to__isnull= True,
+				),
+				cursor,
+				"pk",
+			)}, reverse= True)
+
+		page, rest = keys[:self.per_page], keys[self.per_page:]
+		tweets = self.tweets.in_bulk([pk for _, pk in page])
+		return pagination.KeysetPage(
+			[tweets[pk] for _, pk in page if pk in tweets],
+			pagination.encode(*page[-1]) if rest else None,
+		)
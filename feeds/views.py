@@ -1,18 +1,15 @@
-import json
-
 from django.views import generic
 from django.contrib.auth import mixins
 from django.urls import reverse_lazy
 
+from tweets.loader import TweetListMixin
 from tweets.models import Tweet
-from . import models
+from twitterx.pagination import KeysetPaginationMixin
+from . import models, timeline
 
 
-# TODO add reliable way to determine seen tweets and add
-# times to user.feed.seen (front-end work, probably)
-# TODO efficiently merge intervals in user.feed.seen
-# when there isn't an obvious overlap, but no tweet
-# created in-between
+# TODO add reliable way to determine seen tweets and call
+# user.feed.mark_seen() (front-end work, probably)
 
 LOGIN_URL = reverse_lazy("users:login")
 
@@ -30,7 +27,7 @@ def _ensure_feed(user):
 		models.Feed.objects.create(user= user)
 
 
-class Feed(mixins.LoginRequiredMixin, generic.ListView):
+class Feed(mixins.LoginRequiredMixin, TweetListMixin, KeysetPaginationMixin, generic.ListView):
 	template_name: str = "feeds/feed.html"
 	context_object_name = "tweets"
 	login_url = LOGIN_URL
@@ -38,10 +35,13 @@ class Feed(mixins.LoginRequiredMixin, generic.ListView):
 
 	def get_queryset(self):
 		_ensure_feed(self.request.user)
-		q = Tweet.objects.filter(
-			author__in= self.request.user.follows.all(),
-			in_reply_to__isnull= True,
-		)
-		for pair in json.loads(self.request.user.feed.seen):
-			q = q.exclude(created__range= pair)
-		return q
\ No newline at end of file
+		return Tweet.objects.all()
+
+
+	def get_paginator(self, queryset, per_page, **kwargs):
+		return timeline.TimelinePaginator(
+			self.request.user,
+			queryset,
+			per_page,
+			exclude= self.request.user.feed.get_seen().to_q(),
+		)
\ No newline at end of file
@@ -143,6 +143,24 @@ MEDIA_ROOT = BASE_DIR / "media/"
 
 MEDIA_URL = "media/"
 
+# "local" runs trends in-process, without a redis server
+TRENDS_BACKEND = os.getenv("TRENDS_BACKEND", "redis")
+
+# run the trends loop inside the web processes rather than in a separate
+# `manage.py run_trends` worker, handy with runserver. With the local
+# backend only the first process of the host runs it either way
+TRENDS_EMBEDDED = os.getenv("TRENDS_EMBEDDED", "False") == "True"
+
+# partitions the objects of every kind are split into, so that as many
+# trend workers share each kind. Changing it starts counting anew
+TRENDS_PARTITIONS = int(os.getenv("TRENDS_PARTITIONS", 1))
+
+# where the local backend keeps its log of trend events
+TRENDS_LOG_DIR = os.getenv("TRENDS_LOG_DIR", BASE_DIR / "trends-log")
+
+# where the local backend saves the state of its listeners
+TRENDS_STATE_DIR = os.getenv("TRENDS_STATE_DIR", BASE_DIR / "trends-state")
+
 REDIS_URL = os.getenv("REDIS_URL")
 if REDIS_URL:
     REDIS_HOST = REDIS_URL[:REDIS_URL.rfind(":")]
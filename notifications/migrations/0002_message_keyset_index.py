@@ -0,0 +1,17 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['box', '-created', '-id'], name='notifications_box_created_id'),
+        ),
+    ]
@@ -42,6 +42,10 @@ class Message(models.Model):
 
 	class Meta:
 		ordering = ["-created"]
+		# keyset pagination reads pages in (created, id) order
+		indexes = [
+			models.Index(fields= ["box", "-created", "-id"], name= "notifications_box_created_id"),
+		]
 	
 
 	def __str__(self) -> str:
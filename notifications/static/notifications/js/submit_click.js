@@ -1,12 +1,17 @@
-var elems = document.getElementsByClassName("submit-on-click");
-for(let i = 0; i < elems.length; ++i){
-	let button = elems[i];
-	button.addEventListener("click", function (e) {
-		e.preventDefault();
-		submit_click(this);
-	});
+function bind_submit_click(root){
+	var elems = root.getElementsByClassName("submit-on-click");
+	for(let i = 0; i < elems.length; ++i){
+		let button = elems[i];
+		button.addEventListener("click", function (e) {
+			e.preventDefault();
+			submit_click(this);
+		});
+	}
 }
 
+bind_submit_click(document);
+document.addEventListener("page-loaded", e => bind_submit_click(e.detail));
+
 function submit_click(button){
 	var form = document.createElement('form');
 	form.setAttribute('method', 'post');
@@ -3,6 +3,7 @@ from django.contrib.auth import mixins
 from django.urls import reverse, reverse_lazy
 from django import http
 
+from twitterx.pagination import KeysetPaginationMixin
 from . import models
 
 
@@ -21,7 +22,7 @@ def _ensure_box(user):
 		models.NotificationBox.objects.create(user= user)
 
 
-class Notifications(mixins.LoginRequiredMixin, generic.ListView):
+class Notifications(mixins.LoginRequiredMixin, KeysetPaginationMixin, generic.ListView):
 	login_url = LOGIN_URL
 	redirect_field_name = REDIRECT_FIELD_NAME
 	context_object_name = "messages"
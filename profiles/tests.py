@@ -1,3 +1,38 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from tweets.models import Tweet
+
+
+class ProfileQueryTests(TestCase):
+
+	def setUp(self):
+		User = get_user_model()
+		self.author, self.viewer = (
+			User.objects.create_user(username= name, email= f"{name}@example.com", password= "password")
+			for name in ("author", "viewer")
+		)
+		self.viewer.follows.add(self.author)
+		self.client.force_login(self.viewer)
+
+
+	def _assert_constant(self, url: str, queries: int):
+		for n in (1, 10):
+			while self.author.tweets.count() < n:
+				tweet = Tweet.objects.create(author= self.author, text= "tweet", modified= timezone.now())
+				Tweet.objects.create(author= self.viewer, text= "reply", modified= timezone.now(), in_reply_to= tweet)
+				tweet.likes.add(self.viewer)
+			with self.assertNumQueries(queries):
+				response = self.client.get(url)
+			self.assertEqual(response.status_code, 200)
+			self.assertEqual(len(response.context["tweets"]), n)
+
+
+	def test_profile(self):
+		self._assert_constant(reverse("profiles:profile", kwargs= {"username": self.author.username}), 13)
+
+
+	def test_likes(self):
+		self._assert_constant(reverse("profiles:likes", kwargs= {"username": self.viewer.username}), 11)
\ No newline at end of file
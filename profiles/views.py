@@ -1,10 +1,14 @@
 from django.views import generic
 from django.contrib.auth import logout, mixins, get_user_model
+from django.db.models import F
 from django.urls import reverse_lazy
 from django import http
 
 from . import forms, image
 from notifications.signals import notify_follow, notify_unfollow
+from tweets import loader
+from tweets.models import Tweet
+from twitterx.pagination import KeysetPaginator
 
 # TODO fix invalid form data leaking to template context in EditProfile
 # TODO add in-ui image cropping and allow only square images
@@ -26,10 +30,27 @@ class Profile(generic.DetailView):
 	slug_field: str = "username"
 	slug_url_kwarg: str = "username"
 	active_keyword = "is_profile"
+	cursor_kwarg = "after"
+	# what the tweets are paged by, descending
+	page_field = "created"
+	page_pk = "pk"
+
+	def get_tweets(self):
+		return self.object.get_timeline_tweets()
+
 
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
 		context[self.active_keyword] = "active"
+		page = KeysetPaginator(
+			loader.prepare(self.get_tweets()),
+			field= self.page_field,
+			pk= self.page_pk,
+		).page(
+			self.request.GET.get(self.cursor_kwarg)
+		)
+		context["tweets"] = loader.attach(page.object_list, self.request.user)
+		context["page_obj"] = page
 		return context
 
 
@@ -37,10 +58,24 @@ class ProfileWithReplies(Profile):
 	template_name: str = "profiles/profile_with_replies.html"
 	active_keyword = "is_with_replies"
 
+	def get_tweets(self):
+		return self.object.tweets.all()
+
 
 class ProfileLikes(Profile):
 	template_name: str = "profiles/profile_likes.html"
 	active_keyword = "is_likes"
+	page_field = "liked"
+	page_pk = "like_pk"
+
+	def get_tweets(self):
+		"""
+		The liked tweets, newest like first, read off the likes index
+		"""
+		return Tweet.objects.filter(like__user= self.object).annotate(
+			liked= F("like__created"),
+			like_pk= F("like__pk"),
+		)
 
 
 class EditProfile(mixins.LoginRequiredMixin, generic.UpdateView):
@@ -1,18 +1,38 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 
+def _runs_command() -> bool:
+	"""
+	Whether this process runs a manage.py command other than runserver
+	"""
+	return os.path.basename(sys.argv[0]) == "manage.py" and sys.argv[1:2] != ["runserver"]
+
+
 class TrendsConfig(AppConfig):
 	default_auto_field = 'django.db.models.BigAutoField'
 	name = 'trends'
 
 	def ready(self) -> None:
 		from trends import signals
-		from trends.core import ACTIVE, loop
+		from trends.core import ACTIVE, loop, shard
 
 		if ACTIVE:
-			loop.start()
+			# otherwise web processes only append events to the ingest
+			# log, and `manage.py run_trends` is the one process writing
+			# trends. Of the web processes sharing the local backend, the
+			# first to claim it runs the loop and the others read it
+			if (
+				getattr(settings, "TRENDS_EMBEDDED", False)
+				and not _runs_command()
+				and shard.claim()
+			):
+				loop.start()
 
 			@receiver(post_save, sender= "tweets.Tweet", dispatch_uid= "new_tweet", weak= False)
 			def new_tweet(sender, **kwargs):
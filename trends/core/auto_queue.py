@@ -1,9 +1,10 @@
-from abc import ABC
+from abc import ABC, abstractmethod
 import asyncio
 from collections import deque
 from typing import Type
 
-from trends.core.redis_object import RedisObject
+from trends.core.client import get_pipe
+from trends.core.redis_object import RedisObject, delete_all
 
 
 class AutoQueue(ABC):
@@ -13,11 +14,20 @@ class AutoQueue(ABC):
 	deque (oldest one) and an interface to add elements to all simultaneously
 
 	Objects nearer the top are older and will be removed sooner
+
+	A bucketed AutoQueue instead only adds elements to the newest object,
+	so each object holds a single bucket of the window, and answers get()
+	by merging all the buckets. Subclasses supporting this implement _merge()
+
+	Every object is tagged with the epoch, a numbered slice of wall-clock
+	time, it was started in. An object stays in the queue until maxlen
+	epochs have passed since, whether or not the epochs in between saw
+	any events
 	"""
 
 	object_class: Type[RedisObject]
 
-	def __init__(self, maxlen= 5, **kwargs) -> None:
+	def __init__(self, maxlen= 5, bucketed= True, **kwargs) -> None:
 		"""
 		Initialize an AutoQueue with a maxsize of maxlen
 		kwargs should be parameters for making RedisObjects
@@ -25,53 +35,131 @@ class AutoQueue(ABC):
 		use make() instead
 		"""
 		self._deque: deque[RedisObject] = deque(maxlen= maxlen)
+		# epoch of each object in _deque
+		self._epochs: deque[int] = deque(maxlen= maxlen)
+		self._bucketed = bucketed
 		self._params = kwargs
 		self._lock = asyncio.Lock()
+		# replaced whenever the contents may have changed
+		self._version = object()
 	
 
 	@classmethod
-	async def make(cls, **kwargs):
+	async def make(cls, epoch: int, **kwargs):
 		obj = cls(**kwargs)
-		await obj.signal()
+		await obj.advance(epoch)
 		return obj
 
 
+	def _targets(self):
+		"""
+		The objects that new elements are written to
+		"""
+		if self._bucketed:
+			return [self._deque[-1]] if self._deque else []
+		return list(self._deque)
+	
+
 	async def add(self, obj, pipe= None) -> None:
 		"""
-		Add obj to all elements in queue
+		Add obj to all elements in queue, or only the newest if bucketed
 		"""
 		async with self._lock:
-			for r in self._deque:
+			for r in self._targets():
 				await r.add(obj, pipe)
+			self._version = object()
+	
+
+	async def stage(self, counts, batch) -> None:
+		"""
+		Stage counts for all elements in queue on a CommandBatch,
+		or only for the newest if bucketed
+		"""
+		if not counts:
+			return
+		async with self._lock:
+			for r in self._targets():
+				await r.stage(counts, batch)
+			batch.assign(self, "_version", object())
 	
 
-	async def get(self):
+	async def get(self, *args):
 		"""
-		Get from oldest RedisObject in queue
+		Get from oldest RedisObject in queue, or merge
+		the results of all of them if bucketed
 		"""
+		if self._bucketed:
+			return self._merge(await self._query_all(*args))
 		async with self._lock:
-			return await self._deque[0].get()
+			return await self._deque[0].get(*args)
 	
 
-	async def signal(self) -> None:
+	async def _query_all(self, *args) -> list:
 		"""
-		Create a new RedisObject, discarding any overflows
+		Query every live object in the deque in one round trip
+		Objects whose keys have gone missing are left out
+		"""
+		pipe = get_pipe()
+		async with self._lock:
+			for r in self._deque:
+				if await r.ensure_valid():
+					await r.query(pipe, *args)
+		return [
+			res for res in await pipe.execute(raise_on_error= False)
+			if not isinstance(res, Exception)
+		]
+	
+
+	@abstractmethod
+	def _merge(self, results: list):
+		"""
+		Merge the results of query() on every bucket into one
+		"""
+		...
+	
+
+	async def advance(self, epoch: int, pipe= None) -> RedisObject | None:
+		"""
+		Start a new RedisObject for epoch, unless there already is one.
+		Every object that epoch leaves out of the window is deleted in one
+		go, so a queue that missed any number of epochs catches up at once
+
+		If pipe is passed, commands are only queued on it and the new
+		object, which is returned, is valid once the pipe has executed
 		"""
-		if len(self._deque) == self._deque.maxlen:
-			await self._deque[0].delete()
 		async with self._lock:
-			self._deque.append(await self.object_class.make(**self._params))
+			if self._epochs and self._epochs[-1] >= epoch:
+				return None
+			expired = []
+			while self._epochs and self._epochs[0] <= epoch - self._deque.maxlen:
+				self._epochs.popleft()
+				expired.append(self._deque.popleft())
+			r = await self.object_class.make(pipe= pipe, **self._params)
+			self._deque.append(r)
+			self._epochs.append(epoch)
+			self._version = object()
+		await delete_all(expired, pipe)
+		return r
 	
 
 	@classmethod
-	async def construct(cls, obj: dict):
+	async def construct(cls, obj: dict, epoch: int):
 		"""
 		Construct an autoqueue from an old autoqueue state
 		"""
-		aq = cls(maxlen= obj["maxlen"], **obj["_params"])
+		aq = cls(
+			maxlen= obj["maxlen"],
+			# older states copied every element into every object
+			bucketed= obj.get("bucketed", False),
+			**obj["_params"]
+		)
+		# older states did not record epochs, take their objects
+		# to be the latest ones up to epoch
+		epochs = obj.get("_epochs") or range(epoch - len(obj["_deque"]) + 1, epoch + 1)
 		async with aq._lock:
 			for r in obj["_deque"]:
 				aq._deque.append(await cls.object_class.construct(r))
+			aq._epochs.extend(epochs)
 		return aq
 
 	
@@ -82,6 +170,8 @@ class AutoQueue(ABC):
 		"""
 		return {
 			"_deque": [r.deconstruct() for r in self._deque],
+			"_epochs": list(self._epochs),
 			"maxlen": self._deque.maxlen,
+			"bucketed": self._bucketed,
 			"_params": self._params,
 		}
\ No newline at end of file
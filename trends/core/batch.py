@@ -0,0 +1,125 @@
+"""
+Collect redis commands for many RedisObjects so they
+can be sent together in a single round trip
+"""
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class CommandBatch():
+	"""
+	Group pending writes by key, so each key costs at most one
+	multi-item command no matter how many objects were staged
+	for it. Nothing is sent until execute() is called
+	"""
+
+	def __init__(self) -> None:
+		self._cms: defaultdict[str, Counter] = defaultdict(Counter)
+		self._zset: defaultdict[str, Counter] = defaultdict(Counter)
+		self._zscale: dict[str, float] = dict()
+		self._hset: defaultdict[str, dict] = defaultdict(dict)
+		# (obj, attr, value) set once the staged commands have been sent
+		self._assigned: list[tuple] = []
+
+
+	def __len__(self) -> int:
+		return (
+			len(self._cms) + len(self._zset)
+			+ len(self._zscale) + len(self._hset)
+		)
+
+
+	def cms_incrby(self, key: str, counts: Counter) -> None:
+		"""
+		Stage a CMS.INCRBY of every obj in counts to key
+		"""
+		self._cms[key].update(counts)
+
+
+	def zincrby(self, key: str, counts: Counter) -> None:
+		"""
+		Stage a ZINCRBY of every obj in counts to key
+		"""
+		self._zset[key].update(counts)
+
+
+	def zscale(self, key: str, factor: float) -> None:
+		"""
+		Stage a multiplication of every score in key by factor,
+		sent before any ZINCRBY to key
+		"""
+		self._zscale[key] = self._zscale.get(key, 1) * factor
+		staged = self._zset.get(key)
+		if staged:
+			for obj in staged:
+				staged[obj] *= factor
+
+
+	def hset(self, key: str, mapping: dict) -> None:
+		"""
+		Stage an HSET of mapping to key
+		"""
+		self._hset[key].update(mapping)
+
+
+	def assign(self, obj, attr: str, value) -> None:
+		"""
+		Set obj.attr to value once the batch has been sent, for state
+		that may only change if the staged commands went through
+		"""
+		self._assigned.append((obj, attr, value))
+
+
+	def executed(self) -> None:
+		"""
+		Tell the batch its commands went through. Attributes
+		are only ever assigned once
+		"""
+		assigned, self._assigned = self._assigned, []
+		for obj, attr, value in assigned:
+			setattr(obj, attr, value)
+
+
+	@contextmanager
+	def applied(self):
+		"""
+		Assign the staged attributes for the duration of the block and
+		put the old values back after, to read objects as they will be
+		once the batch has been sent
+		"""
+		old = [(obj, attr, getattr(obj, attr)) for obj, attr, _ in self._assigned]
+		for obj, attr, value in self._assigned:
+			setattr(obj, attr, value)
+		try:
+			yield
+		finally:
+			for obj, attr, value in reversed(old):
+				setattr(obj, attr, value)
+
+
+	async def queue(self, pipe) -> None:
+		"""
+		Queue every staged command on pipe without executing it. The
+		batch is left as it is, so a transaction that failed may queue
+		it again
+		"""
+		for key, counts in self._cms.items():
+			await pipe.cms().incrby(key, list(counts), list(counts.values()))
+		for key, factor in self._zscale.items():
+			await pipe.zunionstore(key, {key: factor})
+		for key, counts in self._zset.items():
+			for obj, increment in counts.items():
+				await pipe.zincrby(key, increment, obj)
+		for key, mapping in self._hset.items():
+			await pipe.hset(key, mapping= mapping)
+
+
+	async def execute(self, pipe) -> None:
+		"""
+		Queue every staged command on pipe and send them all
+		in one round trip
+		"""
+		await self.queue(pipe)
+		await pipe.execute()
+		self.executed()
@@ -0,0 +1,156 @@
+"""
+A cache for values that are expensive to compute and
+acceptable to serve a little stale
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import threading
+import time
+
+from trends.core import metrics
+
+
+_requests = metrics.counter(
+	"trends_cache_requests_total",
+	"Cache lookups, by whether the entry was fresh, stale or missing",
+	("cache", "result"),
+)
+
+_age = metrics.histogram(
+	"trends_cache_age_seconds",
+	"Age of the entries served from a cache",
+	("cache",),
+	buckets= (1, 2, 5, 10, 20, 30, 60, 120, 300),
+)
+
+
+class StaleCache():
+	"""
+	A size bounded LRU cache whose entries go stale after timeout seconds.
+	A missing key is computed once, however many threads ask for it at the
+	same time. A stale key keeps being served while a single background
+	refresh replaces it.
+
+	If alias names a cache in settings.CACHES, entries are stored there
+	instead, so they are shared by every process using that cache.
+	name labels the metrics of this cache
+	"""
+
+	def __init__(self, maxsize= 256, timeout= 10, alias= None, name= "default") -> None:
+		self._name = name
+		self._maxsize = maxsize
+		self._timeout = timeout
+		self._alias = alias
+		self._entries: OrderedDict = OrderedDict()
+		self._inflight: dict[object, Future] = dict()
+		self._lock = threading.Lock()
+		self._executor = ThreadPoolExecutor(
+			max_workers= 2,
+			thread_name_prefix= "stale-cache",
+		)
+
+
+	def get(self, key, compute, use_cache= True):
+		"""
+		Return the value cached for key, calling compute() to
+		produce it when it is missing or use_cache is False
+		"""
+		if not use_cache:
+			return self._compute(key, compute)
+
+		entry = self._load(key)
+		if entry is None:
+			_requests.inc(cache= self._name, result= "miss")
+			return self._compute(key, compute)
+
+		value, stamp = entry
+		age = time.time() - stamp
+		_age.observe(age, cache= self._name)
+		if age > self._timeout:
+			_requests.inc(cache= self._name, result= "stale")
+			self._refresh(key, compute)
+		else:
+			_requests.inc(cache= self._name, result= "hit")
+		return value
+
+
+	def _compute(self, key, compute):
+		"""
+		Compute key in this thread, or wait for the
+		thread already computing it
+		"""
+		with self._lock:
+			future = self._inflight.get(key)
+			owner = future is None
+			if owner:
+				future = self._inflight[key] = Future()
+
+		if not owner:
+			return future.result()
+
+		try:
+			value = compute()
+			self._store(key, value)
+			future.set_result(value)
+			return value
+		except BaseException as e:
+			future.set_exception(e)
+			raise
+		finally:
+			with self._lock:
+				del self._inflight[key]
+
+
+	def _refresh(self, key, compute):
+		"""
+		Recompute key in the background, unless that is already happening
+		"""
+		with self._lock:
+			if key in self._inflight:
+				return
+		if self._alias and not self._shared().add(self._lock_key(key), 1, self._timeout):
+			# another process is refreshing it
+			return
+		self._executor.submit(self._compute, key, compute)
+
+
+	def _load(self, key):
+		if self._alias:
+			return self._shared().get(self._shared_key(key))
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				self._entries.move_to_end(key)
+			return entry
+
+
+	def _store(self, key, value):
+		if self._alias:
+			self._shared().set(
+				self._shared_key(key),
+				(value, time.time()),
+				# evict entries nobody has asked for in a while
+				self._timeout * 10,
+			)
+			self._shared().delete(self._lock_key(key))
+			return
+		with self._lock:
+			self._entries[key] = value, time.time()
+			self._entries.move_to_end(key)
+			while len(self._entries) > self._maxsize:
+				self._entries.popitem(last= False)
+
+
+	def _shared(self):
+		from django.core.cache import caches
+		return caches[self._alias]
+
+
+	def _shared_key(self, key) -> str:
+		return "stale-cache:" + hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+	def _lock_key(self, key) -> str:
+		return self._shared_key(key) + ":lock"
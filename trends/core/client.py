@@ -1,17 +1,30 @@
 import asyncio
 import atexit
+import redis as blocking_redis
 import redis.asyncio as redis
 
 from django.conf import settings
 
+from trends.core.local import LocalClient
+
 
 ACTIVE = False
 _client = None
+_blocking_client = None
+_binary_client = None
+
+# "redis" for a RedisBloom server, "local" for the in-process backend
+BACKEND = getattr(settings, "TRENDS_BACKEND", "redis")
 
 host = getattr(settings, "REDIS_HOST", None)
 port = getattr(settings, "REDIS_PORT", None)
 
-if host and port:
+# the in-process backend needs no server to be reachable, the
+# redis one is only active once a server is configured
+if BACKEND == "local":
+	_client = LocalClient()
+	ACTIVE = True
+elif host and port:
 	_client = redis.Redis(
 		host= host,
 		port= port,
@@ -19,11 +32,8 @@ if host and port:
 	)
 	ACTIVE = True
 
-# temporarily disable trends app
-ACTIVE = False
 
-
-def get_global_client() -> redis.Redis:
+def get_global_client() -> redis.Redis | LocalClient:
 	global _client
 	return _client
 
@@ -32,6 +42,32 @@ def get_pipe():
 	return get_global_client().pipeline()
 
 
+def get_binary_client() -> redis.Redis:
+	"""
+	A client whose replies are left as bytes, for reading values
+	that are not text
+	"""
+	global _binary_client
+	if _binary_client is None:
+		_binary_client = redis.Redis(host= host, port= port)
+	return _binary_client
+
+
+def get_blocking_client() -> blocking_redis.Redis:
+	"""
+	A synchronous client to the same server, for code
+	running outside the trends loop
+	"""
+	global _blocking_client
+	if _blocking_client is None:
+		_blocking_client = blocking_redis.Redis(
+			host= host,
+			port= port,
+			decode_responses= True,
+		)
+	return _blocking_client
+
+
 @atexit.register
 def exit():
 	"""
@@ -41,12 +41,17 @@ class Clock(TaskManager):
 		self._interval = interval
 		self._kwargs = kwargs
 		self._running = False	
+		self._stopped: asyncio.Event = None
 	
 
 	async def _run(self) -> None:
 		while self._running:
 			await self._callback(**self._kwargs)
-			await asyncio.sleep(self._interval)
+			try:
+				# wake up early if stopped, so the loop can exit promptly
+				await asyncio.wait_for(self._stopped.wait(), self._interval)
+			except asyncio.TimeoutError:
+				pass
 	
 
 	def start(self) -> None:
@@ -56,6 +61,7 @@ class Clock(TaskManager):
 		if self._running:
 			return
 		self._running = True
+		self._stopped = asyncio.Event()
 		self.make_task(self._run())
 
 
@@ -64,4 +70,6 @@ class Clock(TaskManager):
 		Stop the clock from emitting more signals. 
 		Clock may be restarted later with start()
 		"""
-		self._running = False
\ No newline at end of file
+		self._running = False
+		if self._stopped:
+			self._stopped.set()
\ No newline at end of file
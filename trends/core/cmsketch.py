@@ -15,15 +15,22 @@ class CMSketch(RedisObject):
 	"""
 
 	@classmethod
-	async def make(cls, prefix= "cms", width= 100, depth= 10):
+	async def make(cls, prefix= "cms", width= 100, depth= 10, pipe= None):
+		"""
+		Initialize a new sketch. If pipe is passed the command is only
+		queued on it, and _validate() must be called once it has executed
+		"""
 		cm = CMSketch(prefix)
-		task = asyncio.create_task(
-			get_global_client().cms().initbydim(
-				cm._key,
-				width,
-				depth,
-			)
+		init = (pipe or get_global_client()).cms().initbydim(
+			cm._key,
+			width,
+			depth,
 		)
+		if pipe:
+			await init
+			return cm
+
+		task = asyncio.create_task(init)
 		task.add_done_callback(cm._validate)
 		return cm
 	
@@ -38,6 +45,10 @@ class CMSketch(RedisObject):
 		await client.cms().incrby(self._key, [obj], [1])
 	
 
+	def _stage(self, counts, batch) -> None:
+		batch.cms_incrby(self._key, counts)
+	
+
 	async def get(self, objs: list):
 		"""
 		Get count of each obj in objs in the order they were passed
@@ -47,18 +58,42 @@ class CMSketch(RedisObject):
 		if not objs:
 			return []
 		return await get_global_client().cms().query(self._key, *objs)
+	
+
+	async def query(self, pipe, objs: list) -> None:
+		await pipe.cms().query(self._key, *objs)
 
 
 class CMQueue(AutoQueue):
 	"""
 	An AutoQueue with count-min sketches as underlying objects
+	A bucketed queue reuses the counts it last got until it changes
 	"""
 	object_class = CMSketch
 
+	# (version, objs, counts) of the last get()
+	_fetched: tuple = None
+
 	async def get(self, objs: list) -> list[int]:
+		if not objs:
+			return []
+		if self._bucketed:
+			version, objs = self._version, tuple(objs)
+			if self._fetched and self._fetched[0] is version and self._fetched[1] == objs:
+				return list(self._fetched[2])
+			counts = await super().get(list(objs)) or [0] * len(objs)
+			self._fetched = version, objs, counts
+			return list(counts)
 		async with self._lock:
 			while True:
 				try:
 					return await self._deque[0].get(objs)
 				except InvalidRedisObject:
-					self._deque.popleft()
\ No newline at end of file
+					self._deque.popleft()
+	
+
+	def _merge(self, results: list) -> list[int]:
+		"""
+		Sum the count of each obj across the buckets
+		"""
+		return [sum(counts) for counts in zip(*results)]
\ No newline at end of file
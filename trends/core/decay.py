@@ -0,0 +1,319 @@
+"""
+Time-decayed counts, kept with forward decay: an occurrence at time t
+is written once with weight g(t - L) for a fixed landmark L, and read
+at time T as weight / g(T - L). Writes never touch older counts and
+decay is only applied when counts are read
+"""
+
+from abc import ABC, abstractmethod
+from collections import Counter
+import datetime
+import heapq
+import json
+import math
+import time
+from typing import Type
+
+import ulid
+
+from trends.core.client import get_global_client
+# required so we can catch enzyme_class from globals()
+from trends.core.enzymes import *
+from trends.core.scheduler import scheduler
+
+
+class Decay(ABC):
+	"""
+	The g() of forward decay. horizon is the number of seconds an
+	occurrence keeps a meaningful weight for
+	"""
+
+	horizon: float
+
+	@abstractmethod
+	def g(self, age: float) -> float:
+		...
+
+
+	def rescale(self, shift: float) -> float | None:
+		"""
+		What stored weights must be multiplied by when the landmark
+		moves shift seconds forward, or None if it may not move
+		"""
+		return None
+
+
+	@abstractmethod
+	def deconstruct(self) -> dict:
+		...
+
+
+	@staticmethod
+	def construct(obj: dict) -> "Decay":
+		return _decays[obj["type"]](datetime.timedelta(seconds= obj["seconds"]), *obj["args"])
+
+
+class ExponentialDecay(Decay):
+	"""
+	Weights halve every half_life. The landmark moves forward
+	every so often, so stored weights never overflow
+	"""
+
+	def __init__(self, half_life: datetime.timedelta) -> None:
+		self.half_life = half_life.total_seconds()
+		self.horizon = self.half_life / math.log(2)
+
+
+	def g(self, age: float) -> float:
+		return math.exp(age / self.horizon)
+
+
+	def rescale(self, shift: float) -> float:
+		return math.exp(-shift / self.horizon)
+
+
+	def deconstruct(self) -> dict:
+		return {"type": "exponential", "seconds": self.half_life, "args": []}
+
+
+class PolynomialDecay(Decay):
+	"""
+	Weights fall as a power of the time since an occurrence, measured
+	in horizons since the landmark. Its landmark never moves
+	"""
+
+	def __init__(self, horizon: datetime.timedelta, power: float = 2) -> None:
+		self.horizon = horizon.total_seconds()
+		self.power = power
+
+
+	def g(self, age: float) -> float:
+		return (1 + age / self.horizon) ** self.power
+
+
+	def deconstruct(self) -> dict:
+		return {"type": "polynomial", "seconds": self.horizon, "args": [self.power]}
+
+
+_decays: dict[str, Type[Decay]] = {
+	"exponential": ExponentialDecay,
+	"polynomial": PolynomialDecay,
+}
+
+
+class DecayedCounter():
+	"""
+	Decayed counts of objects, in a redis sorted set
+	"""
+
+	# horizons after which the landmark is moved forward. Weights
+	# then reach e ** 100, far from overflowing a double
+	REBASE_AFTER = 100
+
+	def __init__(
+		self,
+		decay: Decay,
+		key: str = None,
+		landmark: float = None,
+		publish: str = None,
+	) -> None:
+		self.decay = decay
+		self._key = key or f"decay:{ulid.new().str}"
+		self.landmark = landmark or time.time()
+		# a hash the counter writes itself to whenever its landmark
+		# moves, so that readers of its key can scale its weights
+		self.publish = publish
+		self._published: float = None
+
+
+	def stage(self, counts: Counter, batch, now: float):
+		"""
+		Stage an increment of every obj in counts on a CommandBatch,
+		moving the landmark first if it is due. The landmark only
+		moves once the batch has executed
+		"""
+		landmark = self.landmark
+		shift = now - landmark
+		if shift > self.REBASE_AFTER * self.decay.horizon:
+			factor = self.decay.rescale(shift)
+			if factor is not None:
+				batch.zscale(self._key, factor)
+				landmark = now
+				batch.assign(self, "landmark", landmark)
+
+		if self.publish and self._published != landmark:
+			batch.hset(self.publish, {
+				self._key: json.dumps({**self.deconstruct(), "landmark": landmark}),
+			})
+			batch.assign(self, "_published", landmark)
+
+		weight = self.decay.g(now - landmark)
+		batch.zincrby(self._key, Counter({obj: n * weight for obj, n in counts.items()}))
+
+
+	def scale(self, now: float) -> float:
+		"""
+		What stored weights are divided by to read them at now
+		"""
+		return self.decay.g(now - self.landmark)
+
+
+	def deconstruct(self) -> dict:
+		return {
+			"key": self._key,
+			"landmark": self.landmark,
+			"decay": self.decay.deconstruct(),
+		}
+
+
+	@classmethod
+	def construct(cls, obj: dict, publish: str = None) -> "DecayedCounter":
+		return cls(Decay.construct(obj["decay"]), obj["key"], obj["landmark"], publish)
+
+
+class DecayedTrend():
+	"""
+	Rank objects by how far their recent rate rises above their usual one.
+	Each object has a short and a long decayed count, one ZINCRBY each per
+	flush whatever the window. The top CANDIDATES by short count are read
+	with their long counts, and ranked by the z-score of the short count
+	against the one the long rate predicts
+
+	The last ranking is reused until a batch staged on the counters has
+	been sent or they are pruned, so fetches in between cost nothing
+	"""
+
+	# objects read from the short counter to rank
+	CANDIDATES = 1000
+
+	# objects kept in each counter, the lowest ones are pruned
+	MAX_MEMBERS = 10_000
+
+	# seconds between two prunings
+	PRUNE_INTERVAL = 60
+
+	def __init__(self, enzyme_class: Type[BaseEnzyme]) -> None:
+		"""
+		Use make() to create DecayedTrend objects
+		"""
+		self._enzyme = enzyme_class()
+		self._short: DecayedCounter
+		self._long: DecayedCounter
+		# replaced whenever the counters may have changed
+		self._version = object()
+		# (version, k, ranked) of the last fetch()
+		self._fetched: tuple = None
+
+
+	def _start(self):
+		scheduler.add(self.PRUNE_INTERVAL, self._prune)
+
+
+	def terminate(self):
+		scheduler.remove(self.PRUNE_INTERVAL, self._prune)
+
+
+	@classmethod
+	async def make(
+		cls,
+		enzyme_class: Type[BaseEnzyme],
+		short: Decay,
+		long: Decay,
+	):
+		t = cls(enzyme_class)
+		t._short = DecayedCounter(short)
+		t._long = DecayedCounter(long)
+		t._start()
+		return t
+
+
+	def digest(self, events) -> Counter:
+		"""
+		Count the objs digested from a batch of events
+		"""
+		return self._enzyme.count(events)
+
+
+	async def stage(self, counts: Counter, batch):
+		"""
+		Stage decayed increments of counts on a CommandBatch
+		"""
+		if not counts:
+			return
+		now = time.time()
+		self._short.stage(counts, batch, now)
+		self._long.stage(counts, batch, now)
+		batch.assign(self, "_version", object())
+
+
+	async def fetch(self, k= 20, scores= False) -> list:
+		"""
+		Get the top k trending objects, or (object, score) pairs
+		"""
+		version = self._version
+		if self._fetched and self._fetched[0] is version and self._fetched[1] >= k:
+			ranked = self._fetched[2][:k]
+		else:
+			ranked = await self._rank(k)
+			self._fetched = version, k, ranked
+		return ranked if scores else [obj for obj, _ in ranked]
+
+
+	async def _rank(self, k: int) -> list[tuple[str, float]]:
+		"""
+		Read the counters and rank the top k objects
+		"""
+		now = time.time()
+		short = await get_global_client().zrevrange(
+			self._short._key, 0, self.CANDIDATES - 1, withscores= True
+		)
+		if not short:
+			return []
+		long = await get_global_client().zmscore(
+			self._long._key, [obj for obj, _ in short]
+		)
+
+		short_scale, long_scale = self._short.scale(now), self._long.scale(now)
+		# the long rate, over the short horizon
+		ratio = self._short.decay.horizon / self._long.decay.horizon
+		ranks = {}
+		for (obj, s), l in zip(short, long):
+			observed = s / short_scale
+			expected = (l or 0) / long_scale * ratio
+			ranks[obj] = (observed - expected) / math.sqrt(expected + 1)
+		return [(obj, ranks[obj]) for obj in heapq.nlargest(k, ranks, key= ranks.get)]
+
+
+	async def _prune(self, pipe, boundary: float) -> list:
+		"""
+		Called by the scheduler, drop all but the MAX_MEMBERS
+		highest objects of each counter
+		"""
+		for counter in (self._short, self._long):
+			await pipe.zremrangebyrank(counter._key, 0, -self.MAX_MEMBERS - 1)
+		# the scores also decay at different rates while nothing is
+		# written, a ranking is not reused past a pruning
+		self._version = object()
+		return []
+
+
+	@classmethod
+	async def construct(cls, obj: dict):
+		"""
+		An alternative to make() where an object returned by
+		a previous deconstruct() is available
+		"""
+		t = cls(globals()[obj["enzyme_class"]])
+		t._short = DecayedCounter.construct(obj["short"])
+		t._long = DecayedCounter.construct(obj["long"])
+		t._start()
+		return t
+
+
+	def deconstruct(self):
+		return {
+			"short": self._short.deconstruct(),
+			"long": self._long.deconstruct(),
+			"enzyme_class": self._enzyme.__class__.__name__,
+		}
+
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections import Counter
 
 from .event import BaseEvent, TweetEvent
 
@@ -16,6 +17,23 @@ class BaseEnzyme(ABC):
 	@abstractmethod
 	def digest(self, event: BaseEvent) -> list:
 		...
+	
+
+	def partition_key(self, obj) -> str:
+		"""
+		What obj is hashed by to pick its partition
+		"""
+		return obj
+	
+
+	def count(self, events: list[BaseEvent]) -> Counter:
+		"""
+		Digest every event in events, counting duplicates
+		"""
+		counts = Counter()
+		for event in events:
+			counts.update(self.digest(event))
+		return counts
 
 
 class DummyEnzyme(BaseEnzyme):
@@ -88,4 +106,43 @@ class KeywordEnzyme(BaseEnzyme):
 	def digest(self, event: BaseEvent) -> list:
 		if not isinstance(event, TweetEvent):
 			return []
-		return event.keywords
\ No newline at end of file
+		return event.keywords
+
+
+class AuthoredEnzyme(BaseEnzyme):
+	"""
+	Pair every object digested by the enzyme it is mixed into with the
+	author of the tweet, as "user_id:obj"
+	"""
+
+	def digest(self, event: BaseEvent) -> list:
+		if not isinstance(event, TweetEvent):
+			return []
+		return [f"{event.user_id}:{obj}" for obj in super().digest(event)]
+	
+
+	def partition_key(self, obj) -> str:
+		"""
+		Pairs go with the partition of their object
+		"""
+		return obj.split(":", 1)[1]
+
+
+class AuthoredTweetIdEnzyme(AuthoredEnzyme, TweetIdEnzyme):
+
+	name = "authored_tweet_id"
+
+
+class AuthoredUserIdEnzyme(AuthoredEnzyme, UserIdEnzyme):
+
+	name = "authored_user_id"
+
+
+class AuthoredTagEnzyme(AuthoredEnzyme, TagEnzyme):
+
+	name = "authored_tag"
+
+
+class AuthoredKeywordEnzyme(AuthoredEnzyme, KeywordEnzyme):
+
+	name = "authored_keyword"
\ No newline at end of file
@@ -36,6 +36,33 @@ class TweetEvent(BaseEvent):
 		self.tags = tags
 		self.mentions_id = mentions_id
 		self.keywords = keywords
+
+
+	def to_dict(self) -> dict:
+		"""
+		The arguments this event was constructed with, as plain types
+		"""
+		return {
+			"content": self.text,
+			"tweet_id": self.tweet_id,
+			"user_id": self.user_id,
+			"reply_id": self.reply_id,
+			"reply_user_id": self.reply_user_id,
+			"retweet_id": self.retweet_id,
+			"retweet_user_id": self.retweet_user_id,
+			"tags": self.tags,
+			"mentions_id": self.mentions_id,
+			"keywords": self.keywords,
+		}
+
+
+	@classmethod
+	def from_dict(cls, d: dict) -> "TweetEvent":
+		"""
+		Construct a TweetEvent from a dict returned by to_dict()
+		"""
+		d = dict(d)
+		return cls(d.pop("content"), d.pop("tweet_id"), d.pop("user_id"), **d)
 	
 
 	def is_reply(self) -> bool:
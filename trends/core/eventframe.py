@@ -1,20 +1,21 @@
 from abc import ABC
+import time
 from typing import Type
 
-from trends.core.clock import Clock
 from trends.core.auto_queue import AutoQueue
+from trends.core.scheduler import scheduler
 
 
 class EventFrame(ABC):
 	"""
-	Combine a clock and an AutoQueue to make the process of adding
+	Combine the scheduler and an AutoQueue to make the process of adding
 	and removing RedisObjects automated. 
 	This then represents a concrete handle on some set of events 
 	that have happened in some defined interval, made consistent
 	by the duplication in the underlying queue.
 
-	Warning: instantiating an eventframe will leave tasks running
-	in the event loop until the object dies or stop() is called
+	Warning: instantiating an eventframe keeps the scheduler's task
+	running in the event loop until stop() is called
 	This may lead to unexpected behaviour if you await asyncio.gather
 	"""
 
@@ -26,11 +27,12 @@ class EventFrame(ABC):
 		"""
 		self._queue = queue
 		self.interval = interval
-		self._clock = Clock(self._queue.signal, self.interval / size)
+		# seconds of wall-clock time covered by one object of the queue
+		self.width = interval / size
 		self.add = self._queue.add
+		self.stage = self._queue.stage
 		self.get = self._queue.get
-		self.stop = self._clock.stop
-		self._clock.start()
+		scheduler.add(self.width, self._rotate)
 	
 
 	@classmethod
@@ -41,7 +43,11 @@ class EventFrame(ABC):
 		size is the duplicity (more means less variance from 
 		exact data interval seconds ago, but also means more memory)
 		"""
-		aq = await cls.queue_class.make(maxlen=size, **kwargs)
+		aq = await cls.queue_class.make(
+			epoch= _epoch(interval / size),
+			maxlen=size,
+			**kwargs
+		)
 		return EventFrame(aq, size, interval)
 	
 
@@ -50,10 +56,29 @@ class EventFrame(ABC):
 		"""
 		Make an eventframe when the result of a previous deconstruct()
 		is available. Resulting frame will try to refer to that old state's
-		data, which may now be invalid
+		data, which may now be invalid. Objects that fell out of the
+		window while nobody was counting are deleted straight away
 		"""
-		aq = await cls.queue_class.construct(obj["_queue"])
-		return EventFrame(aq, aq._deque.maxlen, obj["interval"])
+		size, interval = obj["_queue"]["maxlen"], obj["interval"]
+		epoch = _epoch(interval / size)
+		aq = await cls.queue_class.construct(obj["_queue"], epoch)
+		await aq.advance(epoch)
+		return EventFrame(aq, size, interval)
+	
+
+	async def _rotate(self, pipe, boundary: float) -> list:
+		"""
+		Called by the scheduler at every multiple of width
+		"""
+		r = await self._queue.advance(round(boundary / self.width), pipe)
+		return [r] if r else []
+	
+
+	def stop(self):
+		"""
+		Stop rotating the queue
+		"""
+		scheduler.remove(self.width, self._rotate)
 	
 
 	def deconstruct(self):
@@ -64,4 +89,11 @@ class EventFrame(ABC):
 		return {
 			"_queue": self._queue.deconstruct(),
 			"interval": self.interval,
-		}
\ No newline at end of file
+		}
+
+
+def _epoch(width: float) -> int:
+	"""
+	Number the current slice of wall-clock time width seconds long
+	"""
+	return int(time.time() // width)
\ No newline at end of file
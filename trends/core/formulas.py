@@ -3,60 +3,75 @@ import datetime
 from typing import Type
 
 from trends.core.enzymes import (
+	AuthoredKeywordEnzyme,
+	AuthoredTagEnzyme,
+	AuthoredTweetIdEnzyme,
+	AuthoredUserIdEnzyme,
 	BaseEnzyme,
 	KeywordEnzyme,
 	TagEnzyme, 
 	TweetIdEnzyme,
 	UserIdEnzyme,
 )
-from trends.core.trend import Trend
+from trends.core.decay import DecayedTrend, ExponentialDecay
+from trends.core.personal import Affinity, affinity_key
 from trends.core.volume import TrendVolume
 
 
 __all__ = [
+	"KeywordAffinityFormula",
 	"KeywordTrendFormula",
 	"KeywordVolumeFormula",
+	"TagAffinityFormula",
 	"TagTrendFormula",
 	"TagVolumeFormula",
+	"TweetAffinityFormula",
 	"TweetTrendFormula",
 	"TweetVolumeFormula",
+	"UserAffinityFormula",
 	"UserTrendFormula",
 	"UserVolumeFormula",
 ]
 
 
-_global_trend_intervals = [
-	datetime.timedelta(minutes= 1),
-	datetime.timedelta(minutes= 4),
-	datetime.timedelta(minutes= 15),
-	datetime.timedelta(hours= 1),
-	datetime.timedelta(hours= 4),
-	datetime.timedelta(hours= 15),
-	datetime.timedelta(hours= 60),
-]
+# how long recent and usual rates take to halve, trends
+# are what rises far above its usual rate
+_global_trend_short_half_life = datetime.timedelta(minutes= 30)
+
+_global_trend_long_half_life = datetime.timedelta(hours= 24)
 
 _global_volume_interval = datetime.timedelta(hours= 60)
 
+# how long the part a user takes in a trend takes to halve
+_global_affinity_half_life = datetime.timedelta(hours= 6)
+
 
 class BaseFormula(ABC):
 	"""
 	A Formula class contains the necessary parameters to
-	easily instantiate a particular Listener
+	easily instantiate a particular Listener, counting the
+	objects of one partition
 	"""
-	measure_class: Type[Trend | TrendVolume]
+	measure_class: Type[DecayedTrend | TrendVolume | Affinity]
 	enzyme_class: BaseEnzyme
 	deconstruct_key: str
 
+	def __init__(self, partition: int = 0) -> None:
+		self.partition = partition
+
 	@abstractmethod
 	def get_kwargs(self):
 		return {}
 
 
 class TrendFormulaMixin(BaseFormula):
-	measure_class = Trend
+	measure_class = DecayedTrend
 
 	def get_kwargs(self):
-		return {"intervals": _global_trend_intervals}
+		return {
+			"short": ExponentialDecay(_global_trend_short_half_life),
+			"long": ExponentialDecay(_global_trend_long_half_life),
+		}
 
 
 class TrendVolumeFormulaMixin(BaseFormula):
@@ -66,6 +81,20 @@ class TrendVolumeFormulaMixin(BaseFormula):
 		return {"interval": _global_volume_interval}
 
 
+class AffinityFormulaMixin(BaseFormula):
+	"""
+	Subclasses set kind, the snapshot kind they personalise
+	"""
+	measure_class = Affinity
+	kind: str
+
+	def get_kwargs(self):
+		return {
+			"decay": ExponentialDecay(_global_affinity_half_life),
+			"key": affinity_key(self.kind, self.partition),
+		}
+
+
 class KeywordEnzymeFormulaMixin(BaseFormula):
 	enzyme_class = KeywordEnzyme
 
@@ -111,4 +140,28 @@ class UserTrendFormula(TrendFormulaMixin, UserIdEnzymeFormulaMixin):
 
 
 class UserVolumeFormula(TrendVolumeFormulaMixin, UserIdEnzymeFormulaMixin):
-	deconstruct_key = "user_volume"
\ No newline at end of file
+	deconstruct_key = "user_volume"
+
+
+class KeywordAffinityFormula(AffinityFormulaMixin):
+	enzyme_class = AuthoredKeywordEnzyme
+	deconstruct_key = "keyword_affinity"
+	kind = "keywords"
+
+
+class TagAffinityFormula(AffinityFormulaMixin):
+	enzyme_class = AuthoredTagEnzyme
+	deconstruct_key = "tag_affinity"
+	kind = "tags"
+
+
+class TweetAffinityFormula(AffinityFormulaMixin):
+	enzyme_class = AuthoredTweetIdEnzyme
+	deconstruct_key = "tweet_affinity"
+	kind = "tweets"
+
+
+class UserAffinityFormula(AffinityFormulaMixin):
+	enzyme_class = AuthoredUserIdEnzyme
+	deconstruct_key = "user_affinity"
+	kind = "users"
\ No newline at end of file
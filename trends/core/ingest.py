@@ -0,0 +1,380 @@
+"""
+A durable, append-only log of trend events, written by the processes
+producing events and read in batches by the trends loop
+
+With the redis backend the log is a redis stream per group of
+listeners, holding the events with an object of that group, so that a
+worker only reads the streams of the groups it owns. With the local
+backend, whose only worker owns every group, it is a single directory
+of hourly segment files. Every listener commits the offset of the last
+event it has counted, in the same round trip as the counts, and
+whichever worker owns it next reads its stream again from there
+"""
+
+import asyncio
+from collections import namedtuple
+import json
+import os
+from pathlib import Path
+import re
+import time
+from typing import Iterator
+
+from django.conf import settings
+
+from trends.core.client import BACKEND, get_blocking_client, get_global_client
+from trends.core.event import TweetEvent
+
+
+OFFSET_KEY = "trends:ingest:offset"
+
+# the streams of the groups are named after them, under this prefix
+STREAM_KEY = "trends:ingest"
+
+# roughly how many events every stream keeps for replay
+STREAM_MAXLEN = getattr(settings, "TRENDS_LOG_MAXLEN", 1_000_000)
+
+# directory the segment files of the local log live in
+LOG_DIR = Path(getattr(settings, "TRENDS_LOG_DIR", settings.BASE_DIR / "trends-log"))
+
+# seconds of events held by one segment file
+SEGMENT_SECONDS = 3600
+
+# seconds a segment may still be written to after its hour ends,
+# by producers that picked it just before
+SEGMENT_GRACE = 5
+
+# hours of segment files kept for replay
+RETENTION = getattr(settings, "TRENDS_LOG_RETENTION", 24)
+
+# seconds between two looks at the segment files for new events
+POLL_INTERVAL = 0.1
+
+Record = namedtuple("Record", ["offset", "created", "event", "stream"], defaults= [None])
+
+
+class StreamLog():
+	"""
+	The log as a redis stream per group of listeners. Offsets are
+	stream entry ids
+	"""
+
+	def stream(self, group: str) -> str:
+		"""
+		The stream holding the events group counts
+		"""
+		return f"{STREAM_KEY}:{group}"
+
+
+	def append(self, event: TweetEvent):
+		"""
+		Append event to the stream of every group counting any
+		of its objects, in one round trip
+		"""
+		from trends.core.listeners import groups_of
+
+		fields = {"event": json.dumps(event.to_dict())}
+		pipe = get_blocking_client().pipeline(transaction= False)
+		for group in groups_of(event):
+			pipe.xadd(self.stream(group), fields, maxlen= STREAM_MAXLEN, approximate= True)
+		pipe.execute()
+
+
+	async def read(self, cursors: dict[str, str], count: int, block: float) -> list[Record]:
+		"""
+		Return up to count records of each stream following its offset
+		in cursors, waiting up to block seconds for the first one
+		"""
+		response = await get_global_client().xread(
+			cursors,
+			count= count,
+			# a block of 0 would wait forever
+			block= int(block * 1000) or None,
+		)
+		return [
+			self._record(id, fields, stream)
+			for stream, entries in response or []
+			for id, fields in entries
+		]
+
+
+	def range(self, since: float, until: float) -> Iterator[Record]:
+		"""
+		Every record created from since up to until. An event is in the
+		stream of every group it concerns, it is only returned once
+		"""
+		from trends.core.listeners import listener_groups
+
+		records = dict()
+		for group in listener_groups:
+			for record in self._range(self.stream(group), since, until):
+				records.setdefault(record.event.tweet_id, record)
+		yield from sorted(records.values(), key= lambda record: position(record.offset))
+
+
+	def _range(self, stream: str, since: float, until: float) -> Iterator[Record]:
+		start, end = f"{int(since * 1000)}", f"{int(until * 1000)}"
+		while True:
+			entries = get_blocking_client().xrange(stream, start, end, count= 1000)
+			for id, fields in entries:
+				yield self._record(id, fields, stream)
+			if len(entries) < 1000:
+				return
+			start = "(" + entries[-1][0]
+
+
+	async def tail(self, stream: str) -> str:
+		"""
+		The offset of the last record of stream, so that
+		reading after it only returns new records
+		"""
+		last = await get_global_client().xrevrange(stream, count= 1)
+		return last[0][0] if last else "0-0"
+
+
+	def _record(self, id: str, fields: dict, stream: str) -> Record:
+		return Record(
+			id,
+			int(id.split("-")[0]) / 1000,
+			TweetEvent.from_dict(json.loads(fields["event"])),
+			stream,
+		)
+
+
+class SegmentLog():
+	"""
+	The log as a directory of files named after the start of the hour
+	whose events they hold, one json line per event. Offsets take the
+	form "<segment>:<position>", the byte position after a record in
+	that segment. Any number of processes may append at once, each
+	record is a single write to a file opened for appending
+	"""
+
+	# every group reads the one stream of segments
+	STREAM = "segments"
+
+	def __init__(self, path: Path = LOG_DIR) -> None:
+		self._path = Path(path)
+
+
+	def stream(self, group: str) -> str:
+		return self.STREAM
+
+
+	def append(self, event: TweetEvent):
+		now = time.time()
+		line = json.dumps([now, event.to_dict()]) + "\n"
+		self._path.mkdir(parents= True, exist_ok= True)
+		fd = os.open(
+			self._file(_segment_of(now)),
+			os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+			0o644,
+		)
+		try:
+			os.write(fd, line.encode())
+		finally:
+			os.close(fd)
+
+
+	async def read(self, cursors: dict[str, str], count: int, block: float) -> list[Record]:
+		"""
+		Return up to count records following the offset in cursors,
+		waiting up to block seconds for the first one
+		"""
+		after = cursors[self.STREAM]
+		deadline = time.monotonic() + block
+		while True:
+			records = self._read(after, count)
+			if records or time.monotonic() >= deadline:
+				return records
+			await asyncio.sleep(POLL_INTERVAL)
+
+
+	def range(self, since: float, until: float) -> Iterator[Record]:
+		"""
+		Every record created from since up to until
+		"""
+		for segment in self._segments():
+			if segment + SEGMENT_SECONDS + SEGMENT_GRACE < since or segment > until:
+				continue
+			for record in self._scan(segment, 0):
+				if since <= record.created <= until:
+					yield record
+
+
+	async def tail(self, stream: str = STREAM) -> str:
+		"""
+		The offset of the last record, so that reading
+		after it only returns new records
+		"""
+		segments = self._segments()
+		if not segments:
+			return f"{_segment_of(time.time())}:0"
+		return f"{segments[-1]}:{self._file(segments[-1]).stat().st_size}"
+
+
+	def _read(self, after: str, count: int) -> list[Record]:
+		segment, position = (int(x) for x in after.split(":"))
+		records = []
+		for start in self._segments():
+			if start < segment:
+				continue
+			if start > segment:
+				position = 0
+
+			for record in self._scan(start, position):
+				records.append(record)
+				if len(records) == count:
+					return records
+
+			if time.time() < start + SEGMENT_SECONDS + SEGMENT_GRACE:
+				# the segment may still be appended to
+				break
+			self._prune()
+		return records
+
+
+	def _scan(self, segment: int, position: int) -> Iterator[Record]:
+		with open(self._file(segment), "rb") as f:
+			f.seek(position)
+			for line in f:
+				if not line.endswith(b"\n"):
+					# still being written
+					return
+				position += len(line)
+				created, d = json.loads(line)
+				yield Record(
+					f"{segment}:{position}",
+					created,
+					TweetEvent.from_dict(d),
+					self.STREAM,
+				)
+
+
+	def _segments(self) -> list[int]:
+		if not self._path.is_dir():
+			return []
+		return sorted(int(p.stem) for p in self._path.glob("*.log"))
+
+
+	def _file(self, segment: int) -> Path:
+		return self._path / f"{segment}.log"
+
+
+	def _prune(self):
+		"""
+		Delete segments older than RETENTION hours
+		"""
+		oldest = time.time() - RETENTION * 3600
+		for segment in self._segments():
+			if segment + SEGMENT_SECONDS < oldest:
+				self._file(segment).unlink(missing_ok= True)
+
+
+def _segment_of(t: float) -> int:
+	return int(t // SEGMENT_SECONDS * SEGMENT_SECONDS)
+
+
+_log = None
+
+# offset of the last record read from every stream of the owned groups
+cursors: dict[str, str] = dict()
+
+# bumped every time the cursor of a stream is moved back
+_rewinds: dict[str, int] = dict()
+
+# per listener, the offset of the last event it counted, not yet committed
+_pending: dict[str, str] = dict()
+
+
+def get_log() -> StreamLog | SegmentLog:
+	global _log
+	if _log is None:
+		_log = SegmentLog() if BACKEND == "local" else StreamLog()
+	return _log
+
+
+def position(offset: str) -> tuple[int, int]:
+	"""
+	Turn an offset of either log into something that compares
+	in the order of the log
+	"""
+	return tuple(int(x) for x in re.split("[-:]", offset))
+
+
+def rewind(stream: str, offset: str):
+	"""
+	Read stream again from offset on, unless it is already read from
+	further back. Records of it being read meanwhile are left out
+	"""
+	if stream in cursors and position(cursors[stream]) <= position(offset):
+		return
+	cursors[stream] = offset
+	_rewinds[stream] = _rewinds.get(stream, 0) + 1
+
+
+def forget(stream: str):
+	"""
+	Stop reading stream
+	"""
+	cursors.pop(stream, None)
+	_rewinds[stream] = _rewinds.get(stream, 0) + 1
+
+
+async def read(count: int, block: float) -> list[Record]:
+	"""
+	Read up to count records of every stream past its cursor, and move
+	the cursors past them. Records of a stream rewound or forgotten
+	while they were read are dropped, they will be read again
+	"""
+	if not cursors:
+		await asyncio.sleep(block)
+		return []
+	start, rewinds = dict(cursors), dict(_rewinds)
+	records = [
+		record for record in await get_log().read(start, count, block)
+		if _rewinds.get(record.stream) == rewinds.get(record.stream)
+	]
+	for record in records:
+		cursors[record.stream] = record.offset
+	return records
+
+
+async def committed_offset(name: str) -> str | None:
+	"""
+	The offset of the last event counted by the listener called name,
+	or None if it has never committed one
+	"""
+	return await get_global_client().get(f"{OFFSET_KEY}:{name}")
+
+
+def mark(names: list[str], offset: str):
+	"""
+	Record that every event up to offset has been counted
+	by the listeners called names
+	"""
+	for name in names:
+		_pending[name] = offset
+
+
+def take(names: list[str]) -> dict[str, str]:
+	"""
+	The marked offsets of names, to commit along with their counts
+	"""
+	return {name: _pending.pop(name) for name in names if name in _pending}
+
+
+async def commit(pipe, offsets: dict[str, str]):
+	"""
+	Queue a write of offsets returned by take() on pipe, to be
+	executed together with the counts before them
+	"""
+	for name, offset in offsets.items():
+		await pipe.set(f"{OFFSET_KEY}:{name}", offset)
+
+
+def discard(name: str):
+	"""
+	Forget the marked offset of name, which is no longer counted here
+	"""
+	_pending.pop(name, None)
\ No newline at end of file
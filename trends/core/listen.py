@@ -1,75 +1,280 @@
-import json
+import math
 
-from trends.core.client import get_global_client, get_pipe
+from trends.core import ingest, metrics, shard, snapshot, state
+from trends.core.batch import CommandBatch
 from trends.core.clock import Clock
-from trends.core.listeners import Listener, all_listeners
-from trends.core.event import BaseEvent
+from trends.core.listeners import Listener, listener_groups
+from trends.core.redis_object import check_constructed
+
+
+_notify_seconds = metrics.histogram(
+	"trends_notify_seconds",
+	"Time notify_all() takes to count a batch of events",
+)
+
+_accumulate_seconds = metrics.histogram(
+	"trends_listener_accumulate_seconds",
+	"Time a listener takes to count a batch of events",
+	("listener",),
+)
+
+_flush_seconds = metrics.histogram(
+	"trends_flush_seconds",
+	"Time flush_all() takes to write the counts of every listener",
+)
+
+
+def owned_listeners() -> list[Listener]:
+	return [listener for group in shard.owned.values() for listener in group]
 
 
 async def start_all():
 	"""
-	Call listen on all listeners
+	Take this worker's share of listeners and start all clocks
 	"""
-	for listener in all_listeners:
-		await _construct(listener)
-	
+	await balance()
+	_balance_clock.start()
+	_flush_clock.start()
 	_backup_clock.start()
 
+	await snapshot.restore()
+	snapshot._snapshot_clock.start()
+	metrics._publish_clock.start()
+
+
+async def balance():
+	"""
+	Renew the leases of the groups of listeners this worker owns, then
+	take free groups or hand owned ones back until it owns its share
+	"""
+	workers = await shard.heartbeat()
+	share = math.ceil(len(listener_groups) / workers)
+
+	for group in list(shard.owned):
+		if not await shard.renew(group):
+			_drop(group)
+
+	for group in listener_groups:
+		if len(shard.owned) >= share:
+			break
+		if group not in shard.owned and await shard.acquire(group):
+			await _take(group)
 
-async def notify_all(event: BaseEvent):
+	for group in list(shard.owned)[share:]:
+		await _hand_back(group)
+
+
+async def notify_all(records: list[ingest.Record]):
+	"""
+	Notify every owned listener of the records of the stream it reads,
+	past the last one it counted. Counts are only aggregated locally
+	here, the next flush_all() writes them
+	"""
+	with _notify_seconds.time():
+		streams = dict()
+		for record in records:
+			streams.setdefault(record.stream, []).append(record)
+
+		log = ingest.get_log()
+		for group, listeners in list(shard.owned.items()):
+			for listener in listeners:
+				fresh = _unseen(listener, streams.get(log.stream(group), []))
+				if not fresh:
+					continue
+				with _accumulate_seconds.time(listener= listener.name):
+					listener.accumulate([record.event for record in fresh])
+				listener.offset = fresh[-1].offset
+				ingest.mark([listener.name], listener.offset)
+
+
+def _unseen(listener: Listener, records: list) -> list:
 	"""
-	Notify all listeners of event
+	The records listener has not counted yet. A stream read again
+	from an older offset hands it records it already counted
 	"""
-	pipe = get_pipe()
-	for listener in all_listeners:
-		await listener.notify(event, pipe)
-	await pipe.execute()
+	if not records or listener.offset is None:
+		return records
+	seen = ingest.position(listener.offset)
+	if ingest.position(records[0].offset) > seen:
+		return records
+	return [record for record in records if ingest.position(record.offset) > seen]
+
+
+async def flush_all():
+	"""
+	Write the counts accumulated by all owned listeners. Writes for every
+	listener are grouped per key and sent in a single round trip, along
+	with the ingest offsets of the last events counted, as long as this
+	worker still holds the fencing tokens of their groups
+	"""
+	with _flush_seconds.time():
+		# take every count and offset at once, the events notified
+		# while they are staged go to the next flush
+		taken = {
+			group: (
+				[(listener, listener.take()) for listener in listeners],
+				ingest.take([listener.name for listener in listeners]),
+			)
+			for group, listeners in shard.owned.items()
+		}
+		staged = dict()
+		for group, (counts, offsets) in taken.items():
+			batch = CommandBatch()
+			for listener, pending in counts:
+				await listener.stage(pending, batch)
+			if batch or offsets:
+				staged[group] = batch, offsets
+		if not staged:
+			return
+
+		async def queue(pipe, groups):
+			for group in groups:
+				batch, offsets = staged[group]
+				await batch.queue(pipe)
+				await ingest.commit(pipe, offsets)
+			metrics.round_trip("flush", pipe)
+
+		lost = await shard.commit(queue, list(staged))
+		for group, (batch, _) in staged.items():
+			if group in lost:
+				_drop(group)
+			else:
+				batch.executed()
 
 
 async def save_all():
 	"""
-	Save the state of all listeners to cache
+	Save the state of all owned listeners to cache
 	"""
-	pipe = get_pipe()
-	for listener in all_listeners:
-		await _save_state(listener, pipe)
-	await pipe.execute()
+	async def queue(pipe, groups):
+		for group in groups:
+			for listener in shard.owned.get(group, ()):
+				await _save_state(listener, pipe)
+
+	for group in await shard.commit(queue, list(shard.owned)):
+		_drop(group)
 
 
 async def stop_all():
 	"""
-	Kill all listeners. May very well be restarted
+	Kill all listeners and give their leases up. May very well be restarted
 	"""
+	_balance_clock.stop()
+	snapshot._snapshot_clock.stop()
+	metrics._publish_clock.stop()
+	_flush_clock.stop()
 	_backup_clock.stop()
-	pipe = get_pipe()
-	for listener in all_listeners:
-		await _destroy(listener, pipe)
-	await pipe.execute()
+
+	for group in list(shard.owned):
+		await _hand_back(group)
+	await shard.leave()
+	await metrics.unpublish()
+
+
+async def _take(group: str):
+	"""
+	Start counting events for a group this worker just took the lease
+	of, from the offsets its listeners last committed on
+	"""
+	listeners = listener_groups[group]
+	log = ingest.get_log()
+	stream = log.stream(group)
+	tail = None
+	for listener in listeners:
+		await _construct(listener)
+		listener.offset = await ingest.committed_offset(listener.name)
+		if listener.offset is None:
+			# never counted anything, start with new events
+			tail = tail or await log.tail(stream)
+			listener.offset = tail
+	await check_constructed()
+
+	shard.owned[group] = listeners
+	ingest.rewind(stream, min((listener.offset for listener in listeners), key= ingest.position))
+
+
+def _drop(group: str):
+	"""
+	Stop counting for a group another worker took over. Counts not yet
+	written are thrown away, the new owner counts them again
+	"""
+	listeners = shard.owned.pop(group, ())
+	for listener in listeners:
+		listener.stop_listen()
+		listener._pending.clear()
+		ingest.discard(listener.name)
+	shard.tokens.pop(group, None)
+	_forget_stream(group)
+
+
+async def _hand_back(group: str):
+	"""
+	Write everything counted for an owned group and give its lease up
+	"""
+	listeners = shard.owned.pop(group)
+	_forget_stream(group)
+	batch = CommandBatch()
+	for listener in listeners:
+		await listener.flush(batch)
+	offsets = ingest.take([listener.name for listener in listeners])
+
+	async def queue(pipe, groups):
+		if groups:
+			await batch.queue(pipe)
+			await ingest.commit(pipe, offsets)
+			# the states go through along with the batch, or neither does,
+			# so they are read as they will be once the batch went through
+			with batch.applied():
+				states = [listener.deconstruct() for listener in listeners]
+			for listener, obj in zip(listeners, states):
+				await state.save(listener.name, obj, pipe)
+
+	if not await shard.commit(queue, [group]):
+		batch.executed()
+	for listener in listeners:
+		listener.stop_listen()
+	await shard.release(group)
+
+
+def _forget_stream(group: str):
+	"""
+	Stop reading the stream of group, unless another owned group reads it
+	"""
+	log = ingest.get_log()
+	stream = log.stream(group)
+	if all(log.stream(other) != stream for other in shard.owned):
+		ingest.forget(stream)
 
 
 async def _construct(listener: Listener):
-	obj = await get_global_client().get(listener._f.deconstruct_key)
+	obj = await state.load(listener.name)
 	if obj:
-		await listener.construct(json.loads(obj))
-		pass
+		await listener.construct(obj)
 	else:
 		await listener.listen()
 
 
 async def _save_state(listener: Listener, pipe):
-	await pipe.set(
-		listener._f.deconstruct_key,
-		json.dumps(listener.deconstruct())
-	)
+	await state.save(listener.name, listener.deconstruct(), pipe)
+
 
+BACKUP_INTERVAL = 10
 
-async def _destroy(listener: Listener, pipe):
-	if listener._base:
-		listener._base.terminate()
-		await _save_state(listener, pipe)
-		listener._base = None
+# seconds over which counts are aggregated before being written
+FLUSH_INTERVAL = 1
 
+_backup_clock = Clock(save_all, BACKUP_INTERVAL)
 
-BACKUP_INTERVAL = 10
+_flush_clock = Clock(flush_all, FLUSH_INTERVAL)
+
+_balance_clock = Clock(balance, shard.RENEW_INTERVAL)
 
-_backup_clock = Clock(save_all, BACKUP_INTERVAL)
\ No newline at end of file
+metrics.gauge(
+	"trends_pending_objects",
+	"Objects counted by owned listeners and not written yet",
+	# sampled from other threads, copy the groups at once
+	function= lambda: sum(
+		len(listener._pending)
+		for group in list(shard.owned.values()) for listener in group
+	),
+)
\ No newline at end of file
@@ -1,30 +1,67 @@
+from collections import Counter
 from typing import Type
 
-from trends.core.client import get_pipe
+from trends.core import metrics, shard
+from trends.core.batch import CommandBatch
+from trends.core.client import get_global_client, get_pipe
 from trends.core.event import BaseEvent
 from trends.core.formulas import (
 	BaseFormula,
+	KeywordAffinityFormula,
 	KeywordTrendFormula,
 	KeywordVolumeFormula,
+	TagAffinityFormula,
 	TagTrendFormula,
 	TagVolumeFormula,
+	TweetAffinityFormula,
 	TweetTrendFormula,
 	TweetVolumeFormula,
+	UserAffinityFormula,
 	UserTrendFormula,
 	UserVolumeFormula,
 )
 
 
+_fetch_seconds = metrics.histogram(
+	"trends_listener_fetch_seconds",
+	"Time a listener takes to answer a fetch",
+	("listener",),
+)
+
+
 class Listener():
 	"""
-	A listener combines a particular measurement index(Trend or TrendVolume)
+	A listener combines a particular measurement index(DecayedTrend or TrendVolume)
 	with a particular enzyme, so that you have, for example a listener for trending
-	keywords and another for mentions volume
+	keywords and another for mentions volume. It only counts the objects
+	of its partition
 	"""
 
-	def __init__(self, formula: Type[BaseFormula]) -> None:
-		self._f = formula()
+	def __init__(self, formula: Type[BaseFormula], partition: int = 0) -> None:
+		self._f = formula(partition)
+		self._enzyme = self._f.enzyme_class()
 		self._base = None
+		self._pending = Counter()
+		# offset of the last event of the ingest log counted
+		self.offset: str = None
+
+
+	@property
+	def name(self) -> str:
+		"""
+		Unique to this listener and stable across processes
+		"""
+		return shard.partitioned(self._f.deconstruct_key, self._f.partition)
+
+
+	def owns(self, obj) -> bool:
+		"""
+		Whether obj, as digested by the enzyme, is in this partition
+		"""
+		return (
+			shard.PARTITIONS == 1
+			or shard.partition_of(self._enzyme.partition_key(obj)) == self._f.partition
+		)
 	
 
 	def stop_listen(self):
@@ -48,19 +85,54 @@ class Listener():
 		)
 	
 
-	async def notify(self, event: BaseEvent, pipe= None):
+	async def notify(self, event: BaseEvent):
 		"""
-		Notify this listener of an event. If a pipe is passed, it must be
-		manually executed after notify() returns or the changes will
-		never be reflected
+		Notify this listener of an event, written straight away
 		"""
 		if not self._base:
 			raise RuntimeError("Listener is not listening. Call listen() first.")
 		
-		p = pipe or get_pipe()
-		await self._base.notify(event, p)
-		if not pipe:
-			await p.execute()
+		batch = CommandBatch()
+		await self._base.stage(self._base.digest([event]), batch)
+		await batch.execute(get_pipe())
+	
+
+	def accumulate(self, events: list[BaseEvent]):
+		"""
+		Count the digests of events locally. Nothing reaches redis
+		until the next flush(), so frequent objects cost one weighted
+		increment per flush instead of one write per occurrence
+		"""
+		if not self._base:
+			raise RuntimeError("Listener is not listening. Call listen() first.")
+		counts = self._base.digest(events)
+		if shard.PARTITIONS > 1:
+			counts = Counter({obj: n for obj, n in counts.items() if self.owns(obj)})
+		self._pending.update(counts)
+	
+
+	def take(self) -> Counter:
+		"""
+		The counts accumulated since they were last taken
+		"""
+		pending, self._pending = self._pending, Counter()
+		return pending
+	
+
+	async def stage(self, counts: Counter, batch: CommandBatch):
+		"""
+		Stage counts returned by take() on batch. Nothing
+		is sent until the batch is executed
+		"""
+		if self._base and counts:
+			await self._base.stage(counts, batch)
+	
+
+	async def flush(self, batch: CommandBatch):
+		"""
+		Stage every count accumulated since the last flush on batch
+		"""
+		await self.stage(self.take(), batch)
 	
 
 	async def fetch(self, *args):
@@ -69,7 +141,8 @@ class Listener():
 		"""
 		if not self._base:
 			raise RuntimeError("Listener is not listening. Call listen() first.")
-		return await self._base.fetch(*args)
+		with _fetch_seconds.time(listener= self.name):
+			return await self._base.fetch(*args)
 
 
 	async def construct(self, obj: dict):
@@ -77,6 +150,11 @@ class Listener():
 		Construct a listener from a dict obj returned by deconstruct()
 		"""
 		self.stop_listen()
+		if "_frames" in obj["_base"]:
+			# saved by the window sketches trends used to be ranked with
+			await _delete_frames(obj["_base"]["_frames"])
+			await self.listen()
+			return
 		self._base = await self._f.measure_class.construct(obj["_base"])
 
 
@@ -88,29 +166,47 @@ class Listener():
 		return {"_base": self._base.deconstruct()}
 
 
-keyword_trend_listener = Listener(KeywordTrendFormula)
+# the kinds of objects the snapshot ranks, with the formulas of
+# their trend, volume and affinity listeners
+KINDS = {
+	"tweets": (TweetTrendFormula, TweetVolumeFormula, TweetAffinityFormula),
+	"tags": (TagTrendFormula, TagVolumeFormula, TagAffinityFormula),
+	"users": (UserTrendFormula, UserVolumeFormula, UserAffinityFormula),
+	"keywords": (KeywordTrendFormula, KeywordVolumeFormula, KeywordAffinityFormula),
+}
 
-tag_trend_listener = Listener(TagTrendFormula)
+# listeners owned together by one worker, the trend and volume
+# listeners of a partition of each kind of object the snapshot
+# ranks, and the affinity listener personalising it
+listener_groups = {
+	shard.partitioned(kind, partition): tuple(
+		Listener(formula, partition) for formula in formulas
+	)
+	for kind, formulas in KINDS.items()
+	for partition in range(shard.PARTITIONS)
+}
 
-tweet_trend_listener = Listener(TweetTrendFormula)
+all_listeners = [listener for group in listener_groups.values() for listener in group]
 
-user_trend_listener = Listener(UserTrendFormula)
 
-keyword_volume_listener = Listener(KeywordVolumeFormula)
+async def _delete_frames(frames: list[dict]):
+	"""
+	Delete the sketches of every frame of a saved Trend
+	"""
+	keys = [key for frame in frames for key in frame["_queue"]["_deque"]]
+	if keys:
+		await get_global_client().delete(*keys)
 
-tag_volume_listener = Listener(TagVolumeFormula)
 
-tweet_volume_listener = Listener(TweetVolumeFormula)
+def kind_of(group: str) -> str:
+	return group.split(":")[0]
 
-user_volume_listener = Listener(UserVolumeFormula)
 
-all_listeners = [
-	keyword_trend_listener,
-	tag_trend_listener,
-	tweet_trend_listener,
-	user_trend_listener,
-	keyword_volume_listener,
-	tag_volume_listener,
-	tweet_volume_listener,
-	user_volume_listener,
-]
\ No newline at end of file
+def groups_of(event: BaseEvent) -> list[str]:
+	"""
+	The groups with a listener counting any object of event
+	"""
+	return [
+		group for group, (trend, *_) in listener_groups.items()
+		if any(trend.owns(obj) for obj in trend._enzyme.digest(event))
+	]
\ No newline at end of file
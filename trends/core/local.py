@@ -0,0 +1,520 @@
+"""
+An in-process stand-in for the subset of the redis client used
+by the trends app, with the RedisBloom count-min sketch and top-k
+structures implemented over numpy arrays
+
+Select it with settings.TRENDS_BACKEND = "local" to run trends on a
+single node without a redis server. Data lives in the memory of the
+process running the trends loop
+"""
+
+from abc import ABC, abstractmethod
+import functools
+import hashlib
+
+import numpy as np
+from redis.exceptions import ResponseError
+
+
+@functools.lru_cache(maxsize= 1 << 16)
+def _hash(obj) -> tuple[int, int]:
+	"""
+	Two independent 64 bit hashes of obj, stable across processes
+	"""
+	h = hashlib.blake2b(str(obj).encode(), digest_size= 16).digest()
+	return int.from_bytes(h[:8], "little"), int.from_bytes(h[8:], "little") | 1
+
+
+@functools.lru_cache(maxsize= 256)
+def _columns(objs: tuple, width: int, depth: int) -> np.ndarray:
+	"""
+	Hash every obj in objs at once into a len(objs) x depth array,
+	where row i of the sketch maps obj to column (h1 + i * h2) % width.
+	Cached, since every bucket of a queue shares width and depth
+	and is queried with the same objs
+	"""
+	hashes = np.array([_hash(obj) for obj in objs], dtype= np.uint64).reshape(-1, 2)
+	rows = np.arange(depth, dtype= np.uint64)
+	cols = (hashes[:, :1] + rows * hashes[:, 1:]) % np.uint64(width)
+	cols.flags.writeable = False
+	return cols
+
+
+class CountMinSketch():
+	"""
+	A depth x width count-min sketch
+	"""
+
+	def __init__(self, width: int, depth: int) -> None:
+		self.width = width
+		self.depth = depth
+		self.table = np.zeros((depth, width), dtype= np.int64)
+		self._rows = np.arange(depth)
+
+
+	def incrby(self, objs: list, increments: list) -> list[int]:
+		cols = _columns(tuple(objs), self.width, self.depth)
+		np.add.at(
+			self.table,
+			(self._rows, cols),
+			np.asarray(increments, dtype= np.int64)[:, None],
+		)
+		return self.table[self._rows, cols].min(axis= 1).tolist()
+
+
+	def query(self, objs: list) -> list[int]:
+		"""
+		Look every obj up in one vectorised step: gather a
+		len(objs) x depth array of counters and take the
+		minimum across depth
+		"""
+		if not objs:
+			return []
+		cols = _columns(tuple(objs), self.width, self.depth)
+		return self.table[self._rows, cols].min(axis= 1).tolist()
+
+
+class HeavyKeeper():
+	"""
+	A top-k structure following the HeavyKeeper algorithm used by
+	RedisBloom's TOPK. Each of the depth x width buckets holds a
+	fingerprint and a count; a colliding object decays the count of
+	the one already in the bucket with probability decay ** count,
+	and takes the bucket over once that count reaches zero
+	"""
+
+	def __init__(self, k: int, width: int, depth: int, decay: float) -> None:
+		self.k = k
+		self.width = width
+		self.depth = depth
+		self.decay = decay
+		self.fingerprints = np.zeros((depth, width), dtype= np.uint64)
+		self.counts = np.zeros((depth, width), dtype= np.int64)
+		self.heap: dict[str, int] = dict()
+		self._rows = np.arange(depth, dtype= np.uint64)
+		self._rng = np.random.default_rng()
+
+
+	def _bucket(self, obj) -> tuple[int, np.ndarray]:
+		return _hash(obj)[0], _columns((obj,), self.width, self.depth)[0]
+
+
+	def _increment(self, row: int, col: int, fp: int, inc: int) -> None:
+		if self.counts[row, col] == 0:
+			self.fingerprints[row, col] = fp
+			self.counts[row, col] = inc
+			return
+		if self.fingerprints[row, col] == fp:
+			self.counts[row, col] += inc
+			return
+		remaining = inc
+		while remaining:
+			p = self.decay ** int(self.counts[row, col])
+			if p < 1e-12:
+				return
+			# increments spent until one of them decays the count
+			trials = int(self._rng.geometric(p))
+			if trials > remaining:
+				return
+			remaining -= trials
+			self.counts[row, col] -= 1
+			if self.counts[row, col] == 0:
+				self.fingerprints[row, col] = fp
+				self.counts[row, col] = remaining + 1
+				return
+
+
+	def incrby(self, objs: list, increments: list) -> list:
+		"""
+		Increment each obj, returning the object it expelled
+		from the top k, if any
+		"""
+		ret = []
+		for obj, inc in zip(objs, increments):
+			obj = str(obj)
+			fp, cols = self._bucket(obj)
+			fp = np.uint64(fp)
+			for row, col in enumerate(cols):
+				self._increment(row, col, fp, inc)
+
+			owned = self.fingerprints[self._rows, cols] == fp
+			estimate = int(self.counts[self._rows, cols][owned].max(initial= 0))
+			ret.append(self._update_heap(obj, estimate))
+		return ret
+
+
+	def _update_heap(self, obj: str, estimate: int):
+		if obj in self.heap or len(self.heap) < self.k:
+			self.heap[obj] = estimate
+			return None
+		smallest = min(self.heap, key= self.heap.get)
+		if estimate <= self.heap[smallest]:
+			return None
+		del self.heap[smallest]
+		self.heap[obj] = estimate
+		return smallest
+
+
+	def list(self, withcount: bool) -> list:
+		ranked = sorted(self.heap.items(), key= lambda item: item[1], reverse= True)
+		if not withcount:
+			return [obj for obj, _ in ranked]
+		return [x for item in ranked for x in item]
+
+
+class SortedSet():
+	"""
+	Scores of members, ranked from the lowest score up
+	"""
+
+	def __init__(self) -> None:
+		self.scores: dict[str, float] = dict()
+
+
+	def ranked(self) -> list[tuple[str, float]]:
+		return sorted(self.scores.items(), key= lambda item: (item[1], item[0]))
+
+
+	def incrby(self, member, amount: float) -> float:
+		member = str(member)
+		self.scores[member] = self.scores.get(member, 0) + amount
+		return self.scores[member]
+
+
+	def range(self, start: int, end: int, reverse= False) -> list[tuple[str, float]]:
+		"""
+		Members ranked start to end inclusive, negative ranks counting
+		back from the last one, as redis does
+		"""
+		ranked = self.ranked()
+		if reverse:
+			ranked.reverse()
+		n = len(ranked)
+		start = max(start + n if start < 0 else start, 0)
+		end = end + n if end < 0 else end
+		return ranked[start:end + 1]
+
+
+class LocalStore():
+	"""
+	Keys and the values behind them. Methods are named after the
+	redis commands they stand in for
+	"""
+
+	def __init__(self) -> None:
+		self._data: dict = dict()
+
+
+	def _get_typed(self, key, cls):
+		try:
+			value = self._data[key]
+		except KeyError:
+			raise ResponseError(f"{key}: key does not exist")
+		if not isinstance(value, cls):
+			raise ResponseError(f"{key}: wrong type of value")
+		return value
+
+
+	def get(self, key):
+		value = self._data.get(key)
+		return value if isinstance(value, (str, bytes)) else None
+
+
+	def set(self, key, value) -> bool:
+		self._data[key] = value
+		return True
+
+
+	def exists(self, *keys) -> int:
+		return sum(key in self._data for key in keys)
+
+
+	def delete(self, *keys) -> int:
+		return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+	def hset(self, key, mapping: dict) -> int:
+		if key not in self._data:
+			self._data[key] = dict()
+		fields = self._get_typed(key, dict)
+		added = len(mapping.keys() - fields.keys())
+		fields.update({field: str(value) for field, value in mapping.items()})
+		return added
+
+
+	def hincrby(self, key, field, amount= 1) -> int:
+		self.hset(key, {})
+		fields = self._get_typed(key, dict)
+		fields[field] = str(int(fields.get(field, 0)) + amount)
+		return int(fields[field])
+
+
+	def hgetall(self, key) -> dict:
+		if key not in self._data:
+			return dict()
+		return dict(self._get_typed(key, dict))
+
+
+	def zincrby(self, key, amount, value) -> float:
+		if key not in self._data:
+			self._data[key] = SortedSet()
+		return self._get_typed(key, SortedSet).incrby(value, amount)
+
+
+	def zrevrange(self, key, start, end, withscores= False) -> list:
+		if key not in self._data:
+			return []
+		ranked = self._get_typed(key, SortedSet).range(start, end, reverse= True)
+		return ranked if withscores else [member for member, _ in ranked]
+
+
+	def zmscore(self, key, members) -> list:
+		scores = self._get_typed(key, SortedSet).scores if key in self._data else {}
+		return [scores.get(str(member)) for member in members]
+
+
+	def zremrangebyrank(self, key, start, end) -> int:
+		if key not in self._data:
+			return 0
+		zset = self._get_typed(key, SortedSet)
+		removed = zset.range(start, end)
+		for member, _ in removed:
+			del zset.scores[member]
+		return len(removed)
+
+
+	def zunionstore(self, dest, keys, aggregate= None) -> int:
+		"""
+		Only the sum of weighted sets, all of them in
+		a dict of weights by key
+		"""
+		union = SortedSet()
+		for key, weight in dict(keys).items():
+			if key in self._data:
+				for member, score in self._get_typed(key, SortedSet).scores.items():
+					union.incrby(member, score * weight)
+		self._data[dest] = union
+		return len(union.scores)
+
+
+	def dump(self, key) -> tuple[dict, list[np.ndarray]]:
+		"""
+		Split the value at key into a json serializable header and
+		the arrays holding its counters, for restore() to put back
+		"""
+		value = self._data.get(key)
+		if isinstance(value, CountMinSketch):
+			header = {"type": "cms", "width": value.width, "depth": value.depth}
+			return header, [value.table]
+		if isinstance(value, HeavyKeeper):
+			header = {
+				"type": "topk",
+				"k": value.k,
+				"width": value.width,
+				"depth": value.depth,
+				"decay": value.decay,
+				"heap": value.heap,
+			}
+			return header, [value.fingerprints, value.counts]
+		if isinstance(value, SortedSet):
+			header = {"type": "zset", "members": list(value.scores)}
+			return header, [np.fromiter(value.scores.values(), dtype= np.float64)]
+		if isinstance(value, str):
+			return {"type": "string", "value": value}, []
+		raise ResponseError(f"{key}: value can not be dumped")
+
+
+	def restore(self, key, header: dict, arrays: list[np.ndarray]) -> bool:
+		if header["type"] == "cms":
+			value = CountMinSketch(header["width"], header["depth"])
+			value.table = arrays[0]
+		elif header["type"] == "topk":
+			value = HeavyKeeper(header["k"], header["width"], header["depth"], header["decay"])
+			value.fingerprints, value.counts = arrays
+			value.heap = dict(header["heap"])
+		elif header["type"] == "zset":
+			value = SortedSet()
+			value.scores = dict(zip(header["members"], arrays[0].tolist()))
+		else:
+			value = header["value"]
+		self._data[key] = value
+		return True
+
+
+	def cms_initbydim(self, key, width, depth) -> bool:
+		if key in self._data:
+			raise ResponseError(f"{key}: key already exists")
+		self._data[key] = CountMinSketch(width, depth)
+		return True
+
+
+	def cms_incrby(self, key, items, increments) -> list[int]:
+		return self._get_typed(key, CountMinSketch).incrby(items, increments)
+
+
+	def cms_query(self, key, *items) -> list[int]:
+		return self._get_typed(key, CountMinSketch).query(items)
+
+
+	def topk_reserve(self, key, k, width, depth, decay) -> bool:
+		if key in self._data:
+			raise ResponseError(f"{key}: key already exists")
+		self._data[key] = HeavyKeeper(k, width, depth, decay)
+		return True
+
+
+	def topk_add(self, key, *items) -> list:
+		return self.topk_incrby(key, items, [1] * len(items))
+
+
+	def topk_incrby(self, key, items, increments) -> list:
+		return self._get_typed(key, HeavyKeeper).incrby(items, increments)
+
+
+	def topk_list(self, key, withcount= False) -> list:
+		return self._get_typed(key, HeavyKeeper).list(withcount)
+
+
+class _Namespace():
+	"""
+	Route calls like cms().incrby() to LocalStore.cms_incrby()
+	"""
+
+	def __init__(self, commands, prefix: str) -> None:
+		self._commands = commands
+		self._prefix = prefix
+
+
+	def __getattr__(self, name):
+		method = getattr(self._commands._store, self._prefix + name)
+		return lambda *args, **kwargs: self._commands._run(method, *args, **kwargs)
+
+
+class _Commands(ABC):
+	"""
+	The command surface shared by LocalClient and LocalPipeline
+	"""
+
+	_store: LocalStore
+
+	@abstractmethod
+	async def _run(self, method, *args, **kwargs):
+		"""
+		Run method of the store now, or queue it
+		"""
+		...
+
+
+	def cms(self):
+		return _Namespace(self, "cms_")
+
+
+	def topk(self):
+		return _Namespace(self, "topk_")
+
+
+	def get(self, key):
+		return self._run(self._store.get, key)
+
+
+	def set(self, key, value):
+		return self._run(self._store.set, key, value)
+
+
+	def exists(self, *keys):
+		return self._run(self._store.exists, *keys)
+
+
+	def delete(self, *keys):
+		return self._run(self._store.delete, *keys)
+
+
+	def hset(self, key, mapping: dict):
+		return self._run(self._store.hset, key, mapping)
+
+
+	def hincrby(self, key, field, amount= 1):
+		return self._run(self._store.hincrby, key, field, amount)
+
+
+	def hgetall(self, key):
+		return self._run(self._store.hgetall, key)
+
+
+	def zincrby(self, key, amount, value):
+		return self._run(self._store.zincrby, key, amount, value)
+
+
+	def zrevrange(self, key, start, end, withscores= False):
+		return self._run(self._store.zrevrange, key, start, end, withscores)
+
+
+	def zmscore(self, key, members):
+		return self._run(self._store.zmscore, key, members)
+
+
+	def zremrangebyrank(self, key, start, end):
+		return self._run(self._store.zremrangebyrank, key, start, end)
+
+
+	def zunionstore(self, dest, keys, aggregate= None):
+		return self._run(self._store.zunionstore, dest, keys, aggregate)
+
+
+class LocalClient(_Commands):
+	"""
+	Mirrors the parts of redis.asyncio.Redis the trends app uses
+	"""
+
+	def __init__(self, store: LocalStore = None) -> None:
+		self._store = store or LocalStore()
+
+
+	@property
+	def store(self) -> LocalStore:
+		return self._store
+
+
+	async def _run(self, method, *args, **kwargs):
+		return method(*args, **kwargs)
+
+
+	def pipeline(self):
+		return LocalPipeline(self._store)
+
+
+	async def close(self):
+		pass
+
+
+class LocalPipeline(_Commands):
+	"""
+	Mirrors redis.asyncio's Pipeline: commands are queued and
+	return the pipeline until execute() runs them in order
+	"""
+
+	def __init__(self, store: LocalStore) -> None:
+		self._store = store
+		self._queued = []
+
+
+	def __len__(self) -> int:
+		return len(self._queued)
+
+
+	async def _run(self, method, *args, **kwargs):
+		self._queued.append((method, args, kwargs))
+		return self
+
+
+	async def execute(self, raise_on_error= True) -> list:
+		queued, self._queued = self._queued, []
+		ret = []
+		for method, args, kwargs in queued:
+			try:
+				ret.append(method(*args, **kwargs))
+			except ResponseError as e:
+				if raise_on_error:
+					raise
+				ret.append(e)
+		return ret
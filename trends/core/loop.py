@@ -7,14 +7,38 @@ import asyncio
 import os
 import signal
 import threading
+import time
 
+from trends.core import ingest, metrics
 from trends.core.clock import Clock
 from trends.core.listen import notify_all, start_all, stop_all
 
 
 loop: asyncio.AbstractEventLoop = None
 
-queue: asyncio.Queue = None
+# most events read from each stream at once
+BATCH_SIZE = 256
+
+# most batches being handled at any one time
+MAX_IN_FLIGHT = 4
+
+# seconds to wait on the ingest log before checking whether to quit
+READ_BLOCK = 1
+
+_events = metrics.counter("trends_events_total", "Events read from the ingest log")
+
+_batch_size = metrics.histogram(
+	"trends_batch_size",
+	"Events per batch read from the ingest log",
+	buckets= (1, 4, 16, 64, 128, BATCH_SIZE),
+)
+
+_lag = metrics.gauge(
+	"trends_ingest_lag_seconds",
+	"Age of the last event read from the ingest log when it was read",
+)
+
+_in_flight = metrics.gauge("trends_batches_in_flight", "Batches being handled")
 
 
 class Register():
@@ -60,10 +84,24 @@ def start():
 	ready.wait()
 
 
+def run():
+	"""
+	Run the event loop in this thread, until SIGINT or SIGTERM
+	"""
+	ready, quit = threading.Event(), threading.Event()
+
+	def kill(*args):
+		quit.set()
+
+	signal.signal(signal.SIGINT, kill)
+	signal.signal(signal.SIGTERM, kill)
+	entry(ready, quit)
+
+
 def entry(ready: threading.Event, quit: threading.Event):
 	"""
 	This runs in another thread, initializes an asyncio loop,
-	the interface Queue and sets ready
+	sets ready and then handles events read from the ingest log
 	Exits when quit is set
 	"""
 
@@ -71,25 +109,43 @@ def entry(ready: threading.Event, quit: threading.Event):
 		"""
 		Entry point into async context
 		"""
+		in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+		batches: set[asyncio.Task] = set()
+
+		async def consume(records):
+			try:
+				await notify_all(records)
+			finally:
+				in_flight.release()
+				_in_flight.set(len(batches) - 1)
 
 		try:
+			# the streams of the groups taken are read from the
+			# offsets their listeners committed
 			await start_all()
 
-			global loop, queue
+			global loop
 			loop = asyncio.get_running_loop()
-			queue = asyncio.Queue()
 			ready.set()
 
-			while True:
-				try:
-					event = await asyncio.wait_for(queue.get(), 1)
-					asyncio.create_task(notify_all(event))
-
-				except asyncio.TimeoutError:
-					if quit.is_set():
-						break
+			while not quit.is_set():
+				records = await ingest.read(BATCH_SIZE, READ_BLOCK)
+				if not records:
+					continue
+				_events.inc(len(records))
+				_batch_size.observe(len(records))
+				_lag.set(time.time() - max(record.created for record in records))
+
+				# stop reading the log while too many batches
+				# are still being handled
+				await in_flight.acquire()
+				task = asyncio.create_task(consume(records))
+				batches.add(task)
+				task.add_done_callback(batches.discard)
+				_in_flight.set(len(batches))
 
 		finally:
+			await asyncio.gather(*batches, return_exceptions= True)
 			await stop_all()
 			await asyncio.gather(*Clock._tasks)
 	
@@ -0,0 +1,304 @@
+"""
+Counters, gauges and histograms describing the trends engine, rendered
+in the prometheus text format
+
+Every process keeps its own registry. Trends workers publish theirs on
+a clock, so that the metrics endpoint of any web process and the
+trends_metrics command show every worker, each sample labelled with
+the worker it comes from
+"""
+
+import bisect
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+from trends.core import shard, state
+from trends.core.client import BACKEND, get_blocking_client, get_global_client
+from trends.core.clock import Clock
+
+
+# a hash with a field per worker, holding the json of its metrics.
+# The only worker of the local backend writes the metrics file
+METRICS_KEY = "trends:metrics"
+
+# seconds between two publications of this worker's metrics
+PUBLISH_INTERVAL = 10
+
+# seconds after which the metrics of a worker that stopped
+# publishing are no longer shown
+PUBLISH_TTL = 3 * PUBLISH_INTERVAL
+
+# upper bounds of the default histogram buckets, in seconds
+LATENCY_BUCKETS = (
+	0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+
+
+class Metric():
+	"""
+	A named value per combination of label values. Safe to update
+	from any thread
+	"""
+
+	type: str
+
+	def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.labels = tuple(labels)
+		self._values: dict[tuple, object] = dict()
+		self._lock = threading.Lock()
+
+
+	def _key(self, labels: dict) -> tuple:
+		return tuple(str(labels[label]) for label in self.labels)
+
+
+	def _labels(self, key: tuple) -> dict:
+		return dict(zip(self.labels, key))
+
+
+	def samples(self) -> list[list]:
+		"""
+		[name, labels, value] of every sample of this metric
+		"""
+		with self._lock:
+			return [[self.name, self._labels(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+	"""
+	A value that only goes up
+	"""
+
+	type = "counter"
+
+	def inc(self, amount: float = 1, **labels) -> None:
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+	"""
+	A value that goes up and down. A gauge given a function reads
+	its only value from it whenever it is sampled
+	"""
+
+	type = "gauge"
+
+	def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), function= None) -> None:
+		super().__init__(name, help, labels)
+		self._function = function
+
+
+	def set(self, value: float, **labels) -> None:
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = value
+
+
+	def samples(self) -> list[list]:
+		if self._function:
+			value = self._function()
+			return [] if value is None else [[self.name, {}, value]]
+		return super().samples()
+
+
+class Histogram(Metric):
+	"""
+	Counts of observed values per bucket, along with their sum
+	"""
+
+	type = "histogram"
+
+	def __init__(
+		self,
+		name: str,
+		help: str,
+		labels: tuple[str, ...] = (),
+		buckets: tuple[float, ...] = LATENCY_BUCKETS,
+	) -> None:
+		super().__init__(name, help, labels)
+		self.buckets = tuple(sorted(buckets))
+
+
+	def observe(self, value: float, **labels) -> None:
+		key = self._key(labels)
+		with self._lock:
+			counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+			counts[bisect.bisect_left(self.buckets, value)] += 1
+			self._values[key] = counts, total + value
+
+
+	@contextmanager
+	def time(self, **labels):
+		"""
+		Observe the seconds spent in a with block
+		"""
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - start, **labels)
+
+
+	def samples(self) -> list[list]:
+		with self._lock:
+			values = list(self._values.items())
+
+		ret = []
+		for key, (counts, total) in values:
+			labels = self._labels(key)
+			cumulative = 0
+			for bound, count in zip([*self.buckets, "+Inf"], counts):
+				cumulative += count
+				ret.append([f"{self.name}_bucket", {**labels, "le": str(bound)}, cumulative])
+			ret.append([f"{self.name}_sum", labels, total])
+			ret.append([f"{self.name}_count", labels, cumulative])
+		return ret
+
+
+class Registry():
+	"""
+	Every metric of a process, by name
+	"""
+
+	def __init__(self) -> None:
+		self._metrics: dict[str, Metric] = dict()
+
+
+	def register(self, metric: Metric) -> Metric:
+		if metric.name in self._metrics:
+			raise ValueError(f"{metric.name}: metric already registered")
+		self._metrics[metric.name] = metric
+		return metric
+
+
+	def families(self) -> list[dict]:
+		"""
+		Every metric and its samples, as plain types
+		"""
+		return [
+			{"name": m.name, "type": m.type, "help": m.help, "samples": m.samples()}
+			for m in self._metrics.values()
+		]
+
+
+registry = Registry()
+
+
+def counter(name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+	return registry.register(Counter(name, help, labels))
+
+
+def gauge(name: str, help: str, labels: tuple[str, ...] = (), function= None) -> Gauge:
+	return registry.register(Gauge(name, help, labels, function))
+
+
+def histogram(
+	name: str,
+	help: str,
+	labels: tuple[str, ...] = (),
+	buckets: tuple[float, ...] = LATENCY_BUCKETS,
+) -> Histogram:
+	return registry.register(Histogram(name, help, labels, buckets))
+
+
+redis_commands = counter(
+	"trends_redis_commands_total",
+	"Commands sent to redis in pipelines",
+	("source",),
+)
+
+redis_round_trips = counter(
+	"trends_redis_round_trips_total",
+	"Pipelines executed",
+	("source",),
+)
+
+
+def round_trip(source: str, pipe) -> None:
+	"""
+	Count a pipeline about to be executed, and the commands queued on it
+	"""
+	redis_round_trips.inc(source= source)
+	redis_commands.inc(len(pipe), source= source)
+
+
+def _shared() -> bool:
+	return BACKEND == "redis"
+
+
+async def publish():
+	"""
+	Publish the metrics of this worker for other processes to read
+	"""
+	data = {"time": time.time(), "families": registry.families()}
+	if _shared():
+		await get_global_client().hset(METRICS_KEY, mapping= {
+			shard.worker_id: json.dumps(data),
+		})
+	else:
+		state.publish("metrics", {shard.worker_id: data})
+
+
+async def unpublish():
+	if _shared():
+		await get_global_client().hdel(METRICS_KEY, shard.worker_id)
+
+
+def collect() -> dict[str, list[dict]]:
+	"""
+	The families of this process and of every worker that published
+	recently, by worker id
+	"""
+	workers = {shard.worker_id: registry.families()}
+	if _shared():
+		published = {
+			worker: json.loads(data)
+			for worker, data in get_blocking_client().hgetall(METRICS_KEY).items()
+		}
+	else:
+		published = state.published("metrics") or {}
+
+	now = time.time()
+	for worker, data in published.items():
+		if worker not in workers and now - data["time"] < PUBLISH_TTL:
+			workers[worker] = data["families"]
+	return workers
+
+
+def render(workers: dict[str, list[dict]]) -> str:
+	"""
+	The families of every worker in the prometheus text format,
+	merged by metric and labelled with their worker
+	"""
+	merged: dict[str, dict] = dict()
+	for worker, families in workers.items():
+		for family in families:
+			m = merged.setdefault(family["name"], {**family, "samples": []})
+			m["samples"].extend(
+				[name, {"worker": worker, **labels}, value]
+				for name, labels, value in family["samples"]
+			)
+
+	lines = []
+	for family in merged.values():
+		if not family["samples"]:
+			continue
+		lines.append(f"# HELP {family['name']} {family['help']}")
+		lines.append(f"# TYPE {family['name']} {family['type']}")
+		for name, labels, value in family["samples"]:
+			labels = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+			lines.append(f"{name}{{{labels}}} {value}")
+	return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_publish_clock = Clock(publish, PUBLISH_INTERVAL)
@@ -0,0 +1,295 @@
+"""
+Trends personalised with the follow graph. The trends loop keeps the
+decayed counts of the objects every user tweets about, and a viewer's
+trends are the global ones reranked by how much the people they follow
+take part in each. Only the global candidates are ever looked up, so
+a viewer costs a small vector, cached for a while, and no sketch
+"""
+
+import asyncio
+from collections import Counter, defaultdict
+import datetime
+import json
+import time
+from typing import Type
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from trends.core import shard, state
+from trends.core.cache import StaleCache
+from trends.core.client import BACKEND, get_blocking_client, get_global_client, get_pipe
+from trends.core.decay import Decay, DecayedCounter
+# required so we can catch enzyme_class from globals()
+from trends.core.enzymes import *
+from trends.core.scheduler import scheduler
+
+
+# the sorted set of "user_id:obj" counts of each partition of each
+# kind of object
+AFFINITY_PREFIX = "trends:affinity:"
+
+# a hash of the counter behind each of those sorted sets, as deconstructed.
+# Partitions move their landmarks apart, so their weights are read scaled
+AFFINITY_COUNTERS_KEY = "trends:affinity:counters"
+
+# most followed users whose activity is looked up for a viewer
+MAX_FOLLOWS = getattr(settings, "TRENDS_PERSONAL_MAX_FOLLOWS", 500)
+
+# most "user_id:obj" pairs looked up for a viewer, fewer follows
+# are looked up the more candidates there are
+MAX_MEMBERS = getattr(settings, "TRENDS_PERSONAL_MAX_MEMBERS", 2000)
+
+# share of a personalised score that comes from the follow graph,
+# the rest comes from the global rank
+PERSONAL_WEIGHT = getattr(settings, "TRENDS_PERSONAL_WEIGHT", 0.5)
+
+_VECTOR_TIMEOUT = datetime.timedelta(seconds= 60)
+
+# seconds a process not running the local trends loop
+# reuses the affinities it last read
+READ_INTERVAL = 10
+
+# when the published affinities were last read, and what they were
+_read: tuple[float, dict] = (float("-inf"), None)
+
+_vectors = StaleCache(
+	maxsize= getattr(settings, "TRENDS_PERSONAL_CACHE_SIZE", 4096),
+	timeout= _VECTOR_TIMEOUT.total_seconds(),
+	alias= getattr(settings, "TRENDS_CACHE", None),
+	name= "personal",
+)
+
+
+class Affinity():
+	"""
+	Decayed counts of "user_id:obj" pairs, in one sorted set at a key
+	every process knows, so that views read it without the listener
+	"""
+
+	# pairs kept, the lowest ones are pruned
+	MAX_MEMBERS = 100_000
+
+	# seconds between two prunings
+	PRUNE_INTERVAL = 60
+
+	def __init__(self, enzyme_class: Type[BaseEnzyme]) -> None:
+		"""
+		Use make() to create Affinity objects
+		"""
+		self._enzyme = enzyme_class()
+		self._counter: DecayedCounter
+
+
+	def _start(self):
+		scheduler.add(self.PRUNE_INTERVAL, self._prune)
+
+
+	def terminate(self):
+		scheduler.remove(self.PRUNE_INTERVAL, self._prune)
+
+
+	@classmethod
+	async def make(cls, enzyme_class: Type[BaseEnzyme], decay: Decay, key: str):
+		a = cls(enzyme_class)
+		a._counter = DecayedCounter(decay, key, publish= AFFINITY_COUNTERS_KEY)
+		a._start()
+		return a
+
+
+	def digest(self, events) -> Counter:
+		"""
+		Count the pairs digested from a batch of events
+		"""
+		return self._enzyme.count(events)
+
+
+	async def stage(self, counts: Counter, batch):
+		"""
+		Stage decayed increments of counts on a CommandBatch
+		"""
+		if counts:
+			self._counter.stage(counts, batch, time.time())
+
+
+	async def fetch(self, members: tuple) -> list:
+		"""
+		The stored weights of members, None for those never seen
+		"""
+		if not members:
+			return []
+		return await get_global_client().zmscore(self._counter._key, list(members))
+
+
+	async def _prune(self, pipe, boundary: float) -> list:
+		"""
+		Called by the scheduler, drop all but the MAX_MEMBERS highest pairs
+		"""
+		await pipe.zremrangebyrank(self._counter._key, 0, -self.MAX_MEMBERS - 1)
+		return []
+
+
+	@classmethod
+	async def construct(cls, obj: dict):
+		"""
+		An alternative to make() where an object returned by
+		a previous deconstruct() is available
+		"""
+		a = cls(globals()[obj["enzyme_class"]])
+		a._counter = DecayedCounter.construct(obj["counter"], AFFINITY_COUNTERS_KEY)
+		a._start()
+		return a
+
+
+	def deconstruct(self):
+		return {
+			"counter": self._counter.deconstruct(),
+			"enzyme_class": self._enzyme.__class__.__name__,
+		}
+
+
+def affinity_key(kind: str, partition: int = 0) -> str:
+	return AFFINITY_PREFIX + shard.partitioned(kind, partition)
+
+
+def rerank(user, kind: str, ranks: list[list]) -> list[list]:
+	"""
+	Reorder the [obj, volume] pairs of a snapshot kind for user, by
+	their global rank and the activity of those user follows. The
+	vector outlives snapshots, objects that entered the ranks since
+	it was computed only weigh in once it is refreshed
+	"""
+	if not ranks:
+		return ranks
+	candidates = tuple(str(obj) for obj, _ in ranks)
+	vector = _vectors.get(
+		(str(user.pk), kind),
+		lambda: neighbourhood(user, kind, candidates),
+	)
+	if not vector:
+		return ranks
+
+	n = len(ranks)
+	scores = [
+		(1 - PERSONAL_WEIGHT) * (n - i) / n + PERSONAL_WEIGHT * vector.get(obj, 0)
+		for i, obj in enumerate(candidates)
+	]
+	order = sorted(range(n), key= lambda i: scores[i], reverse= True)
+	return [ranks[i] for i in order]
+
+
+def neighbourhood(user, kind: str, candidates: tuple) -> dict[str, float]:
+	"""
+	The share of each candidate in the recent activity of those user
+	follows, or an empty dict if they have none
+	"""
+	follows = [
+		str(pk) for pk in
+		user.follows.values_list("pk", flat= True)[
+			:max(1, min(MAX_FOLLOWS, MAX_MEMBERS // len(candidates)))
+		]
+	]
+	if not follows:
+		return {}
+	# each pair is counted by the partition of its object
+	partitions = defaultdict(list)
+	for obj in candidates:
+		partitions[affinity_key(kind, shard.partition_of(obj))].append(obj)
+	lookups = {
+		key: [f"{follow}:{obj}" for follow in follows for obj in objs]
+		for key, objs in partitions.items()
+	}
+	try:
+		weights, counters = _lookup(lookups)
+	except RedisError:
+		return {}
+	if weights is None:
+		return {}
+
+	now = time.time()
+	activity = Counter()
+	for key, objs in partitions.items():
+		counter = counters.get(key)
+		scale = DecayedCounter.construct(json.loads(counter)).scale(now) if counter else 1
+		for i, weight in enumerate(weights[key]):
+			if weight:
+				activity[objs[i % len(objs)]] += weight / scale
+	total = sum(activity.values())
+	return {obj: weight / total for obj, weight in activity.items()} if total else {}
+
+
+async def publish(snapshot: dict):
+	"""
+	Write the weights of the pairs of every object in snapshot, and the
+	counters behind them, for the processes that can not read the local
+	store. Those only ever look up the objects of the snapshot
+	"""
+	objs = dict()
+	for kind, ranks in snapshot.items():
+		if isinstance(ranks, list):
+			for partition in range(shard.PARTITIONS):
+				objs[affinity_key(kind, partition)] = {str(obj) for obj, _ in ranks}
+
+	pipe = get_pipe()
+	for key in objs:
+		await pipe.zrevrange(key, 0, -1, withscores= True)
+	await pipe.hgetall(AFFINITY_COUNTERS_KEY)
+	*pairs, counters = await pipe.execute(raise_on_error= False)
+	weights = {
+		# members are "user_id:obj", and user ids hold no colon
+		key: {member: weight for member, weight in members if member.partition(":")[2] in objs[key]}
+		for key, members in zip(objs, pairs) if not isinstance(members, Exception)
+	}
+	state.publish("affinity", {"weights": weights, "counters": counters})
+
+
+def _lookup(lookups: dict[str, list]) -> tuple[dict[str, list], dict]:
+	"""
+	The weights of the members of each key, and the counters of every
+	key, in one round trip from a process that may not run the trends loop.
+	With the local backend, processes without the loop read what the loop
+	last published instead, and both are None until it has published
+	"""
+	keys = list(lookups)
+	if BACKEND == "redis":
+		pipe = get_blocking_client().pipeline(transaction= False)
+		for key in keys:
+			pipe.zmscore(key, lookups[key])
+		pipe.hgetall(AFFINITY_COUNTERS_KEY)
+		*weights, counters = pipe.execute()
+		return dict(zip(keys, weights)), counters
+
+	async def run():
+		pipe = get_global_client().pipeline()
+		for key in keys:
+			await pipe.zmscore(key, lookups[key])
+		await pipe.hgetall(AFFINITY_COUNTERS_KEY)
+		return await pipe.execute()
+
+	# the local store lives in the loop, only touch it from there
+	from trends.core.loop import loop
+	if loop is None or loop.is_closed():
+		published = _read_published()
+		if published is None:
+			return None, None
+		weights = published["weights"]
+		return {
+			key: [weights.get(key, {}).get(member) for member in members]
+			for key, members in lookups.items()
+		}, published["counters"]
+	*weights, counters = asyncio.run_coroutine_threadsafe(run(), loop).result()
+	return dict(zip(keys, weights)), counters
+
+
+def _read_published() -> dict:
+	global _read
+
+	stamp, published = _read
+	if time.monotonic() - stamp > READ_INTERVAL:
+		try:
+			published = state.published("affinity")
+		except (OSError, ValueError):
+			# keep using the affinities last read
+			pass
+		_read = time.monotonic(), published
+	return published
@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
 import asyncio
+from collections import Counter
 
 import ulid
 
-from trends.core.client import get_global_client
+from trends.core.client import get_global_client, get_pipe
 
 
 class RedisObject(ABC):
@@ -11,6 +12,9 @@ class RedisObject(ABC):
 	Base class defining methods common to classes
 	interfacing with redis
 	"""
+
+	# objects bound to older keys by construct(), yet to be checked
+	_unchecked: list["RedisObject"] = []
 	
 	def __init__(self, prefix) -> None:
 		"""
@@ -27,6 +31,15 @@ class RedisObject(ABC):
 		Signal that the object is stored in redis
 		"""
 		self._valid.set()
+
+
+	def _invalidate(self):
+		"""
+		Signal that the commands making the object failed. It counts
+		as deleted, and whoever waits on it is let go
+		"""
+		self._deleted.set()
+		self._valid.set()
 	
 
 	@classmethod
@@ -43,7 +56,8 @@ class RedisObject(ABC):
 		"""
 		if self._deleted.is_set():
 			return False
-		return await self._valid.wait()
+		await self._valid.wait()
+		return not self._deleted.is_set()
 	
 
 	@abstractmethod
@@ -51,23 +65,45 @@ class RedisObject(ABC):
 		...
 	
 
+	async def stage(self, counts: Counter, batch) -> None:
+		"""
+		Stage an add of every obj in counts on a CommandBatch
+		instead of sending them one command at a time
+		"""
+		if not await self.ensure_valid():
+			return
+		self._stage(counts, batch)
+	
+
+	@abstractmethod
+	def _stage(self, counts: Counter, batch) -> None:
+		...
+	
+
 	@abstractmethod
 	async def get(self):
 		...
 	
 
+	@abstractmethod
+	async def query(self, pipe, *args) -> None:
+		"""
+		Queue the command behind get() on pipe. The raw reply
+		is left for the caller to interpret
+		"""
+		...
+	
+
 	@classmethod
 	async def construct(cls, obj: str):
 		"""
-		Bind a RedisObject to an older key
+		Bind a RedisObject to an older key. It is neither valid nor
+		deleted until check_constructed() finds out whether the key
+		still exists
 		"""
 		r = cls(obj)
 		r._key = obj
-
-		if await _check_exists(r._key):
-			r._valid.set()
-		else:
-			r._deleted.set()
+		RedisObject._unchecked.append(r)
 		return r
 	
 
@@ -88,11 +124,34 @@ class RedisObject(ABC):
 		await get_global_client().delete(self._key)
 	
 
-async def _check_exists(key):
+async def check_constructed():
+	"""
+	Check that the keys of every RedisObject constructed since the
+	last call still exist, all in a single round trip
+	"""
+	objs, RedisObject._unchecked = RedisObject._unchecked, []
+	if not objs:
+		return
+	pipe = get_pipe()
+	for r in objs:
+		await pipe.exists(r._key)
+	for r, exists in zip(objs, await pipe.execute()):
+		if exists:
+			r._valid.set()
+		else:
+			r._deleted.set()
+
+
+async def delete_all(objs: list[RedisObject], pipe= None):
 	"""
-	Check that the an object exists at the given key
+	Delete many objects with a single DEL, queued on pipe if passed
 	"""
-	return await get_global_client().exists(key)
+	if not objs:
+		return
+	for r in objs:
+		r._deleted.set()
+		r._valid.clear()
+	await (pipe or get_global_client()).delete(*[r._key for r in objs])
 
 
 class InvalidRedisObject(RuntimeError):
@@ -0,0 +1,162 @@
+"""
+A single task rotating every event frame, instead of a clock per frame
+"""
+
+import asyncio
+from collections import defaultdict
+import heapq
+import logging
+import time
+
+from trends.core import metrics
+from trends.core.client import get_pipe
+from trends.core.clock import TaskManager
+
+
+logger = logging.getLogger(__name__)
+
+_fire_seconds = metrics.histogram(
+	"trends_rotation_seconds",
+	"Time the callbacks due at one instant take, round trip included",
+)
+
+_callbacks_run = metrics.counter(
+	"trends_rotation_callbacks_total",
+	"Scheduled callbacks run, event frame rotations among them",
+)
+
+
+class Scheduler(TaskManager):
+	"""
+	A timer wheel for callbacks due at every multiple of their period
+	since the unix epoch. All callbacks due at the same instant run
+	together and queue their commands on one shared pipeline, sent in
+	a single round trip. A callback returns the RedisObjects it made on
+	that pipeline, they are validated once the pipeline has executed,
+	or invalidated if a command the callback queued failed
+
+	The task runs while there are callbacks and stops by itself when
+	the last one is removed
+	"""
+
+	def __init__(self) -> None:
+		self._callbacks: defaultdict[float, list] = defaultdict(list)
+		# (next due time, period) of every period with callbacks
+		self._due: list[tuple[float, float]] = []
+		self._changed: asyncio.Event = None
+		self._task: asyncio.Task = None
+
+
+	def add(self, period: float, callback) -> None:
+		"""
+		Call callback(pipe, boundary) at every multiple of period, with
+		the multiple it is called for
+		"""
+		if period not in self._callbacks:
+			heapq.heappush(self._due, (_next(period, time.time()), period))
+		self._callbacks[period].append(callback)
+		self._wake()
+
+
+	def remove(self, period: float, callback) -> None:
+		callbacks = self._callbacks.get(period)
+		if not callbacks or callback not in callbacks:
+			return
+		callbacks.remove(callback)
+		if not callbacks:
+			del self._callbacks[period]
+			self._due = [entry for entry in self._due if entry[1] != period]
+			heapq.heapify(self._due)
+		self._wake()
+
+
+	def next_due(self) -> float | None:
+		"""
+		When callbacks are next due, as a timestamp, or None if there are none
+		"""
+		return self._due[0][0] if self._due else None
+
+
+	def _wake(self) -> None:
+		"""
+		Start the task if it is not running, or have it look at
+		the callbacks again
+		"""
+		if self._task is None or self._task.done():
+			if self._callbacks:
+				self._changed = asyncio.Event()
+				self._task = self.make_task(self._run())
+		else:
+			self._changed.set()
+
+
+	async def _run(self) -> None:
+		while self._callbacks:
+			self._changed.clear()
+			delay = self._due[0][0] - time.time()
+			if delay > 0:
+				try:
+					await asyncio.wait_for(self._changed.wait(), delay)
+					continue
+				except asyncio.TimeoutError:
+					pass
+			await self._fire()
+
+
+	async def _fire(self) -> None:
+		"""
+		Run every callback that is due in one round trip
+		"""
+		now = time.time()
+		due = []
+		while self._due and self._due[0][0] <= now:
+			_, period = heapq.heappop(self._due)
+			heapq.heappush(self._due, (_next(period, now), period))
+			# however late this is, callbacks get the latest boundary
+			boundary = now // period * period
+			due.extend((period, callback, boundary) for callback in self._callbacks[period])
+
+		with _fire_seconds.time():
+			pipe = get_pipe()
+			# the commands every callback queued, and the objects it made
+			queued = []
+			for period, callback, boundary in due:
+				# skip callbacks removed by the ones before them
+				if callback not in self._callbacks.get(period, ()):
+					continue
+				start = len(pipe)
+				try:
+					made = await callback(pipe, boundary)
+				except Exception:
+					logger.exception("Scheduled callback %r failed", callback)
+					made = []
+				queued.append((callback, start, len(pipe), made))
+				_callbacks_run.inc()
+			metrics.round_trip("scheduler", pipe)
+			results = await pipe.execute(raise_on_error= False)
+
+			for callback, start, end, made in queued:
+				errors = [r for r in results[start:end] if isinstance(r, Exception)]
+				if errors:
+					logger.error("Commands of scheduled callback %r failed: %s", callback, errors[0])
+				for r in made:
+					if errors:
+						r._invalidate()
+					else:
+						r._validate()
+
+
+def _next(period: float, now: float) -> float:
+	"""
+	The first multiple of period after now
+	"""
+	return (now // period + 1) * period
+
+
+scheduler = Scheduler()
+
+metrics.gauge(
+	"trends_scheduler_next_due_seconds",
+	"Seconds until scheduled callbacks are next due",
+	function= lambda: None if scheduler.next_due() is None else scheduler.next_due() - time.time(),
+)
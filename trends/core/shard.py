@@ -0,0 +1,211 @@
+"""
+Coordination between trend workers. Every worker registers itself
+with a heartbeat, and each group of listeners is owned by whichever
+worker holds its lease: a redis key set only if absent, that expires
+unless the owner renews it. A worker that dies stops renewing, and
+another one takes its groups over once the leases expire
+
+Taking a lease also bumps the fencing token of the group, and the
+writes of a group only go through while its token is the one its
+owner got, so a worker whose lease ran out unnoticed never writes
+counts the new owner also makes
+
+The objects of every kind are hashed into PARTITIONS partitions, each
+counted by a group of its own, so up to PARTITIONS workers share a kind
+
+The local backend only ever runs in one process, which owns everything:
+the first process on the host to claim() the lock file of the state
+directory
+"""
+
+import fcntl
+import os
+import socket
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+from redis.exceptions import WatchError
+
+from trends.core.client import BACKEND, get_global_client, get_pipe
+from trends.core.state import STATE_DIR
+
+
+WORKERS_KEY = "trends:workers"
+
+LEASE_PREFIX = "trends:lease:"
+
+FENCE_PREFIX = "trends:fence:"
+
+# partitions the objects of every kind are hashed into
+PARTITIONS = getattr(settings, "TRENDS_PARTITIONS", 1)
+
+# seconds a lease or a heartbeat lasts without being renewed
+LEASE_TTL = 15
+
+# seconds between two renewals, well within LEASE_TTL
+RENEW_INTERVAL = 5
+
+worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# the groups of listeners this worker holds the lease of, by name
+owned: dict[str, tuple] = dict()
+
+# the fencing token of every group this worker took the lease of
+tokens: dict[str, int] = dict()
+
+# open for as long as this process holds the lock of the local backend
+_lock_file = None
+
+# take a lease if it is free, and bump the fencing token of its group
+_ACQUIRE = """
+if redis.call("set", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+	return redis.call("incr", KEYS[2])
+end
+return 0
+"""
+
+# extend a lease only if this worker still holds it
+_RENEW = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+	return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# delete a lease only if this worker still holds it
+_RELEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+	return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _shared() -> bool:
+	return BACKEND == "redis"
+
+
+def partition_of(obj) -> int:
+	"""
+	The partition of obj, the same in every process
+	"""
+	return zlib.crc32(str(obj).encode()) % PARTITIONS
+
+
+def partitioned(name: str, partition: int) -> str:
+	"""
+	The name of the partition of name, name itself if there is only one
+	"""
+	return name if PARTITIONS == 1 else f"{name}:{partition}"
+
+
+def claim() -> bool:
+	"""
+	Whether this process may run the trends loop. Any number of workers
+	share the leases of the redis backend, but the local backend keeps
+	trends in the memory of a single process, the one holding the lock.
+	It is let go of when the process exits
+	"""
+	global _lock_file
+	if _shared() or _lock_file:
+		return True
+	STATE_DIR.mkdir(parents= True, exist_ok= True)
+	f = open(STATE_DIR / "loop.lock", "w")
+	try:
+		fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+	except BlockingIOError:
+		f.close()
+		return False
+	_lock_file = f
+	return True
+
+
+async def heartbeat() -> int:
+	"""
+	Tell other workers this one is alive, and return
+	how many workers are, this one included
+	"""
+	if not _shared():
+		return 1
+	now = time.time()
+	pipe = get_pipe()
+	await pipe.zadd(WORKERS_KEY, {worker_id: now})
+	await pipe.zremrangebyscore(WORKERS_KEY, "-inf", now - LEASE_TTL)
+	await pipe.zcard(WORKERS_KEY)
+	return (await pipe.execute())[-1]
+
+
+async def leave():
+	"""
+	Stop counting as a live worker straight away
+	"""
+	if _shared():
+		await get_global_client().zrem(WORKERS_KEY, worker_id)
+
+
+async def acquire(name: str) -> bool:
+	"""
+	Take the lease of name if no worker holds it
+	"""
+	if not _shared():
+		return True
+	token = await get_global_client().eval(
+		_ACQUIRE, 2, LEASE_PREFIX + name, FENCE_PREFIX + name, worker_id, LEASE_TTL * 1000
+	)
+	if token:
+		tokens[name] = int(token)
+	return bool(token)
+
+
+async def renew(name: str) -> bool:
+	"""
+	Extend the lease of name, returning False if this
+	worker lost it in the meantime
+	"""
+	if not _shared():
+		return True
+	return bool(await get_global_client().eval(
+		_RENEW, 1, LEASE_PREFIX + name, worker_id, LEASE_TTL * 1000
+	))
+
+
+async def release(name: str):
+	"""
+	Give the lease of name up, so another worker may take it at once
+	"""
+	tokens.pop(name, None)
+	if _shared():
+		await get_global_client().eval(_RELEASE, 1, LEASE_PREFIX + name, worker_id)
+
+
+async def commit(queue, groups: list[str]) -> list[str]:
+	"""
+	Send what the coroutine queue(pipe, groups) queues on a pipeline in one
+	transaction, leaving out the groups whose fencing token changed since
+	this worker took them. Those are returned, another worker owns them
+	"""
+	if not _shared() or not groups:
+		pipe = get_pipe()
+		await queue(pipe, groups)
+		await pipe.execute()
+		return []
+
+	keys = [FENCE_PREFIX + group for group in groups]
+	async with get_global_client().pipeline() as pipe:
+		while True:
+			try:
+				await pipe.watch(*keys)
+				current = await pipe.mget(keys)
+				lost = [
+					group for group, token in zip(groups, current)
+					if token is None or int(token) != tokens.get(group)
+				]
+				pipe.multi()
+				await queue(pipe, [group for group in groups if group not in lost])
+				await pipe.execute()
+				return lost
+			except WatchError:
+				# a group changed hands in the meantime, look again
+				continue
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+A ranked snapshot of everything trending, computed by the trends
+loop on a clock so that views never have to query the listeners
+"""
+
+import asyncio
+import json
+import time
+
+from redis.exceptions import RedisError
+
+from trends.core import metrics, personal, shard, state
+from trends.core.client import (
+	BACKEND,
+	get_blocking_client,
+	get_global_client,
+	get_pipe,
+)
+from trends.core.clock import Clock
+from trends.core.listeners import KINDS, kind_of, listener_groups
+
+
+# a hash with a field per group of listeners, written by the worker
+# owning it, and the version and time of the last write. The local
+# backend also writes the whole snapshot to a file
+SNAPSHOT_KEY = "trends:snapshot:kinds"
+
+# seconds between two snapshots
+SNAPSHOT_INTERVAL = 10
+
+# how many objects of each kind a snapshot ranks
+SNAPSHOT_SIZE = 20
+
+EMPTY = {
+	"version": 0,
+	"created": None,
+	"tweets": [],
+	"tags": [],
+	"users": [],
+	"keywords": [],
+}
+
+# seconds a process not running the trends loop
+# reuses the snapshot it last read
+READ_INTERVAL = 2
+
+# the latest snapshot published by this process
+_slot: dict = None
+
+# when the latest published snapshot was last read, and what it was
+_read: tuple[float, dict] = (float("-inf"), None)
+
+async def _rank(trend_listener, volume_listener) -> list[list]:
+	"""
+	The top objects of a trend listener, with their volumes and scores
+	"""
+	ranked = await trend_listener.fetch(SNAPSHOT_SIZE, True)
+	objs = [obj for obj, _ in ranked]
+	return [
+		[obj, volume, score]
+		for (obj, score), volume in zip(ranked, await volume_listener.fetch(objs))
+	]
+
+
+async def publish():
+	"""
+	Rank the objects of every group of listeners this worker owns, and
+	publish them in one atomic write next to those of other workers
+	"""
+	global _slot
+
+	groups = list(shard.owned)
+	ranked = await asyncio.gather(
+		*[_rank(*listener_groups[group][:2]) for group in groups],
+		# a group handed back meanwhile fails, the new owner publishes it
+		return_exceptions= True,
+	)
+	parts = {
+		group: ranks for group, ranks in zip(groups, ranked)
+		if not isinstance(ranks, Exception)
+	}
+	if not parts:
+		return
+
+	pipe = get_pipe()
+	await pipe.hset(SNAPSHOT_KEY, mapping= {
+		**{group: json.dumps(ranks) for group, ranks in parts.items()},
+		"created": time.time(),
+	})
+	await pipe.hincrby(SNAPSHOT_KEY, "version", 1)
+	await pipe.hgetall(SNAPSHOT_KEY)
+	_slot = _decode((await pipe.execute())[-1])
+	if BACKEND == "local":
+		state.publish("snapshot", _slot)
+		await personal.publish(_slot)
+
+
+def latest() -> dict:
+	"""
+	Return the latest snapshot, or EMPTY if none has been published yet.
+	Processes that do not run the trends loop read the one published
+	by the worker, at most every READ_INTERVAL seconds
+	"""
+	if _slot is not None:
+		return _slot
+	return _read_published() or EMPTY
+
+
+def _read_published() -> dict:
+	global _read
+
+	stamp, snapshot = _read
+	if time.monotonic() - stamp > READ_INTERVAL:
+		try:
+			if BACKEND == "local":
+				snapshot = state.published("snapshot")
+			else:
+				snapshot = _decode(get_blocking_client().hgetall(SNAPSHOT_KEY))
+		except (RedisError, OSError, ValueError):
+			# keep serving the last snapshot read
+			pass
+		_read = time.monotonic(), snapshot
+	return snapshot
+
+
+def _decode(fields: dict) -> dict:
+	"""
+	Turn the fields of SNAPSHOT_KEY into a snapshot, or None if empty.
+	The objects of the partitions of a kind are merged by score
+	"""
+	if not fields:
+		return None
+	snapshot = dict(EMPTY)
+	for kind in KINDS:
+		ranks = [
+			entry for group in listener_groups if kind_of(group) == kind
+			for entry in json.loads(fields.get(group, "[]"))
+		]
+		# older snapshots ranked [obj, volume] pairs, in order
+		ranks.sort(key= lambda entry: entry[2] if len(entry) > 2 else 0, reverse= True)
+		snapshot[kind] = [entry[:2] for entry in ranks[:SNAPSHOT_SIZE]]
+	snapshot["version"] = int(fields.get("version", 0))
+	snapshot["created"] = float(fields["created"]) if "created" in fields else None
+	return snapshot
+
+
+async def restore():
+	"""
+	Start from the last published snapshot, until this process publishes
+	"""
+	global _slot
+
+	if BACKEND == "local":
+		snapshot = state.published("snapshot")
+	else:
+		snapshot = _decode(await get_global_client().hgetall(SNAPSHOT_KEY))
+	if snapshot and not _slot:
+		_slot = snapshot
+
+
+_snapshot_clock = Clock(publish, SNAPSHOT_INTERVAL)
+
+metrics.gauge(
+	"trends_snapshot_age_seconds",
+	"Seconds since the snapshot this process serves was published",
+	function= lambda: None if _slot is None else time.time() - _slot["created"],
+)
@@ -0,0 +1,156 @@
+"""
+Saved listener state in a compact, versioned binary format
+
+A state starts with a header of MAGIC, the format VERSION and the size
+of the compressed json structure that follows (frames, queues and keys).
+With the local backend the structure is followed by the compressed raw
+arrays of every sketch it refers to, so counts survive a restart too.
+Redis keeps the sketches itself, so its states only hold the structure
+
+The directory also holds what the process running the local backend
+publishes for the other processes of the host, such as the snapshot
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+import struct
+import zlib
+
+from django.conf import settings
+import numpy as np
+
+from trends.core.client import BACKEND, get_binary_client, get_global_client
+from trends.core.ingest import OFFSET_KEY
+from trends.core.local import LocalStore
+
+
+MAGIC = b"TRND"
+
+VERSION = 1
+
+# magic, version, size of the compressed structure
+_HEADER = struct.Struct("<4sBI")
+
+# directory the local backend saves states in
+STATE_DIR = Path(getattr(settings, "TRENDS_STATE_DIR", settings.BASE_DIR / "trends-state"))
+
+
+def dumps(state: dict, store: LocalStore = None, keys: list[str] = ()) -> bytes:
+	"""
+	Serialize state, along with the values of those keys
+	that are in store when one is given
+	"""
+	entries, arrays = [], []
+	for key in keys if store else ():
+		if not store.exists(key):
+			continue
+		header, values = store.dump(key)
+		header["arrays"] = [[a.dtype.str, a.shape] for a in values]
+		entries.append([key, header])
+		arrays.extend(values)
+
+	structure = zlib.compress(json.dumps({"state": state, "keys": entries}).encode())
+	# counters are mostly zeros, even the fastest level shrinks them a lot
+	blob = zlib.compress(b"".join(a.tobytes() for a in arrays), 1)
+	return _HEADER.pack(MAGIC, VERSION, len(structure)) + structure + blob
+
+
+def loads(data: bytes, store: LocalStore = None) -> dict:
+	"""
+	Deserialize a state returned by dumps(), putting the values saved with
+	it back into store, unless store already holds newer ones. States saved
+	as plain json by older versions are read too
+	"""
+	if not data[:len(MAGIC)] == MAGIC:
+		return json.loads(data)
+
+	_, version, size = _HEADER.unpack_from(data)
+	if version != VERSION:
+		raise ValueError(f"unknown state format version {version}")
+	start = _HEADER.size
+	structure = json.loads(zlib.decompress(data[start:start + size]))
+
+	if store and structure["keys"]:
+		blob = memoryview(zlib.decompress(data[start + size:]))
+		position = 0
+		for key, header in structure["keys"]:
+			arrays = []
+			for dtype, shape in header.pop("arrays"):
+				dtype = np.dtype(dtype)
+				end = position + dtype.itemsize * math.prod(shape)
+				arrays.append(np.frombuffer(blob[position:end], dtype).reshape(shape).copy())
+				position = end
+			if not store.exists(key):
+				store.restore(key, header, arrays)
+
+	return structure["state"]
+
+
+async def save(name: str, state: dict, pipe):
+	"""
+	Save the state of the listener called name, on pipe for redis
+	or straight to a file for the local backend
+	"""
+	if BACKEND != "local":
+		await pipe.set(name, dumps(state))
+		return
+
+	store = get_global_client().store
+	data = dumps(state, store, [*_strings(state), f"{OFFSET_KEY}:{name}"])
+	STATE_DIR.mkdir(parents= True, exist_ok= True)
+	path = STATE_DIR / f"{name}.state"
+	temporary = path.with_suffix(".tmp")
+	temporary.write_bytes(data)
+	# never leave a half written state behind
+	os.replace(temporary, path)
+
+
+async def load(name: str) -> dict:
+	"""
+	The state last saved for the listener called name, or None
+	"""
+	if BACKEND != "local":
+		data = await get_binary_client().get(name)
+		return loads(data) if data else None
+
+	path = STATE_DIR / f"{name}.state"
+	if not path.exists():
+		return None
+	return loads(path.read_bytes(), get_global_client().store)
+
+
+def publish(name: str, data):
+	"""
+	Write data as json for other processes to read with published()
+	"""
+	STATE_DIR.mkdir(parents= True, exist_ok= True)
+	path = STATE_DIR / f"{name}.json"
+	temporary = path.with_suffix(".tmp")
+	temporary.write_text(json.dumps(data))
+	os.replace(temporary, path)
+
+
+def published(name: str):
+	"""
+	The data last written by publish(), or None
+	"""
+	try:
+		return json.loads((STATE_DIR / f"{name}.json").read_text())
+	except FileNotFoundError:
+		return None
+
+
+def _strings(obj):
+	"""
+	Every string in a state, among them the keys of its sketches
+	"""
+	if isinstance(obj, str):
+		yield obj
+	elif isinstance(obj, dict):
+		for value in obj.values():
+			yield from _strings(value)
+	elif isinstance(obj, list):
+		for value in obj:
+			yield from _strings(value)
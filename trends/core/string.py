@@ -1,6 +1,39 @@
+import functools
 import re
 
-from rake_nltk import Rake
+
+# longest phrase extract_keywords() will return, in words
+MAX_WORDS = 3
+
+# english stopwords plus tweet filler, compiled in so that
+# no corpus has to be loaded
+_STOPWORDS = frozenset("""
+a about above after again against ain all also am an and any are aren aren't
+as at be because been before being below between both but by can can't cannot
+could couldn couldn't d did didn didn't do does doesn doesn't doing don don't
+down during each etc even ever every few for from further get gets getting got
+gonna had hadn hadn't has hasn hasn't have haven haven't having he he'd he'll
+he's her here here's hers herself him himself his how how's i i'd i'll i'm i've
+if im in into is isn isn't it it'd it'll it's its itself just let let's ll lol
+m ma many me might mightn mightn't more most much must mustn mustn't my myself
+need needn needn't no nor not now o of off oh ok okay on once one only or other
+ought our ours ourselves out over own re really rt s same shan shan't she she'd
+she'll she's should should've shouldn shouldn't so some still such t than that
+that'll that's the their theirs them themselves then there there's these they
+they'd they'll they're they've thing things this those though through to too
+u under until up ur us ve very via was wasn wasn't way we we'd we'll we're we've
+well were weren weren't what what's when when's where where's which while who
+who's whom why why's will with won won't would wouldn wouldn't y yeah yes yet
+you you'd you'll you're you've your yours yourself yourselves
+""".split())
+
+# one pass over the text: links, tags and mentions are skipped, words are
+# kept and any other punctuation ends the phrase being built
+_TOKENS = re.compile(r"""
+	(https?://\S+|www\.\S+|[#@]\w+)
+	|([^\W\d_]+(?:['’][^\W\d_]+)*)
+	|([^\w\s]|\d+)
+""", re.VERBOSE)
 
 
 def extract_tags(text: str) -> list[str]:
@@ -11,11 +44,65 @@ def extract_mentions(text: str) -> list[str]:
 	return [s[1:] for s in re.findall(r"@[\w]+", text)]
 
 
+@functools.lru_cache(maxsize= 1 << 16)
+def _normalize(word: str) -> str:
+	"""
+	Lowercase word, fold curly apostrophes and drop possessives,
+	so different spellings of a word count together
+	"""
+	word = word.lower().replace("’", "'")
+	if word.endswith("'s"):
+		word = word[:-2]
+	return word
+
+
 def extract_keywords(text: str) -> list[str]:
 	"""
-	This is not an adequate keyword exractor, but it 
-	should serve as a good placeholder
+	Return the distinct keyword phrases of text in the order they
+	appear. A phrase is a run of words without stopwords or punctuation
+	in between, and runs longer than MAX_WORDS are split up
+	"""
+	phrases = []
+	run = []
+
+	def end_run():
+		for i in range(0, len(run), MAX_WORDS):
+			phrases.append(" ".join(run[i:i + MAX_WORDS]))
+		run.clear()
+
+	for _, word, _ in _TOKENS.findall(text):
+		word = word and _normalize(word)
+		if not word or len(word) < 2 or word in _STOPWORDS:
+			end_run()
+		else:
+			run.append(word)
+	end_run()
+
+	return list(dict.fromkeys(phrases))
+
+
+def extract_keywords_many(texts: list[str]) -> list[list[str]]:
+	"""
+	extract_keywords() over many texts at once, sharing the
+	cache of normalized words between them
+	"""
+	return [extract_keywords(text) for text in texts]
+
+
+def enrich(text: str) -> tuple[list[str], list[str], list[str]]:
+	"""
+	Extract the tags, mentions and keywords of text
+	"""
+	return extract_tags(text), extract_mentions(text), extract_keywords(text)
+
+
+def enrich_many(texts: list[str]) -> list[tuple[list[str], list[str], list[str]]]:
+	"""
+	enrich() over many texts, in a single call so that a
+	process pool is handed them all at once
 	"""
-	r = Rake()
-	r.extract_keywords_from_text(text)
-	return r.get_ranked_phrases()
\ No newline at end of file
+	return list(zip(
+		[extract_tags(text) for text in texts],
+		[extract_mentions(text) for text in texts],
+		extract_keywords_many(texts),
+	))
\ No newline at end of file
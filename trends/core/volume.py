@@ -1,3 +1,4 @@
+from collections import Counter
 import datetime
 from typing import Type
 
@@ -47,7 +48,7 @@ class TrendVolume():
 		v = cls(enzyme_class)
 		v._base = await BaseTrendVolume.make(
 			duplicity,
-			interval.seconds,
+			interval.total_seconds(),
 			**kwargs,
 		)
 		return v
@@ -61,6 +62,20 @@ class TrendVolume():
 			await self._base.add(digest, pipe)
 	
 
+	def digest(self, events) -> Counter:
+		"""
+		Count the objs digested from a batch of events
+		"""
+		return self._enzyme.count(events)
+	
+
+	async def stage(self, counts: Counter, batch):
+		"""
+		Stage weighted increments of counts on a CommandBatch
+		"""
+		await self._base.stage(counts, batch)
+	
+
 	async def fetch(self, objs: list) -> list[int]:
 		"""
 		Get the count of elements of objs in that order
@@ -0,0 +1,67 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from trends.core.ingest import get_log
+
+
+def _parse_time(value: str) -> float:
+	"""
+	Parse value, either a datetime or a number of minutes
+	ago, into a timestamp
+	"""
+	if value.isdigit():
+		return time.time() - int(value) * 60
+	try:
+		moment = parse_datetime(value) or datetime.datetime.fromisoformat(value)
+	except ValueError:
+		raise CommandError(f"{value} is neither a datetime nor a number of minutes")
+	if timezone.is_naive(moment):
+		moment = timezone.make_aware(moment)
+	return moment.timestamp()
+
+
+class Command(BaseCommand):
+	help = (
+		"Append the trend events logged in a time range to the end of the "
+		"log again, so the trends loop counts them into the current window. "
+		"Use it to rebuild sketches that lost those events, after a crash or "
+		"a deploy on the local backend for example"
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"since",
+			help= "start of the range, a datetime or a number of minutes ago",
+		)
+		parser.add_argument(
+			"--until",
+			help= "end of the range, a datetime or a number of minutes ago. Defaults to now",
+		)
+		parser.add_argument(
+			"--dry-run",
+			action= "store_true",
+			help= "only count the events in the range",
+		)
+
+
+	def handle(self, *args, **options):
+		since = _parse_time(options["since"])
+		until = _parse_time(options["until"]) if options["until"] else time.time()
+		if since > until:
+			raise CommandError("the range ends before it starts")
+
+		log = get_log()
+		# read the whole range first, the events appended
+		# below must not be read again
+		records = list(log.range(since, until))
+		if not options["dry_run"]:
+			for record in records:
+				log.append(record.event)
+
+		self.stdout.write(
+			f"{'Found' if options['dry_run'] else 'Replayed'} {len(records)} events"
+		)
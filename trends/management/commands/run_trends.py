@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trends.core import ACTIVE, loop, shard
+
+
+class Command(BaseCommand):
+	help = (
+		"Run a trends worker in the foreground. Workers read the ingest log "
+		"and share the groups of listeners out among themselves, so more "
+		"of them may be started to count more events with the redis backend, "
+		"the local one runs in a single process per host. Web processes only "
+		"append events and read the published snapshot"
+	)
+
+	def handle(self, *args, **options):
+		if not ACTIVE:
+			raise CommandError("The trends app is not active")
+		if not shard.claim():
+			raise CommandError("Another process of this host already runs the trends loop")
+
+		self.stdout.write("Running the trends loop, quit with CONTROL-C")
+		loop.run()
+		self.stdout.write("Trends loop stopped")
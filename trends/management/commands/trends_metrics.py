@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from trends.core import ACTIVE, metrics, shard
+
+
+class Command(BaseCommand):
+	help = (
+		"Print the metrics published by every running trends worker, in the "
+		"prometheus text format: ingest lag, batch sizes, listener timings, "
+		"redis round trips, rotations and cache hits"
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--worker",
+			help= "Only print the metrics of the worker with this id",
+		)
+
+	def handle(self, *args, **options):
+		if not ACTIVE:
+			raise CommandError("The trends app is not active")
+		workers = {
+			worker: families for worker, families in metrics.collect().items()
+			# this process runs no loop, it has nothing to show
+			if worker != shard.worker_id
+		}
+		if options["worker"]:
+			workers = {k: v for k, v in workers.items() if k == options["worker"]}
+		if not workers:
+			raise CommandError("No trends worker published metrics recently")
+		self.stdout.write(metrics.render(workers), ending= "")
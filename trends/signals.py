@@ -1,39 +1,124 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import queue
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connections, transaction
 
 from trends.core.event import TweetEvent
-from trends.core.string import extract_keywords, extract_mentions, extract_tags
+from trends.core.ingest import get_log
+from trends.core.string import enrich_many
+
+
+logger = logging.getLogger(__name__)
+
+# processes extracting tags, mentions and keywords from tweets
+ENRICH_WORKERS = getattr(settings, "TRENDS_ENRICH_WORKERS", 2)
+
+_pool: concurrent.futures.ProcessPoolExecutor = None
+
+# hands tweets to the pool and finishes their events, off the request thread
+_executor = concurrent.futures.ThreadPoolExecutor(
+	max_workers= 1,
+	thread_name_prefix= "trends-enrich",
+)
 
+# tweets committed and not enriched yet, the executor takes all of
+# them at once so a burst of tweets costs one trip to the pool
+_pending: queue.SimpleQueue = queue.SimpleQueue()
 
-def mentions_to_id(mentions: list[str]):
+
+def mentions_to_ids(mentions: list[list[str]]) -> list[list[str]]:
+	"""
+	Tranform the potential usernames mentioned by many tweets
+	into user ids in one query, filtering out invalids
+	"""
+	ids = dict(get_user_model().objects.filter(
+		username__in= {username for usernames in mentions for username in usernames}
+	).values_list("username", "pk"))
+	return [
+		[str(ids[username]) for username in dict.fromkeys(usernames) if username in ids]
+		for usernames in mentions
+	]
+
+
+def _get_pool() -> concurrent.futures.ProcessPoolExecutor:
 	"""
-	Tranform a list of potential usernames into user ids, 
-	filtering out invalids
+	Start the enrichment processes on first use. They are spawned
+	rather than forked, since the web process runs other threads
 	"""
-	return [str(pk) for pk in get_user_model().objects.filter(
-		username__in= mentions
-	).values_list("pk", flat= True)]
+	global _pool
+	if _pool is None:
+		_pool = concurrent.futures.ProcessPoolExecutor(
+			ENRICH_WORKERS,
+			mp_context= multiprocessing.get_context("spawn"),
+		)
+	return _pool
 
 
 def register_tweet_event(instance):
 	"""
-	Construct and register a TweetEvent
+	Construct and register a TweetEvent once the tweet is committed.
+	Only cheap fields are read here, the text is enriched in the
+	background so the request does not wait on it
 	"""
-	from trends.core.loop import loop, queue
-	
 	d = dict()
 	d["content"] = instance.text
 	d["tweet_id"] = instance.pk
-	d["user_id"] = str(instance.author.pk)
+	d["user_id"] = str(instance.author_id)
 
 	if instance.is_reply():
 		d["reply_id"] = instance.in_reply_to.pk
-		d["reply_user_id"] = str(instance.in_reply_to.author.pk)
+		d["reply_user_id"] = str(instance.in_reply_to.author_id)
 	if instance.is_retweet():
 		d["retweet_id"] = instance.in_retweet_to.pk
-		d["retweet_user_id"] = str(instance.in_retweet_to.author.pk)
+		d["retweet_user_id"] = str(instance.in_retweet_to.author_id)
 	
-	d["tags"] = extract_tags(instance.text)
-	d["mentions_id"] = mentions_to_id(extract_mentions(instance.text))
-	d["keywords"] = extract_keywords(instance.text)
-	
-	loop.call_soon_threadsafe(queue.put_nowait, TweetEvent(**d))
\ No newline at end of file
+	transaction.on_commit(lambda: _submit(d))
+
+
+def _submit(d: dict):
+	_pending.put(d)
+	future = _executor.submit(_enrich_and_enqueue)
+	future.add_done_callback(_log_failure)
+
+
+def _log_failure(future: concurrent.futures.Future):
+	"""
+	Nobody waits on the events handed to the executor, report
+	those that never made it to the ingest log
+	"""
+	e = future.exception()
+	if e is not None:
+		logger.error("Could not register tweet events", exc_info= e)
+
+
+def _enrich_and_enqueue():
+	"""
+	Extract tags, mentions and keywords from the content of every pending
+	tweet in one call to the process pool, then append the finished
+	TweetEvents to the ingest log
+	"""
+	batch = []
+	while True:
+		try:
+			batch.append(_pending.get_nowait())
+		except queue.Empty:
+			break
+	if not batch:
+		# an earlier call took them
+		return
+
+	try:
+		enriched = _get_pool().submit(enrich_many, [d["content"] for d in batch]).result()
+		mentions = mentions_to_ids([mentions for _, mentions, _ in enriched])
+		log = get_log()
+		for d, (tags, _, keywords), mentions_id in zip(batch, enriched, mentions):
+			d["tags"] = tags
+			d["mentions_id"] = mentions_id
+			d["keywords"] = keywords
+			log.append(TweetEvent(**d))
+	finally:
+		connections.close_all()
\ No newline at end of file
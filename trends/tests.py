@@ -0,0 +1,473 @@
+import asyncio
+from collections import Counter
+import datetime
+import json
+from pathlib import Path
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+import numpy as np
+from redis.exceptions import ResponseError
+
+from trends.core import client, personal, shard, state
+from trends.core.batch import CommandBatch
+from trends.core.cmsketch import CMQueue
+from trends.core.decay import DecayedCounter, DecayedTrend, ExponentialDecay, PolynomialDecay
+from trends.core.enzymes import TagEnzyme
+from trends.core.event import TweetEvent
+from trends.core.formulas import TagTrendFormula
+from trends.core.listeners import Listener
+from trends.core.local import CountMinSketch, HeavyKeeper, LocalClient, LocalStore
+from trends.core.scheduler import Scheduler
+
+
+class LocalBackendTestCase(SimpleTestCase):
+	"""
+	Runs every test against a fresh in-process store
+	"""
+
+	def setUp(self):
+		patcher = mock.patch.object(client, "_client", LocalClient())
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+
+class SchedulerTests(LocalBackendTestCase):
+
+	async def _fire(self, callback):
+		scheduler = Scheduler()
+		scheduler._callbacks[60].append(callback)
+		scheduler._due = [(0, 60)]
+		await scheduler._fire()
+
+
+	async def test_made_objects_are_validated(self):
+		queue = CMQueue(maxlen= 2)
+
+		async def rotate(pipe, boundary):
+			return [await queue.advance(1, pipe)]
+
+		await self._fire(rotate)
+		self.assertTrue(await asyncio.wait_for(queue._deque[-1].ensure_valid(), 1))
+
+
+	async def test_failed_command_invalidates_made_objects(self):
+		queue = CMQueue(maxlen= 2)
+
+		async def rotate(pipe, boundary):
+			r = await queue.advance(1, pipe)
+			await pipe.cms().incrby("cms:missing", ["a"], [1])
+			return [r]
+
+		with self.assertLogs("trends.core.scheduler", "ERROR"):
+			await self._fire(rotate)
+		self.assertFalse(await asyncio.wait_for(queue._deque[-1].ensure_valid(), 1))
+
+		# staging on the queue must not wait on the failed object forever
+		batch = CommandBatch()
+		await asyncio.wait_for(queue.stage(Counter(a= 1), batch), 1)
+		self.assertFalse(batch)
+
+
+
+class CommandBatchTests(LocalBackendTestCase):
+
+	def _rebasing(self):
+		"""
+		A counter whose landmark is due to move, and a batch staging the move
+		"""
+		decay = ExponentialDecay(datetime.timedelta(seconds= 1))
+		counter = DecayedCounter(decay, landmark= 1000)
+		batch = CommandBatch()
+		now = 1000 + 2 * counter.REBASE_AFTER * decay.horizon
+		counter.stage(Counter(a= 1), batch, now)
+		return counter, batch, now
+
+
+	def test_landmark_moves_once_executed(self):
+		counter, batch, now = self._rebasing()
+		self.assertEqual(counter.landmark, 1000)
+		batch.executed()
+		self.assertEqual(counter.landmark, now)
+
+
+	def test_applied_reads_state_after_the_batch(self):
+		counter, batch, now = self._rebasing()
+		with batch.applied():
+			self.assertEqual(counter.deconstruct()["landmark"], now)
+		self.assertEqual(counter.landmark, 1000)
+
+
+	async def test_writes_grouped_per_key(self):
+		batch = CommandBatch()
+		batch.cms_incrby("cms", Counter(a= 1, b= 2))
+		batch.cms_incrby("cms", Counter(a= 3))
+		batch.zincrby("z", Counter(a= 1))
+		batch.zincrby("z", Counter(a= 2, b= 1))
+		pipe = client.get_pipe()
+		await batch.queue(pipe)
+		# one CMS.INCRBY for the key, one ZINCRBY per member
+		self.assertEqual(len(pipe), 3)
+
+		store = client.get_global_client()
+		await store.cms().initbydim("cms", 100, 4)
+		await store.zincrby("z", 10, "a")
+		await batch.execute(client.get_pipe())
+		self.assertEqual(await store.cms().query("cms", "a", "b"), [4, 2])
+		self.assertEqual(await store.zmscore("z", ["a", "b"]), [13, 1])
+
+
+	async def test_zscale_applies_before_increments(self):
+		store = client.get_global_client()
+		await store.zincrby("z", 10, "a")
+		batch = CommandBatch()
+		batch.zincrby("z", Counter(a= 4))
+		batch.zscale("z", 0.5)
+		batch.zincrby("z", Counter(a= 1))
+		await batch.execute(client.get_pipe())
+		# staged increments are scaled along with the stored score
+		self.assertEqual(await store.zmscore("z", ["a"]), [10 * 0.5 + 4 * 0.5 + 1])
+
+
+class DecayedCounterTests(LocalBackendTestCase):
+
+	async def _write(self, counter: DecayedCounter, counts: Counter, now: float):
+		batch = CommandBatch()
+		counter.stage(counts, batch, now)
+		await batch.execute(client.get_pipe())
+
+
+	async def _read(self, counter: DecayedCounter, obj: str, now: float) -> float:
+		[weight] = await client.get_global_client().zmscore(counter._key, [obj])
+		return weight / counter.scale(now)
+
+
+	async def test_rebase_keeps_decayed_counts(self):
+		decay = ExponentialDecay(datetime.timedelta(seconds= 10))
+		counter = DecayedCounter(decay, landmark= 1000)
+		await self._write(counter, Counter(a= 8), 1000 + 10)
+		now = 1000 + (counter.REBASE_AFTER + 1) * decay.horizon
+		before = await self._read(counter, "a", now)
+
+		await self._write(counter, Counter(b= 1), now)
+		self.assertEqual(counter.landmark, now)
+		self.assertAlmostEqual(await self._read(counter, "a", now) / before, 1)
+		self.assertAlmostEqual(await self._read(counter, "b", now), 1)
+		# a half life later, both halved
+		self.assertAlmostEqual(await self._read(counter, "b", now + decay.half_life), 0.5)
+
+
+	async def test_polynomial_landmark_never_moves(self):
+		decay = PolynomialDecay(datetime.timedelta(seconds= 10))
+		counter = DecayedCounter(decay, landmark= 1000)
+		now = 1000 + 2 * counter.REBASE_AFTER * decay.horizon
+		await self._write(counter, Counter(a= 1), now)
+		self.assertEqual(counter.landmark, 1000)
+		self.assertAlmostEqual(await self._read(counter, "a", now), 1)
+
+
+
+class FetchReuseTests(LocalBackendTestCase):
+
+	async def _write(self, measure, counts: Counter):
+		batch = CommandBatch()
+		await measure.stage(counts, batch)
+		await batch.execute(client.get_pipe())
+
+
+	async def test_trend_ranking_reused_until_written(self):
+		trend = await DecayedTrend.make(
+			TagEnzyme,
+			ExponentialDecay(datetime.timedelta(minutes= 5)),
+			ExponentialDecay(datetime.timedelta(days= 1)),
+		)
+		try:
+			await self._write(trend, Counter(a= 3, b= 1))
+			self.assertEqual(await trend.fetch(2), ["a", "b"])
+
+			# written behind its back, the last ranking is still served
+			await client.get_global_client().zincrby(trend._short._key, 100, "c")
+			self.assertEqual(await trend.fetch(2), ["a", "b"])
+			self.assertEqual(await trend.fetch(1), ["a"])
+
+			await self._write(trend, Counter(b= 1))
+			self.assertEqual(await trend.fetch(2), ["c", "a"])
+		finally:
+			# the scheduler only runs in the loop of the test
+			trend.terminate()
+
+
+	async def test_volume_counts_reused_until_written(self):
+		queue = await CMQueue.make(1, maxlen= 2)
+		await self._write(queue, Counter(a= 2))
+		self.assertEqual(await queue.get(["a", "b"]), [2, 0])
+
+		await client.get_global_client().cms().incrby(queue._deque[-1]._key, ["b"], [5])
+		self.assertEqual(await queue.get(["a", "b"]), [2, 0])
+		self.assertEqual(await queue.get(["b"]), [5])
+
+		await queue.advance(2)
+		self.assertEqual(await queue.get(["a", "b"]), [2, 5])
+
+
+
+class PublishedAffinityTests(LocalBackendTestCase):
+
+	def setUp(self):
+		super().setUp()
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		for patcher in (
+			mock.patch.object(state, "STATE_DIR", Path(directory.name)),
+			mock.patch.object(personal, "_read", (float("-inf"), None)),
+			mock.patch.object(personal, "BACKEND", "local"),
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+
+	async def test_lookup_without_loop_reads_published_pairs(self):
+		key = personal.affinity_key("tags")
+		store = client.get_global_client()
+		await store.zincrby(key, 2, "u1:python")
+		await store.zincrby(key, 5, "u1:django")
+		await store.zincrby(key, 1, "u2:python")
+		await store.hset(personal.AFFINITY_COUNTERS_KEY, mapping= {key: "{}"})
+
+		self.assertEqual(personal._lookup({key: ["u1:python"]}), (None, None))
+
+		await personal.publish({"version": 1, "tags": [["python", 10]], "users": []})
+		personal._read = float("-inf"), None
+		weights, counters = personal._lookup({key: ["u1:python", "u2:python", "u1:django", "u3:python"]})
+		# only the objects of the snapshot are published
+		self.assertEqual(weights, {key: [2, 1, None, None]})
+		self.assertEqual(counters, {key: "{}"})
+
+
+
+def _zipf_counts(n: int, objs: int, seed: int = 0) -> Counter:
+	"""
+	Exact counts of n draws from a skewed distribution over objs objects
+	"""
+	rng = np.random.default_rng(seed)
+	draws = rng.zipf(1.3, n * 2)
+	return Counter(f"obj{x}" for x in draws[draws <= objs][:n])
+
+
+class CountMinSketchTests(SimpleTestCase):
+
+	def test_estimates_against_exact_counts(self):
+		exact = _zipf_counts(50_000, 5000)
+		sketch = CountMinSketch(width= 2000, depth= 5)
+		sketch.incrby(list(exact), list(exact.values()))
+		estimates = dict(zip(exact, sketch.query(list(exact))))
+
+		total = sum(exact.values())
+		errors = [estimates[obj] - n for obj, n in exact.items()]
+		self.assertGreaterEqual(min(errors), 0)
+		# within e / width of the total, but for about e ** -depth of them
+		within = sum(error <= np.e / sketch.width * total for error in errors)
+		self.assertGreaterEqual(within / len(errors), 0.99)
+
+
+	def test_repeated_objects_in_one_call_add_up(self):
+		sketch = CountMinSketch(width= 100, depth= 4)
+		sketch.incrby(["a", "b", "a"], [1, 2, 3])
+		self.assertEqual(sketch.query(["a", "b", "c"]), [4, 2, 0])
+
+
+class HeavyKeeperTests(SimpleTestCase):
+
+	def test_keeps_the_heavy_hitters(self):
+		exact = _zipf_counts(50_000, 5000, seed= 1)
+		topk = HeavyKeeper(k= 10, width= 1000, depth= 5, decay= 0.9)
+		items = list(exact.items())
+		np.random.default_rng(2).shuffle(items)
+		# in batches of weighted increments, as flushes write them
+		for i in range(0, len(items), 100):
+			objs, counts = zip(*items[i:i + 100])
+			topk.incrby(list(objs), list(counts))
+
+		self.assertEqual(set(topk.list(False)), {obj for obj, _ in exact.most_common(10)})
+		for obj, estimate in topk.heap.items():
+			self.assertLessEqual(estimate, exact[obj])
+			self.assertGreaterEqual(estimate, 0.9 * exact[obj])
+
+
+class LocalStoreTests(SimpleTestCase):
+
+	def test_sorted_set_against_exact_scores(self):
+		store = LocalStore()
+		exact = _zipf_counts(5000, 500)
+		for obj, n in exact.items():
+			store.zincrby("z", n, obj)
+		ranked = sorted(exact.items(), key= lambda item: (item[1], item[0]), reverse= True)
+		self.assertEqual(store.zrevrange("z", 0, 9, withscores= True), ranked[:10])
+		self.assertEqual(store.zmscore("z", ["obj1", "missing"]), [exact["obj1"], None])
+
+		store.zunionstore("z", {"z": 0.5})
+		self.assertEqual(store.zmscore("z", ["obj1"]), [exact["obj1"] * 0.5])
+		store.zremrangebyrank("z", 0, -11)
+		self.assertEqual(store.zrevrange("z", 0, -1), [obj for obj, _ in ranked[:10]])
+
+
+	def test_dump_restore_round_trip(self):
+		store = LocalStore()
+		store.cms_initbydim("cms", 100, 4)
+		store.cms_incrby("cms", ["a", "b"], [3, 5])
+		store.topk_reserve("topk", 5, 50, 4, 0.9)
+		store.topk_incrby("topk", ["a", "b"], [3, 5])
+		store.zincrby("z", 1.5, "a")
+		store.set("s", "value")
+
+		restored = LocalStore()
+		for key in ("cms", "topk", "z", "s"):
+			restored.restore(key, *store.dump(key))
+		self.assertEqual(restored.cms_query("cms", "a", "b"), [3, 5])
+		self.assertEqual(restored.topk_list("topk", withcount= True), ["b", 5, "a", 3])
+		self.assertEqual(restored.zmscore("z", ["a"]), [1.5])
+		self.assertEqual(restored.get("s"), "value")
+
+
+	def test_wrong_type_raises(self):
+		store = LocalStore()
+		store.zincrby("z", 1, "a")
+		with self.assertRaises(ResponseError):
+			store.cms_query("z", "a")
+		with self.assertRaises(ResponseError):
+			store.cms_incrby("missing", ["a"], [1])
+
+
+
+class StateTests(SimpleTestCase):
+
+	def _store(self) -> LocalStore:
+		store = LocalStore()
+		store.cms_initbydim("cms:1", 100, 4)
+		store.cms_incrby("cms:1", ["a", "b"], [3, 5])
+		store.zincrby("decay:1", 2.5, "a")
+		return store
+
+
+	def test_round_trip_with_sketches(self):
+		listener = {"_base": {"_queue": {"_deque": ["cms:1", "cms:gone"]}, "key": "decay:1"}}
+		data = state.dumps(listener, self._store(), ["cms:1", "cms:gone", "decay:1"])
+		self.assertEqual(data[:len(state.MAGIC)], state.MAGIC)
+
+		store = LocalStore()
+		self.assertEqual(state.loads(data, store), listener)
+		self.assertEqual(store.cms_query("cms:1", "a", "b"), [3, 5])
+		self.assertEqual(store.zmscore("decay:1", ["a"]), [2.5])
+		self.assertFalse(store.exists("cms:gone"))
+
+
+	def test_loads_keeps_newer_values(self):
+		data = state.dumps({}, self._store(), ["cms:1"])
+		store = LocalStore()
+		store.cms_initbydim("cms:1", 100, 4)
+		store.cms_incrby("cms:1", ["a"], [10])
+		state.loads(data, store)
+		self.assertEqual(store.cms_query("cms:1", "a", "b"), [10, 0])
+
+
+	def test_round_trip_without_store(self):
+		listener = {"_base": {"key": "decay:1"}}
+		self.assertEqual(state.loads(state.dumps(listener)), listener)
+
+
+	def test_loads_older_formats(self):
+		# saved as plain json before the binary format
+		listener = {"_base": {"_frames": [{"_queue": {"_deque": ["cms:1"]}}]}}
+		self.assertEqual(state.loads(json.dumps(listener).encode()), listener)
+
+		data = bytearray(state.dumps(listener))
+		data[len(state.MAGIC)] = state.VERSION + 1
+		with self.assertRaises(ValueError):
+			state.loads(bytes(data))
+
+
+
+class AutoQueueTests(LocalBackendTestCase):
+
+	async def _keys(self, queue: CMQueue) -> list[str]:
+		return [r._key for r in queue._deque]
+
+
+	async def test_advance_drops_what_leaves_the_window(self):
+		queue = await CMQueue.make(1, maxlen= 3)
+		for epoch in (2, 3):
+			await queue.advance(epoch)
+		first = queue._deque[0]._key
+		self.assertIsNone(await queue.advance(3))
+
+		await queue.advance(4)
+		self.assertEqual(list(queue._epochs), [2, 3, 4])
+		self.assertFalse(client.get_global_client().store.exists(first))
+
+
+	async def test_advance_catches_up_after_missed_epochs(self):
+		queue = await CMQueue.make(1, maxlen= 3)
+		await queue.stage(Counter(a= 1), CommandBatch())
+		for epoch in (2, 3):
+			await queue.advance(epoch)
+		old = await self._keys(queue)
+
+		await queue.advance(10)
+		self.assertEqual(list(queue._epochs), [10])
+		self.assertEqual(len(queue._deque), 1)
+		self.assertFalse(client.get_global_client().store.exists(*old))
+		self.assertEqual(await queue.get(["a"]), [0])
+
+
+	async def test_advance_keeps_epochs_still_in_the_window(self):
+		queue = await CMQueue.make(1, maxlen= 3)
+		await queue.advance(2)
+		await queue.advance(4)
+		self.assertEqual(list(queue._epochs), [2, 4])
+
+
+class ListenerTests(LocalBackendTestCase):
+
+	def _event(self, *tags) -> TweetEvent:
+		return TweetEvent("tweet", 1, "user", tags= list(tags))
+
+
+	async def _taken(self, event_batches: list, partition: int = 0) -> list[Counter]:
+		"""
+		What a listening listener takes after accumulating each batch
+		"""
+		listener = Listener(TagTrendFormula, partition)
+		await listener.listen()
+		try:
+			taken = []
+			for events in event_batches:
+				listener.accumulate(events)
+				taken.append(listener.take())
+			return taken
+		finally:
+			# the scheduler only runs in the loop of the test
+			listener.stop_listen()
+
+
+	async def test_accumulate_and_take(self):
+		self.assertEqual(
+			await self._taken([
+				[self._event("a", "b"), self._event("a"), self._event("a")],
+				[],
+			]),
+			[Counter(a= 3, b= 1), Counter()],
+		)
+
+
+	async def test_accumulate_before_listen_raises(self):
+		with self.assertRaises(RuntimeError):
+			Listener(TagTrendFormula).accumulate([self._event("a")])
+
+
+	async def test_partitions_split_the_counts(self):
+		events = [self._event(f"tag{i}") for i in range(50)]
+		with mock.patch.object(shard, "PARTITIONS", 2):
+			[first], [second] = [await self._taken([events], partition) for partition in range(2)]
+		self.assertFalse(first.keys() & second.keys())
+		self.assertEqual(first + second, Counter({f"tag{i}": 1 for i in range(50)}))
@@ -1,8 +1,14 @@
 from django.urls import path
 
 from . import views
+from trends.core import ACTIVE
 
 app_name = "trends"
 urlpatterns = [
 	path("trending/", views.Trending.as_view(), name= "trending"),
-]
\ No newline at end of file
+	path("trending/for-you/", views.TrendingPersonal.as_view(), name= "trending_personal"),
+]
+
+# there are no metrics to collect without a trends backend
+if ACTIVE:
+	urlpatterns.append(path("trending/metrics/", views.metrics_view, name= "metrics"))
\ No newline at end of file
@@ -1,44 +1,76 @@
+import hmac
 import uuid
 
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.views import generic
 from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
 
+from tweets.loader import TweetListMixin, prepare
 from tweets.models import Tweet
-from trends.core import ACTIVE, fetch
+from trends.core import ACTIVE, metrics, personal, snapshot
 
 
-class TrendingActive(generic.ListView):
+class TrendingActive(TweetListMixin, generic.ListView):
 	"""
 	The Redis client is connected and this app is active
 	"""
 	template_name: str = "trends/trending.html"
 	context_object_name = "tweets"
+	personal = False
+
+	def get_snapshot(self) -> dict:
+		return snapshot.latest()
+
 
 	def get_queryset(self):
-		tweets = fetch.get_trending_tweets()
-		return Tweet.objects.filter(pk__in= tweets)
+		self.snapshot = self.get_snapshot()
+		return Tweet.objects.filter(
+			pk__in= [tweet for tweet, _ in self.snapshot["tweets"]]
+		)
 	
 
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		tags = fetch.get_trending_tags()
-		keywords = fetch.get_trending_keywords()
-		users = fetch.get_trending_users()
-		context["trending_tags"] = zip(
-			tags,
-			fetch.get_tags_volume(tags)
-		)
-		context["trending_keywords"] = zip(
-			keywords,
-			fetch.get_keywords_volume(keywords)
-		)
-		context["trending_users"] = zip(
-			(get_user_model().objects.get(pk= uuid.UUID(user)) for user in users),
-			fetch.get_users_volume(users)
+		users = get_user_model().objects.in_bulk(
+			[uuid.UUID(user) for user, _ in self.snapshot["users"]]
 		)
+		context["trending_tags"] = self.snapshot["tags"]
+		context["trending_keywords"] = self.snapshot["keywords"]
+		context["trending_users"] = [
+			(users[uuid.UUID(user)], volume)
+			for user, volume in self.snapshot["users"]
+			if uuid.UUID(user) in users
+		]
 		return context
 
 
+class TrendingPersonalActive(LoginRequiredMixin, TrendingActive):
+	"""
+	The trends reranked by the activity of the users the viewer follows
+	"""
+	personal = True
+
+	def get_snapshot(self) -> dict:
+		latest = snapshot.latest()
+		return {
+			**latest,
+			**{
+				kind: personal.rerank(self.request.user, kind, latest[kind])
+				for kind in ("tweets", "tags", "users", "keywords")
+			},
+		}
+
+
+	def get_queryset(self):
+		tweets = prepare(super().get_queryset()).in_bulk()
+		return [
+			tweets[int(tweet)] for tweet, _ in self.snapshot["tweets"]
+			if int(tweet) in tweets
+		]
+
+
 class TrendingInactive(generic.TemplateView):
 	"""
 	The Redis client is not connected and this app is inactive
@@ -46,7 +78,25 @@ class TrendingInactive(generic.TemplateView):
 	template_name: str = "trends/trending_inactive.html"
 
 
+def metrics_view(request):
+	"""
+	The metrics of this process and of every trends worker, in the
+	prometheus text format. Open to staff, or to requests bearing
+	settings.TRENDS_METRICS_TOKEN when one is set
+	"""
+	token = getattr(settings, "TRENDS_METRICS_TOKEN", None)
+	bearer = request.headers.get("Authorization", "").removeprefix("Bearer ")
+	if not request.user.is_staff and not (token and hmac.compare_digest(bearer.encode(), token.encode())):
+		return HttpResponseForbidden()
+	return HttpResponse(
+		metrics.render(metrics.collect()),
+		content_type= "text/plain; version=0.0.4; charset=utf-8",
+	)
+
+
 if ACTIVE:
 	Trending = TrendingActive
+	TrendingPersonal = TrendingPersonalActive
 else:
-	Trending = TrendingInactive
\ No newline at end of file
+	Trending = TrendingInactive
+	TrendingPersonal = TrendingInactive
\ No newline at end of file
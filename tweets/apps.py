@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TweetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tweets'
+
+    def ready(self) -> None:
+        from . import signals
+        signals.register_all()
@@ -0,0 +1,24 @@
+"""
+Recounting the engagement counters of tweets from the rows they count,
+shared by the migration that adds them and `manage.py reconcile_counters`
+"""
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(queryset, field: str) -> Coalesce:
+	"""
+	The number of rows of queryset whose field is the outer tweet
+	"""
+	return Coalesce(
+		Subquery(
+			queryset.filter(**{field: OuterRef("pk")})
+			.order_by()
+			.values(field)
+			.annotate(n= Count("*"))
+			.values("n"),
+			output_field= IntegerField(),
+		),
+		0,
+	)
\ No newline at end of file
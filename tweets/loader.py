@@ -0,0 +1,99 @@
+"""
+Load tweets for rendering in a fixed number of queries, however many
+there are. Authors and the tweets replied to or retweeted come joined,
+and what the viewer did to every tweet of a page is looked up at once
+"""
+
+from django.db.models import QuerySet
+
+from . import models
+
+
+def prepare(queryset):
+	"""
+	Join a queryset of tweets with everything rendering them needs,
+	except what depends on the viewer. Counts are columns of Tweet
+	"""
+	return queryset.select_related(
+		"author",
+		"in_reply_to__author",
+		"in_retweet_to__author",
+	)
+
+
+class ViewerFlags():
+	"""
+	What a viewer did to the tweets of a page: a set of (flag, tweet
+	pk) pairs, and the pks of the authors of the page they follow
+	"""
+
+	LIKED = "liked"
+	REPLIED = "replied"
+	RETWEETED = "retweeted"
+
+	def __init__(self, viewer, tweets) -> None:
+		self.viewer_pk = viewer.pk
+		pks = {tweet.pk for tweet in tweets}
+		self.flags = {
+			*((self.LIKED, pk) for pk in models.Tweet.likes.through.objects.filter(
+				user= viewer, tweet__in= pks,
+			).values_list("tweet", flat= True)),
+			*((self.REPLIED, pk) for pk in models.Tweet.objects.filter(
+				author= viewer, in_reply_to__in= pks,
+			).values_list("in_reply_to", flat= True)),
+			*((self.RETWEETED, pk) for pk in models.Tweet.objects.filter(
+				author= viewer, in_retweet_to__in= pks,
+			).values_list("in_retweet_to", flat= True)),
+		}
+		# only the authors of the page, the viewer may follow many users
+		self.follows = set(viewer.follows.filter(
+			pk__in= {tweet.author_id for tweet in tweets},
+		).values_list("pk", flat= True))
+
+
+	def has(self, flag: str, tweet) -> bool:
+		return (flag, tweet.pk) in self.flags
+
+
+def attach(tweets, viewer) -> list:
+	"""
+	Look up what viewer did to every tweet in tweets at once,
+	and attach it to them for the template tags to read
+	"""
+	tweets = list(tweets)
+	if not viewer.is_authenticated or not tweets:
+		return tweets
+	# the tweets rendered along with them are flagged too
+	rendered = [
+		t for tweet in tweets
+		for t in (tweet, tweet.in_reply_to, tweet.in_retweet_to) if t is not None
+	]
+	flags = ViewerFlags(viewer, rendered)
+	for tweet in rendered:
+		tweet.viewer_flags = flags
+	return tweets
+
+
+def load(queryset, viewer) -> list:
+	"""
+	prepare() and attach() at once, for lists that are not paginated
+	"""
+	return attach(prepare(queryset), viewer)
+
+
+class TweetListMixin():
+	"""
+	For ListViews of tweets: prepare the queryset before it is
+	paginated, and attach the viewer flags to the tweets of the page
+	"""
+
+	def get_context_data(self, *, object_list= None, **kwargs):
+		queryset = object_list if object_list is not None else self.object_list
+		if isinstance(queryset, QuerySet):
+			queryset = prepare(queryset)
+		context = super().get_context_data(object_list= queryset, **kwargs)
+		context["object_list"] = attach(context["object_list"], self.request.user)
+		name = self.get_context_object_name(context["object_list"])
+		if name:
+			context[name] = context["object_list"]
+		return context
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tweets.counters import count
+from tweets.models import Tweet
+
+
+class Command(BaseCommand):
+	help = (
+		"Recount the likes, replies and retweets of every tweet, and fix "
+		"the counters that drifted from them"
+	)
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			"--batch-size",
+			type= int,
+			default= 1000,
+			help= "Tweets checked per transaction",
+		)
+
+	def handle(self, *args, **options):
+		counts = {
+			"like_count": count(Tweet.likes.through.objects.all(), "tweet"),
+			"reply_count": count(Tweet.objects.all(), "in_reply_to"),
+			"retweet_count": count(Tweet.objects.all(), "in_retweet_to"),
+		}
+		fields = list(counts)
+		size = options["batch_size"]
+
+		fixed = 0
+		last = 0
+		while True:
+			pks = list(
+				Tweet.objects.filter(pk__gt= last).order_by("pk")
+				.values_list("pk", flat= True)[:size]
+			)
+			if not pks:
+				break
+			last = pks[-1]
+			with transaction.atomic():
+				tweets = Tweet.objects.filter(pk__in= pks).select_for_update().annotate(
+					**{f"actual_{f}": e for f, e in counts.items()}
+				).only("pk", *fields)
+				drifted = []
+				for tweet in tweets:
+					if any(getattr(tweet, f) != getattr(tweet, f"actual_{f}") for f in fields):
+						for f in fields:
+							setattr(tweet, f, getattr(tweet, f"actual_{f}"))
+						drifted.append(tweet)
+				Tweet.objects.bulk_update(drifted, fields)
+			fixed += len(drifted)
+
+		self.stdout.write(f"Fixed {fixed} tweets")
\ No newline at end of file
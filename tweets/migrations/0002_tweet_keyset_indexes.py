@@ -0,0 +1,21 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tweet',
+            index=models.Index(fields=['-created', '-id'], name='tweets_created_id'),
+        ),
+        migrations.AddIndex(
+            model_name='tweet',
+            index=models.Index(fields=['author', '-created', '-id'], name='tweets_author_created_id'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+from tweets.counters import count
+
+
+def count_engagements(apps, schema_editor):
+    Tweet = apps.get_model("tweets", "Tweet")
+    Tweet.objects.update(
+        like_count=count(Tweet.likes.through.objects.all(), "tweet"),
+        reply_count=count(Tweet.objects.all(), "in_reply_to"),
+        retweet_count=count(Tweet.objects.all(), "in_retweet_to"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tweets', '0002_tweet_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tweet',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Likes'),
+        ),
+        migrations.AddField(
+            model_name='tweet',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Replies'),
+        ),
+        migrations.AddField(
+            model_name='tweet',
+            name='retweet_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Retweets'),
+        ),
+        migrations.RunPython(count_engagements, migrations.RunPython.noop),
+    ]
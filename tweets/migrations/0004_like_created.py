@@ -0,0 +1,59 @@
+# Generated by Django 4.1.6 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def date_likes(apps, schema_editor):
+    # likes made so far keep the order of the tweets they liked
+    Like = apps.get_model("tweets", "Like")
+    Tweet = apps.get_model("tweets", "Tweet")
+    Like.objects.update(
+        created=Subquery(Tweet.objects.filter(pk=OuterRef("tweet")).values("created")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tweets', '0003_engagement_counters'),
+    ]
+
+    operations = [
+        # the table of Tweet.likes becomes that of Like, as it is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Like',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('tweet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tweets.tweet')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'tweets_tweet_likes',
+                        'unique_together': {('tweet', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='tweet',
+                    name='likes',
+                    field=models.ManyToManyField(related_name='all_likes', through='tweets.Like', to=settings.AUTH_USER_MODEL, verbose_name='Likes'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date liked'),
+        ),
+        migrations.RunPython(date_likes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', '-created', '-id'], name='tweets_like_user_created_id'),
+        ),
+    ]
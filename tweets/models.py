@@ -39,11 +39,23 @@ class Tweet(models.Model):
 	likes = models.ManyToManyField(
 		"users.User",
 		"all_likes",
+		through= "Like",
 		verbose_name= "Likes",
 	)
 
+	# kept in step with likes, replies and retweets by tweets.signals,
+	# `manage.py reconcile_counters` repairs any drift
+	like_count = models.PositiveIntegerField("Likes", default= 0, editable= False)
+	reply_count = models.PositiveIntegerField("Replies", default= 0, editable= False)
+	retweet_count = models.PositiveIntegerField("Retweets", default= 0, editable= False)
+
 	class Meta:
 		ordering = ["-created"]
+		# keyset pagination reads pages in (created, id) order
+		indexes = [
+			models.Index(fields= ["-created", "-id"], name= "tweets_created_id"),
+			models.Index(fields= ["author", "-created", "-id"], name= "tweets_author_created_id"),
+		]
 	
 
 	def __str__(self) -> str:
@@ -55,11 +67,15 @@ class Tweet(models.Model):
 	
 
 	def is_reply(self) -> bool:
-		return bool(self.in_reply_to)
+		return bool(self.in_reply_to_id)
 	
 
 	def is_retweet(self) -> bool:
-		return bool(self.in_retweet_to)
+		return bool(self.in_retweet_to_id)
+	
+
+	def is_liked_by(self, user) -> bool:
+		return self.likes.through.objects.filter(tweet= self, user= user).exists()
 	
 
 	def get_reply_set(self):
@@ -73,4 +89,22 @@ class Tweet(models.Model):
 		"""
 		Return the queryset of users that's retweeted this tweet
 		"""
-		return get_user_model().objects.filter(tweets__in= self.retweets.all())
\ No newline at end of file
+		return get_user_model().objects.filter(tweets__in= self.retweets.all())
+
+
+class Like(models.Model):
+	"""
+	A user liking a tweet, the through table of Tweet.likes. Liked
+	tweets are listed in the order they were liked
+	"""
+	tweet = models.ForeignKey(Tweet, models.CASCADE)
+	user = models.ForeignKey("users.User", models.CASCADE)
+	created = models.DateTimeField("Date liked", default= timezone.now)
+
+	class Meta:
+		# the table Tweet.likes was created with
+		db_table = "tweets_tweet_likes"
+		unique_together = [("tweet", "user")]
+		indexes = [
+			models.Index(fields= ["user", "-created", "-id"], name= "tweets_like_user_created_id"),
+		]
\ No newline at end of file
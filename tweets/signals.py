@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models import signals
+from django.db.models.functions import Greatest
+
+from . import models
+
+
+def register_all():
+	signals.post_save.connect(
+		_tweet_saved,
+		models.Tweet,
+		dispatch_uid= "t:_tweet_saved"
+	)
+	signals.post_delete.connect(
+		_tweet_deleted,
+		models.Tweet,
+		dispatch_uid= "t:_tweet_deleted"
+	)
+	signals.m2m_changed.connect(
+		_likes_changed,
+		models.Tweet.likes.through,
+		dispatch_uid= "t:_likes_changed"
+	)
+	signals.pre_delete.connect(
+		_user_deleted,
+		get_user_model(),
+		dispatch_uid= "t:_user_deleted"
+	)
+
+
+def _add(pks, field: str, n: int):
+	"""
+	Add n to the counter field of the tweets with these pks, in
+	the database only, so concurrent updates never overwrite
+	each other
+	"""
+	if n:
+		models.Tweet.objects.filter(pk__in= pks).update(**{field: Greatest(F(field) + n, 0)})
+
+
+def _tweet_saved(sender, **kwargs):
+	if not kwargs["created"]:
+		return
+
+	instance = kwargs["instance"]
+	if instance.in_reply_to_id:
+		_add([instance.in_reply_to_id], "reply_count", 1)
+	if instance.in_retweet_to_id:
+		_add([instance.in_retweet_to_id], "retweet_count", 1)
+
+
+def _tweet_deleted(sender, **kwargs):
+	instance = kwargs["instance"]
+	# a parent deleted along with it is already gone, nothing is updated
+	if instance.in_reply_to_id:
+		_add([instance.in_reply_to_id], "reply_count", -1)
+	if instance.in_retweet_to_id:
+		_add([instance.in_retweet_to_id], "retweet_count", -1)
+
+
+def _likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	"""
+	instance is a tweet and pk_set users, or the reverse. Removals and
+	clears look the likes that exist up first, and count only those
+	"""
+	likes = models.Like.objects.filter(**{"user" if reverse else "tweet": instance})
+	if action == "pre_remove":
+		instance._likes_removed = set(likes.filter(
+			**{"tweet__in" if reverse else "user__in": pk_set}
+		).values_list("tweet" if reverse else "user", flat= True))
+		return
+	if action == "pre_clear":
+		instance._likes_removed = set(likes.values_list("tweet" if reverse else "user", flat= True))
+		return
+
+	if action == "post_add":
+		sign = 1
+	elif action in ("post_remove", "post_clear"):
+		sign, pk_set = -1, instance.__dict__.pop("_likes_removed", set())
+	else:
+		return
+	if not pk_set:
+		return
+
+	if reverse:
+		_add(pk_set, "like_count", sign)
+	else:
+		_add([instance.pk], "like_count", sign * len(pk_set))
+
+
+def _user_deleted(sender, instance, **kwargs):
+	"""
+	The likes of a user go with them, without any m2m_changed
+	"""
+	_add(instance.all_likes.values_list("pk", flat= True), "like_count", -1)
\ No newline at end of file
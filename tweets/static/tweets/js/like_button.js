@@ -1,15 +1,20 @@
-var buttons = document.getElementsByClassName('like-button');
-for (let i = 0; i < buttons.length; i++) {
-	let button = buttons[i];
-	button.addEventListener("click", function (e) {
-		e.preventDefault();
-		this.classList.toggle("active");
-		this.classList.add("animated");
-		generateClones(this);
-		this.form.submit();
-	});
+function bindLikeButtons(root) {
+	var buttons = root.getElementsByClassName('like-button');
+	for (let i = 0; i < buttons.length; i++) {
+		let button = buttons[i];
+		button.addEventListener("click", function (e) {
+			e.preventDefault();
+			this.classList.toggle("active");
+			this.classList.add("animated");
+			generateClones(this);
+			this.form.submit();
+		});
+	}
 }
 
+bindLikeButtons(document);
+document.addEventListener("page-loaded", e => bindLikeButtons(e.detail));
+
 function generateClones(button) {
 	let clones = randomInt(2, 4);
 	for (let it = 1; it <= clones; it++) {
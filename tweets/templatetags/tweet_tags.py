@@ -1,6 +1,8 @@
 from django import template
 from django.utils import timezone
 
+from tweets.loader import ViewerFlags
+
 register = template.Library()
 
 @register.inclusion_tag("tweets/render_tweet.html")
@@ -132,6 +134,56 @@ def render_menu_button(tweet, user):
 	}
 
 
+def _flags(tweet, user):
+	"""
+	The flags tweets.loader.attach() left on tweet for user, if any
+	"""
+	flags = getattr(tweet, "viewer_flags", None)
+	if flags and flags.viewer_pk == user.pk:
+		return flags
+	return None
+
+
+@register.filter("liked_by")
+def liked_by(tweet, user) -> bool:
+	if not user.is_authenticated:
+		return False
+	flags = _flags(tweet, user)
+	if flags:
+		return flags.has(ViewerFlags.LIKED, tweet)
+	return tweet.is_liked_by(user)
+
+
+@register.filter("replied_by")
+def replied_by(tweet, user) -> bool:
+	if not user.is_authenticated:
+		return False
+	flags = _flags(tweet, user)
+	if flags:
+		return flags.has(ViewerFlags.REPLIED, tweet)
+	return tweet.replies.filter(author= user).exists()
+
+
+@register.filter("retweeted_by")
+def retweeted_by(tweet, user) -> bool:
+	if not user.is_authenticated:
+		return False
+	flags = _flags(tweet, user)
+	if flags:
+		return flags.has(ViewerFlags.RETWEETED, tweet)
+	return tweet.retweets.filter(author= user).exists()
+
+
+@register.filter("author_followed_by")
+def author_followed_by(tweet, user) -> bool:
+	if not user.is_authenticated:
+		return False
+	flags = _flags(tweet, user)
+	if flags:
+		return tweet.author_id in flags.follows
+	return user.follows.filter(pk= tweet.author_id).exists()
+
+
 @register.filter("time_format")
 def time_format(time: timezone.datetime):
 	diff = timezone.now() - time
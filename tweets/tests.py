@@ -1,3 +1,104 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from .models import Like, Tweet
+
+
+class CounterSignalTests(TestCase):
+
+	def setUp(self):
+		User = get_user_model()
+		self.author, self.alice, self.bob = (
+			User.objects.create_user(username= name, email= f"{name}@example.com", password= "password")
+			for name in ("author", "alice", "bob")
+		)
+		self.tweet = self._tweet()
+
+
+	def _tweet(self, **kwargs) -> Tweet:
+		return Tweet.objects.create(author= self.author, text= "tweet", modified= timezone.now(), **kwargs)
+
+
+	def _counts(self, tweet: Tweet = None) -> tuple[int, int, int]:
+		tweet = Tweet.objects.get(pk= (tweet or self.tweet).pk)
+		return tweet.like_count, tweet.reply_count, tweet.retweet_count
+
+
+	def test_likes_added_and_removed(self):
+		self.tweet.likes.add(self.alice, self.bob)
+		self.assertEqual(self._counts(), (2, 0, 0))
+		self.tweet.likes.remove(self.alice)
+		self.assertEqual(self._counts(), (1, 0, 0))
+		# removing a user who does not like it changes nothing
+		self.tweet.likes.remove(self.alice)
+		self.assertEqual(self._counts(), (1, 0, 0))
+
+
+	def test_likes_added_from_the_user(self):
+		other = self._tweet()
+		self.alice.all_likes.add(self.tweet, other)
+		self.assertEqual(self._counts(), (1, 0, 0))
+		self.assertEqual(self._counts(other), (1, 0, 0))
+		self.alice.all_likes.remove(other)
+		self.assertEqual(self._counts(other), (0, 0, 0))
+
+
+	def test_likes_cleared(self):
+		self.tweet.likes.add(self.alice, self.bob)
+		self.tweet.likes.clear()
+		self.assertEqual(self._counts(), (0, 0, 0))
+
+
+	def test_likes_cleared_from_the_user(self):
+		other = self._tweet()
+		self.tweet.likes.add(self.alice, self.bob)
+		other.likes.add(self.alice)
+		self.alice.all_likes.clear()
+		self.assertEqual(self._counts(), (1, 0, 0))
+		self.assertEqual(self._counts(other), (0, 0, 0))
+
+
+	def test_liker_deleted(self):
+		self.tweet.likes.add(self.alice, self.bob)
+		self.alice.delete()
+		self.assertEqual(self._counts(), (1, 0, 0))
+
+
+	def test_likes_are_dated(self):
+		self.tweet.likes.add(self.alice)
+		like = Like.objects.get(tweet= self.tweet, user= self.alice)
+		self.assertLessEqual(like.created, timezone.now())
+
+
+	def test_replies_and_retweets(self):
+		reply = self._tweet(in_reply_to= self.tweet)
+		retweet = self._tweet(in_retweet_to= self.tweet)
+		self.assertEqual(self._counts(), (0, 1, 1))
+		reply.delete()
+		retweet.delete()
+		self.assertEqual(self._counts(), (0, 0, 0))
+
+
+class TweetPageQueryTests(TestCase):
+
+	def test_queries_do_not_grow_with_replies(self):
+		User = get_user_model()
+		author, viewer = (
+			User.objects.create_user(username= name, email= f"{name}@example.com", password= "password")
+			for name in ("author", "viewer")
+		)
+		viewer.follows.add(author)
+		tweet = Tweet.objects.create(author= author, text= "tweet", modified= timezone.now())
+		self.client.force_login(viewer)
+
+		for n in (1, 10):
+			while tweet.replies.count() < n:
+				reply = Tweet.objects.create(
+					author= viewer, text= "reply", modified= timezone.now(), in_reply_to= tweet,
+				)
+				reply.likes.add(viewer)
+			with self.assertNumQueries(13):
+				response = self.client.get(reverse("tweets:tweet", kwargs= {"pk": tweet.pk}))
+			self.assertEqual(response.status_code, 200)
\ No newline at end of file
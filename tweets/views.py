@@ -1,10 +1,11 @@
+from django.db import transaction
 from django.views import generic
 from django.contrib.auth import mixins
 from django import http
 from django.utils import timezone
 from django.urls import reverse_lazy
 
-from . import models
+from . import loader, models
 from notifications.signals import notify_like
 
 
@@ -18,6 +19,16 @@ class Tweet(generic.DetailView):
 	model = models.Tweet
 	context_object_name = "tweet"
 
+	def get_queryset(self):
+		return loader.prepare(super().get_queryset())
+
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		loader.attach([self.object], self.request.user)
+		context["replies"] = loader.load(self.object.replies.all(), self.request.user)
+		return context
+
 
 class Like(mixins.LoginRequiredMixin, generic.View):
 	login_url = LOGIN_URL
@@ -29,13 +40,14 @@ class Like(mixins.LoginRequiredMixin, generic.View):
 		except models.Tweet.DoesNotExist:
 			return http.HttpResponseBadRequest()
 
-		if request.user in tweet.likes.all():
-			tweet.likes.remove(request.user)
-		else:
-			tweet.likes.add(request.user)
-			notify_like(tweet, request.user)
+		# the like and the counter change commit together
+		with transaction.atomic():
+			if tweet.is_liked_by(request.user):
+				tweet.likes.remove(request.user)
+			else:
+				tweet.likes.add(request.user)
+				notify_like(tweet, request.user)
 
-		tweet.save()
 		return http.HttpResponse(status= 204)
 
 
@@ -62,12 +74,14 @@ class NewTweet(mixins.LoginRequiredMixin, generic.View):
 			except models.Tweet.DoesNotExist:
 				return http.HttpResponseBadRequest()
 
-		models.Tweet.objects.create(
-			author= request.user,
-			modified= timezone.now(),
-			text= text,
-			**d
-		)
+		# the tweet and the counters of its parent commit together
+		with transaction.atomic():
+			models.Tweet.objects.create(
+				author= request.user,
+				modified= timezone.now(),
+				text= text,
+				**d
+			)
 		return http.HttpResponse(status= 204)
 
 
@@ -84,7 +98,9 @@ class DeleteTweet(mixins.LoginRequiredMixin, generic.View):
 		if tweet.author != request.user:
 			return http.HttpResponseForbidden()
 		
-		tweet.delete()
+		# the deletion and the counters of its parent commit together
+		with transaction.atomic():
+			tweet.delete()
 		return http.HttpResponseRedirect(
 			request.POST.get(
 				self.get_redirect_field_name(), 
@@ -0,0 +1,109 @@
+"""
+Keyset pagination: pages follow each other by the (created, pk) of the
+last object shown, rather than by an offset, so every page costs one
+range of an index however deep into a list it is
+"""
+
+import base64
+import datetime
+
+from django.core.exceptions import BadRequest
+from django.db.models import Q
+
+
+PAGE_SIZE = 20
+
+
+class KeysetPage():
+	"""
+	The objects of a page, newest first, and the cursor of the next one
+	"""
+
+	def __init__(self, object_list: list, next_cursor: str | None) -> None:
+		self.object_list = object_list
+		self.next_cursor = next_cursor
+
+
+	def __iter__(self):
+		return iter(self.object_list)
+
+
+	def __len__(self) -> int:
+		return len(self.object_list)
+
+
+	def has_next(self) -> bool:
+		return self.next_cursor is not None
+
+
+class KeysetPaginator():
+	"""
+	Split queryset into pages of per_page objects, ordered by
+	field then pk, both descending
+	"""
+
+	def __init__(self, queryset, per_page= PAGE_SIZE, field= "created", pk= "pk") -> None:
+		self.queryset = queryset.order_by(f"-{field}", f"-{pk}")
+		self.per_page = per_page
+		self.field = field
+		self.pk = pk
+
+
+	def page(self, cursor: str = None) -> KeysetPage:
+		"""
+		The page following cursor, or the first one if cursor is None
+		"""
+		q = after(self.queryset, cursor, self.field, self.pk)
+		# one more object tells whether there is a next page
+		objects = list(q[:self.per_page + 1])
+		if len(objects) <= self.per_page:
+			return KeysetPage(objects, None)
+		objects = objects[:self.per_page]
+		last = objects[-1]
+		return KeysetPage(objects, encode(getattr(last, self.field), getattr(last, self.pk)))
+
+
+def after(queryset, cursor: str | None, field= "created", pk= "pk"):
+	"""
+	Filter queryset down to what follows cursor, in the
+	order of field then pk, both descending
+	"""
+	if not cursor:
+		return queryset
+	value, last = decode(cursor)
+	return queryset.filter(
+		Q(**{f"{field}__lt": value})
+		| Q(**{field: value, f"{pk}__lt": last})
+	)
+
+
+def encode(value: datetime.datetime, pk) -> str:
+	return base64.urlsafe_b64encode(f"{value.isoformat()}|{pk}".encode()).decode()
+
+
+def decode(cursor: str) -> tuple[datetime.datetime, int]:
+	try:
+		value, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+		return datetime.datetime.fromisoformat(value), int(pk)
+	except ValueError:
+		raise BadRequest("Invalid page cursor")
+
+
+class KeysetPaginationMixin():
+	"""
+	Keyset pagination for a ListView. The template gets the objects of
+	the page requested by the cursor_kwarg query parameter as usual,
+	and page_obj.next_cursor for the link to the next one
+	"""
+
+	paginate_by = PAGE_SIZE
+	cursor_kwarg = "after"
+
+	def get_paginator(self, queryset, per_page, **kwargs):
+		return KeysetPaginator(queryset, per_page)
+
+
+	def paginate_queryset(self, queryset, page_size):
+		paginator = self.get_paginator(queryset, page_size)
+		page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+		return paginator, page, page.object_list, page.has_next()
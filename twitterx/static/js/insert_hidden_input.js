@@ -1,10 +1,15 @@
-var elems = document.getElementsByClassName("require-redirect-input");
-for(let i = 0; i < elems.length; i++){
-	var input = document.createElement("input");
-	input.setAttribute("type", "hidden");
-	input.setAttribute("name", "r");
-	input.setAttribute("value", document.URL);
+function insert_hidden_input(root){
+	var elems = root.getElementsByClassName("require-redirect-input");
+	for(let i = 0; i < elems.length; i++){
+		var input = document.createElement("input");
+		input.setAttribute("type", "hidden");
+		input.setAttribute("name", "r");
+		input.setAttribute("value", document.URL);
 
-	let elem = elems[i]
-	elem.appendChild(input)
-}
\ No newline at end of file
+		let elem = elems[i]
+		elem.appendChild(input)
+	}
+}
+
+insert_hidden_input(document);
+document.addEventListener("page-loaded", e => insert_hidden_input(e.detail));
\ No newline at end of file
@@ -0,0 +1,53 @@
+// Replace "load more" links with the next page as they scroll into
+// view, appending its items to the list and its own link after them.
+// Scripts binding to list items listen for "page-loaded" to bind the
+// new ones
+function loadMore(link) {
+	let current = link.closest(".load-more");
+	if (current.classList.contains("loading"))
+		return;
+	current.classList.add("loading");
+
+	fetch(link.href, {credentials: "same-origin"})
+		.then(response => response.text())
+		.then(function (html) {
+			let page = new DOMParser().parseFromString(html, "text/html");
+			let items = document.querySelector(".page-items");
+			let added = document.createElement("div");
+			for (let child of Array.from(page.querySelector(".page-items").children))
+				added.appendChild(child);
+			items.appendChild(added);
+
+			let next = page.querySelector(".load-more");
+			if (next) {
+				current.replaceWith(next);
+				observeLoadMore(next);
+			}
+			else
+				current.remove();
+			document.dispatchEvent(new CustomEvent("page-loaded", {detail: added}));
+		})
+		.catch(function () {
+			current.classList.remove("loading");
+		});
+}
+
+var loadMoreObserver = new IntersectionObserver(function (entries) {
+	for (let entry of entries) {
+		if (entry.isIntersecting)
+			loadMore(entry.target.querySelector("a"));
+	}
+}, {rootMargin: "400px"});
+
+function observeLoadMore(elem) {
+	let link = elem.querySelector("a");
+	link.addEventListener("click", function (e) {
+		e.preventDefault();
+		loadMore(this);
+	});
+	loadMoreObserver.observe(elem);
+}
+
+var loadMoreElems = document.getElementsByClassName("load-more");
+for (let i = 0; i < loadMoreElems.length; i++)
+	observeLoadMore(loadMoreElems[i]);
\ No newline at end of file
@@ -1,3 +1,57 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import BadRequest
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from tweets.models import Tweet
+from . import pagination
+
+
+class CursorTests(SimpleTestCase):
+
+	def test_round_trip(self):
+		value = datetime.datetime(2024, 1, 1, 12, 30, 15, 250, tzinfo= datetime.timezone.utc)
+		self.assertEqual(pagination.decode(pagination.encode(value, 42)), (value, 42))
+
+
+	def test_invalid_cursor(self):
+		with self.assertRaises(BadRequest):
+			pagination.decode("not a cursor")
+
+
+class KeysetPaginatorTests(TestCase):
+
+	def setUp(self):
+		author = get_user_model().objects.create_user(
+			username= "author", email= "author@example.com", password= "password",
+		)
+		created = timezone.now()
+		self.tweets = []
+		for i in range(7):
+			tweet = Tweet.objects.create(author= author, text= f"tweet {i}", modified= created)
+			# pairs share a created, the pk orders them
+			Tweet.objects.filter(pk= tweet.pk).update(created= created - datetime.timedelta(minutes= i // 2))
+			self.tweets.append(tweet)
+
+
+	def test_pages_follow_each_other(self):
+		paginator = pagination.KeysetPaginator(Tweet.objects.all(), per_page= 3)
+		seen, cursor = [], None
+		while True:
+			page = paginator.page(cursor)
+			seen.extend(tweet.pk for tweet in page)
+			if not page.has_next():
+				break
+			cursor = page.next_cursor
+		expected = [tweet.pk for tweet in sorted(
+			Tweet.objects.all(), key= lambda tweet: (tweet.created, tweet.pk), reverse= True
+		)]
+		self.assertEqual(seen, expected)
+
+
+	def test_last_full_page_has_no_next(self):
+		page = pagination.KeysetPaginator(Tweet.objects.all(), per_page= 7).page()
+		self.assertEqual(len(page), 7)
+		self.assertFalse(page.has_next())
\ No newline at end of file